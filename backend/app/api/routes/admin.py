@@ -6,7 +6,7 @@ from contextlib import suppress
 from time import time
 from datetime import date, datetime, timezone, timedelta
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
-from sqlalchemy import select, update, func, or_, delete
+from sqlalchemy import select, update, func, or_, delete, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from ...core.clients import get_redis
 from ...core.db import get_session
@@ -20,6 +20,7 @@ from ...models.sanction import UserSanction
 from ...models.user import User
 from ...models.global_chat import GlobalChatMessage, GlobalChatMessageReaction
 from ...core.logging import log_action
+from ...core.loop_monitor import fetch_loop_stalls, get_loop_lag_summary
 from ...realtime.sio import sio
 from ...realtime.utils import (
     GameActionContext,
@@ -32,6 +33,7 @@ from ...realtime.utils import (
 from ...security.decorators import log_route, require_protected_admin_dep
 from ...security.auth_tokens import get_identity
 from ...security.parameters import ensure_app_settings, sync_cache_from_row, refresh_app_settings, get_cached_settings
+from ...services.audit_log import get_log_actions
 from ...services.livekit import remove_livekit_participant
 from ...services.user_cache import refresh_user_profile_cache, get_user_profiles_cached
 from ...services.profile_theme import (
@@ -67,6 +69,7 @@ from ...services.minio import (
     put_home_carousel_banner_async,
 )
 from ...services.blacklist import clear_user_blacklist
+from ...services.moderation_sweep import schedule_moderation_sweep
 from ...services.sanction_rules import ensure_sanction_rules
 from ...services.nickname_history import prepend_nickname_history
 from ...schemas.common import Ok, Identity
@@ -85,6 +88,7 @@ from ...schemas.admin import (
     AdminLogOut,
     AdminLogsOut,
     AdminLogActionsOut,
+    AdminEventLoopDiagnosticsOut,
     AdminContactRequestOut,
     AdminContactRequestsOut,
     AdminContactRequestReplyIn,
@@ -93,6 +97,8 @@ from ...schemas.admin import (
     AdminRoomOut,
     AdminRoomGameOut,
     AdminRoomsOut,
+    AdminLiveRoomsOut,
+    AdminLiveRoomOut,
     AdminGameActionOut,
     AdminGameActionsOut,
     AdminGamePpkOut,
@@ -137,6 +143,8 @@ from ..utils import (
     game_stats_cache_user_ids,
     invalidate_game_stats_cache_for_game_users,
     normalize_pagination,
+    encode_keyset_cursor,
+    decode_keyset_cursor,
     build_registrations_series,
     build_registrations_monthly_series,
     build_games_series,
@@ -153,7 +161,7 @@ from ..utils import (
     build_room_user_stats,
     close_room_as_staff,
     sum_room_stream_seconds,
-    fetch_live_room_stats,
+    get_live_room_stats,
     has_live_room_snapshot,
     fetch_active_room_game_numbers,
     aggregate_user_room_time_stats,
@@ -180,7 +188,7 @@ from ..utils import (
     setGameActionPpk,
     game_action_fields,
     compute_duration_seconds,
-    gc_empty_room_and_emit,
+    enqueue_room_gc_safe,
     fetch_active_sanction,
     is_sanction_active,
     sanction_status,
@@ -225,6 +233,7 @@ from ..utils import (
 
 public_router = APIRouter()
 ADMIN_GUARD = (Depends(require_protected_admin_dep),)
+ADMIN_LOGS_TOTAL_CAP = 10_000
 router = APIRouter(dependencies=ADMIN_GUARD)
 log = structlog.get_logger()
 
@@ -349,6 +358,8 @@ async def update_settings(payload: AdminSettingsUpdateIn, session: AsyncSession
             await emit_global_chat_permissions_refresh()
         if season_changed:
             schedule_user_game_stats_cache_invalidation("admin.settings.season_change.invalidate_stats_cache_failed")
+        if "text_moderation_blacklist" in changed:
+            schedule_moderation_sweep(started_by=int(ident["id"]), reason="blacklist_update")
 
     details = (
         f"Обновление настроек keys={','.join(sorted(changed))} season_changed={int(season_changed)}"
@@ -544,14 +555,19 @@ async def site_stats(month: str | None = None, session: AsyncSession = Depends(g
 @router.get("/logs/actions", response_model=AdminLogActionsOut, dependencies=ADMIN_GUARD)
 @log_route("admin.logs.actions")
 async def log_actions(session: AsyncSession = Depends(get_session)) -> AdminLogActionsOut:
-    rows = await session.execute(select(AppLog.action).distinct().order_by(AppLog.action))
-    actions = {str(r[0]) for r in rows.all() if r and r[0] is not None}
-    return AdminLogActionsOut(actions=sorted(actions))
+    return AdminLogActionsOut(actions=await get_log_actions(session))
+
+
+@router.get("/diagnostics/event_loop", response_model=AdminEventLoopDiagnosticsOut, dependencies=ADMIN_GUARD)
+@log_route("admin.diagnostics.event_loop")
+async def event_loop_diagnostics() -> AdminEventLoopDiagnosticsOut:
+    stalls = await fetch_loop_stalls(get_redis())
+    return AdminEventLoopDiagnosticsOut.model_validate({"lag": get_loop_lag_summary(), "stalls": stalls})
 
 
 @router.get("/logs", response_model=AdminLogsOut, dependencies=ADMIN_GUARD)
 @log_route("admin.logs.list")
-async def logs_list(page: int = 1, limit: int = 20, action: str | None = None, username: str | None = None, day: date | None = None, session: AsyncSession = Depends(get_session)) -> AdminLogsOut:
+async def logs_list(page: int = 1, limit: int = 20, action: str | None = None, username: str | None = None, day: date | None = None, cursor: str | None = None, session: AsyncSession = Depends(get_session)) -> AdminLogsOut:
     limit, page, offset = normalize_pagination(page, limit)
 
     filters = []
@@ -566,8 +582,17 @@ async def logs_list(page: int = 1, limit: int = 20, action: str | None = None, u
         filters.append(AppLog.created_at >= start_day)
         filters.append(AppLog.created_at < end_day)
 
-    total = int(await session.scalar(select(func.count(AppLog.id)).where(*filters)) or 0)
-    rows = await session.execute(select(AppLog).where(*filters).order_by(AppLog.id.desc()).offset(offset).limit(limit))
+    total: int | None = None
+    if not cursor:
+        capped = select(AppLog.id).where(*filters).limit(ADMIN_LOGS_TOTAL_CAP).subquery()
+        total = int(await session.scalar(select(func.count()).select_from(capped)) or 0)
+    stmt = select(AppLog).where(*filters).order_by(AppLog.created_at.desc(), AppLog.id.desc())
+    if cursor:
+        cursor_at, cursor_id = decode_keyset_cursor(cursor)
+        stmt = stmt.where(AppLog.created_at <= cursor_at, tuple_(AppLog.created_at, AppLog.id) < (cursor_at, cursor_id))
+    else:
+        stmt = stmt.offset(offset)
+    rows = await session.execute(stmt.limit(limit))
     logs = rows.scalars().all()
     user_ids: set[int] = set()
     for row in logs:
@@ -594,7 +619,8 @@ async def logs_list(page: int = 1, limit: int = 20, action: str | None = None, u
             )
         )
 
-    return AdminLogsOut(total=total, items=items)
+    next_cursor = encode_keyset_cursor(logs[-1].created_at, logs[-1].id) if len(logs) == limit else None
+    return AdminLogsOut(total=total, items=items, next_cursor=next_cursor)
 
 
 @router.get("/contact_requests", response_model=AdminContactRequestsOut, dependencies=ADMIN_GUARD)
@@ -781,7 +807,7 @@ async def rooms_list(page: int = 1, limit: int = 20, username: str | None = None
     live_stats: dict[int, dict] = {}
     if active_ids:
         try:
-            live_stats = await fetch_live_room_stats(get_redis(), active_ids)
+            live_stats = await get_live_room_stats(get_redis(), active_ids)
         except Exception:
             live_stats = {}
     active_game_numbers: dict[int, int] = {}
@@ -916,6 +942,28 @@ async def rooms_list(page: int = 1, limit: int = 20, username: str | None = None
     return AdminRoomsOut(total=total, items=items)
 
 
+@router.get("/rooms/live", response_model=AdminLiveRoomsOut, dependencies=ADMIN_GUARD)
+@log_route("admin.rooms.live")
+async def rooms_live(cursor: str | None = None, limit: int = 20) -> AdminLiveRoomsOut:
+    limit = max(1, min(100, int(limit or 20)))
+    r = get_redis()
+    max_score: str | int = "+inf"
+    offset = 0
+    if cursor:
+        raw_score, _, member = cursor.partition(":")
+        max_score = safe_int(raw_score)
+        ties = await r.zrevrangebyscore("rooms:index", max_score, max_score)
+        offset = sum(1 for tie in ties if str(tie) >= member)
+
+    raw_ids = await r.zrevrangebyscore("rooms:index", max_score, "-inf", start=offset, num=limit + 1, withscores=True)
+    page = raw_ids[:limit]
+    page_ids = [rid for rid in (safe_int(raw) for raw, _ in page) if rid > 0]
+    live_stats = await get_live_room_stats(r, page_ids)
+    items = [AdminLiveRoomOut(id=rid, **live_stats[rid]) for rid in page_ids if has_live_room_snapshot(live_stats.get(rid))]
+    next_cursor = f"{int(page[-1][1])}:{page[-1][0]}" if len(raw_ids) > limit else None
+    return AdminLiveRoomsOut(items=items, next_cursor=next_cursor)
+
+
 @router.get("/games/{game_id}/actions", response_model=AdminGameActionsOut, dependencies=ADMIN_GUARD)
 @log_route("admin.games.actions")
 async def game_actions(game_id: int, session: AsyncSession = Depends(get_session)) -> AdminGameActionsOut:
@@ -1367,9 +1415,7 @@ async def rooms_kick_all(ident: Identity = Depends(require_protected_admin_dep),
                 occ = -1
             should_gc = occ == 0
         if should_gc:
-            rid_snapshot = rid
-            gc_seq_snapshot = gc_seq_on_empty
-            asyncio.create_task(gc_empty_room_and_emit(rid_snapshot, expected_seq=gc_seq_snapshot))
+            await enqueue_room_gc_safe(rid)
 
     delay_s = max(0, int(get_cached_settings().rooms_empty_ttl_seconds))
 
@@ -14,7 +14,7 @@ from ...core.logging import log_action
 from ...models.friend import FriendLink, FriendCloseness
 from ...models.user import User
 from ...models.notif import Notif
-from ...realtime.utils import filter_rooms_for_viewer, get_rooms_brief
+from ...realtime.utils import emit_room_requests_update, enter_hidden_room_viewers, filter_rooms_for_viewer, get_lobby_briefs
 from ...realtime.sio import sio
 from ...services.telegram import send_text_message
 from ...services.user_cache import get_user_profile_cached, get_user_profiles_cached
@@ -274,13 +274,13 @@ async def friends_list(room_id: int | None = None, ident: Identity = Depends(get
 
     rooms_map: dict[int, RoomBriefOut] = {}
     visible_room_ids: set[int] = set()
-    room_ids = list({
+    room_ids = {
         rid
         for rid in [*room_by_uid.values(), *active_alive_game_room_by_uid.values(), *active_head_game_room_by_uid.values()]
         if rid > 0
-    })
+    }
     if room_ids:
-        items = await get_rooms_brief(r, room_ids)
+        items = [item for item in await get_lobby_briefs(r) if int(item.get("id") or 0) in room_ids]
         items = await filter_rooms_for_viewer(r, items, viewer_role, uid)
         for item in items:
             try:
@@ -858,6 +858,7 @@ async def invite_friend(payload: FriendInviteIn, ident: Identity = Depends(get_i
         auto_allowed = int(res[1] or 0) > 0
 
     if auto_allowed:
+        await enter_hidden_room_viewers(r, room_id, [target_id])
         with suppress(Exception):
             await emit_rooms_upsert(room_id)
             await sio.emit(
@@ -871,6 +872,8 @@ async def invite_friend(payload: FriendInviteIn, ident: Identity = Depends(get_i
                 room=f"user:{uid}",
                 namespace="/auth",
             )
+        with suppress(Exception):
+            await emit_room_requests_update(room_id, uid, changed=[target_id], source="owner_invite_auto_approved", session=db)
 
     await log_action(
         db,
@@ -25,11 +25,23 @@ from ...schemas.admin import (
     AdminUserNameOut,
 )
 from ...schemas.common import Identity, Ok
-from ...schemas.moderation import ModerationUserOut, ModerationUsersOut
+from ...schemas.moderation import (
+    ModerationSweepHitOut,
+    ModerationSweepOut,
+    ModerationSweepStateOut,
+    ModerationUserOut,
+    ModerationUsersOut,
+)
 from ...schemas.user import UserGamesHistoryOut, UserStatsOut
 from ...realtime.sio import sio
 from ...security.auth_tokens import get_identity
 from ...security.decorators import log_route, require_roles_dep
+from ...services.moderation_sweep import (
+    dismiss_moderation_sweep_hit,
+    fetch_moderation_sweep_hits,
+    fetch_moderation_sweep_state,
+    start_moderation_sweep,
+)
 from ...services.global_chat import (
     emit_global_chat_avatar_deleted_notice,
     emit_global_chat_nickname_reset_notice,
@@ -87,6 +99,8 @@ MODERATION_GUARD = (Depends(require_roles_dep("moder")),)
 router = APIRouter(dependencies=MODERATION_GUARD)
 log = structlog.get_logger()
 
+ModerationSweepSource = Literal["username", "room_title", "chat_message"]
+
 ModerationUserSortKey = Literal[
     "registered_at",
     "last_game",
@@ -872,3 +886,82 @@ async def moderation_revoke_user_suspend(user_id: int, ident: Identity = Depends
     )
 
     return Ok()
+
+
+@router.get("/text_sweep", response_model=ModerationSweepOut, dependencies=MODERATION_GUARD)
+@log_route("moderation.text_sweep.get")
+async def moderation_text_sweep(page: int = 1, limit: int = 20, source: ModerationSweepSource | None = None, session: AsyncSession = Depends(get_session)) -> ModerationSweepOut:
+    limit, page, offset = normalize_pagination(page, limit)
+    state = await fetch_moderation_sweep_state()
+    total, hits = await fetch_moderation_sweep_hits(offset=offset, limit=limit, source=source)
+
+    user_ids = {int(hit["user_id"]) for hit in hits if int(hit.get("user_id") or 0) > 0}
+    users: dict[int, tuple[str | None, str | None, str | None, datetime | None]] = {}
+    if user_ids:
+        rows = await session.execute(
+            select(User.id, User.username, User.avatar_name, User.role, User.deleted_at).where(User.id.in_(user_ids))
+        )
+        users = {
+            int(uid): (username, avatar_name, role, deleted_at)
+            for uid, username, avatar_name, role, deleted_at in rows.all()
+        }
+
+    items: list[ModerationSweepHitOut] = []
+    for hit in hits:
+        uid = int(hit.get("user_id") or 0)
+        username, avatar_name, role, deleted_at = users.get(uid, (None, None, None, None))
+        items.append(
+            ModerationSweepHitOut(
+                id=str(hit["id"]),
+                source=hit["source"],
+                object_id=int(hit["object_id"]),
+                user_id=uid or None,
+                username=username,
+                avatar_name=avatar_name,
+                role=role,
+                deleted_at=deleted_at,
+                text=str(hit.get("text") or ""),
+                matches=hit.get("matches") or [],
+                created_at=hit.get("created_at"),
+                found_at=datetime.fromtimestamp(int(hit.get("found_at") or 0), tz=timezone.utc),
+            )
+        )
+
+    return ModerationSweepOut(state=ModerationSweepStateOut(**state), total=total, items=items)
+
+
+@router.post("/text_sweep", response_model=ModerationSweepStateOut, dependencies=MODERATION_GUARD)
+@log_route("moderation.text_sweep.start")
+async def moderation_text_sweep_start(ident: Identity = Depends(get_identity), session: AsyncSession = Depends(get_session)) -> ModerationSweepStateOut:
+    state = await start_moderation_sweep(started_by=int(ident["id"]), reason="manual")
+    if state is None:
+        raise HTTPException(status_code=409, detail="text_sweep_running")
+
+    await log_action(
+        session,
+        user_id=int(ident["id"]),
+        username=ident["username"],
+        action="moderation_text_sweep_start",
+        details=f"Запуск проверки текстов panel=moderation actor_role={ident['role']}",
+    )
+    return ModerationSweepStateOut(**state)
+
+
+@router.delete("/text_sweep/hits/{hit_id}", response_model=Ok, dependencies=MODERATION_GUARD)
+@log_route("moderation.text_sweep.dismiss")
+async def moderation_text_sweep_dismiss(hit_id: str, ident: Identity = Depends(get_identity), session: AsyncSession = Depends(get_session)) -> Ok:
+    hit = await dismiss_moderation_sweep_hit(hit_id)
+    if hit is None:
+        raise HTTPException(status_code=404, detail="text_sweep_hit_not_found")
+
+    details = f"Совпадение проверки текстов отклонено hit={hit_id} panel=moderation actor_role={ident['role']}"
+    if int(hit.get("user_id") or 0) > 0:
+        details += f" target_user={int(hit['user_id'])}"
+    await log_action(
+        session,
+        user_id=int(ident["id"]),
+        username=ident["username"],
+        action="moderation_text_sweep_dismiss",
+        details=details,
+    )
+    return Ok()
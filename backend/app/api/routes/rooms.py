@@ -2,7 +2,7 @@ from __future__ import annotations
 from contextlib import suppress
 from datetime import datetime, timezone
 from time import time
-from typing import cast
+from typing import Literal, cast
 from fastapi import APIRouter, Depends, status, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from ...core.clients import get_redis
@@ -23,14 +23,17 @@ from ...schemas.room import (
     RoomSpectatorOut,
     RoomAccessOut,
     RoomRequestOut,
+    RoomRequestsBatchIn,
+    RoomRequestsBatchOut,
     GameParams,
     RoomBriefOut,
+    RoomsPageOut,
 )
 from ...security.parameters import get_cached_settings
 from ...services.user_cache import get_user_profile_cached, get_user_profiles_cached
 from ...services.profile_theme import resolve_profile_theme_state
 from ...services.blacklist import is_user_blacklisted_by
-from ...services.text_moderation import enforce_clean_text
+from ...services.text_moderation import enforce_clean_text_async
 from ..utils import (
     emit_rooms_upsert,
     serialize_game_for_redis,
@@ -41,12 +44,25 @@ from ..utils import (
     ensure_room_view_allowed,
     ensure_room_access_allowed,
     ensure_verification_allowed,
-    schedule_room_gc,
+    enqueue_room_gc,
 )
-from ...realtime.utils import get_rooms_brief, filter_rooms_for_viewer, get_public_spectators_count
+from ...realtime.utils import ROOM_RESERVATIONS_KEY, emit_room_requests_update, enter_hidden_room_viewers, filter_rooms_for_viewer, get_lobby_briefs, get_public_spectators_count, leave_hidden_room_viewers, list_room_request_items, query_lobby, release_room_slot, reserve_room_slot, user_room_reservations_key
 
 router = APIRouter()
 
+APPROVE_PENDING_LUA = r"""
+local approved = {}
+for i = 2, #ARGV do
+    if redis.call('SREM', KEYS[1], ARGV[i]) == 1 then
+        if redis.call('SADD', KEYS[2], ARGV[i]) == 1 then
+            approved[#approved + 1] = ARGV[i]
+        end
+        redis.call('ZADD', KEYS[3], 'NX', ARGV[1], ARGV[i])
+    end
+end
+return approved
+"""
+
 
 @router.post("", response_model=RoomIdOut, status_code=status.HTTP_201_CREATED)
 @log_route("rooms.create_room")
@@ -65,16 +81,7 @@ async def create_room(payload: RoomCreateIn, session: AsyncSession = Depends(get
     if not title:
         raise HTTPException(status_code=422, detail="title_empty")
 
-    enforce_clean_text(field="title", label="Название комнаты", value=title)
-
-    r = get_redis()
-    total = int(await r.zcard("rooms:index") or 0)
-    if total >= app_settings.rooms_limit_global:
-        raise HTTPException(status_code=409, detail="rooms_limit_global")
-
-    mine = int(await r.scard(f"user:{uid}:rooms") or 0)
-    if mine >= app_settings.rooms_limit_per_user:
-        raise HTTPException(status_code=409, detail="rooms_limit_user")
+    await enforce_clean_text_async(field="title", label="Название комнаты", value=title)
 
     game_limit = int(app_settings.game_min_ready_players) + 1
     user_limit = game_limit if payload.user_limit is None else int(payload.user_limit)
@@ -89,6 +96,14 @@ async def create_room(payload: RoomCreateIn, session: AsyncSession = Depends(get
         if not theme_state.subscription_active:
             raise HTTPException(status_code=403, detail="subscription_required")
 
+    r = get_redis()
+    reservation = await reserve_room_slot(r, uid, global_limit=app_settings.rooms_limit_global, user_limit=app_settings.rooms_limit_per_user)
+    if reservation == -1:
+        raise HTTPException(status_code=409, detail="rooms_limit_global")
+
+    if reservation <= 0:
+        raise HTTPException(status_code=409, detail="rooms_limit_user")
+
     privacy = "private" if anonymity == "hidden" else payload.privacy
     game_dict = {
         "mode": gp.mode,
@@ -103,46 +118,55 @@ async def create_room(payload: RoomCreateIn, session: AsyncSession = Depends(get
         "music": bool(gp.music),
     }
 
-    room = Room(
-        title=title,
-        user_limit=user_limit,
-        privacy=privacy,
-        anonymity=anonymity,
-        creator=uid,
-        creator_name=creator_name,
-        game=game_dict,
-    )
-    session.add(room)
-    await session.commit()
-    await session.refresh(room)
-
-    params_data = {
-        "id": room.id,
-        "title": room.title,
-        "user_limit": room.user_limit,
-        "creator": room.creator,
-        "creator_name": creator_name,
-        "creator_role": normalize_user_role(ident.get("role") or "user"),
-        "creator_avatar_name": (profile or {}).get("avatar_name"),
-        "created_at": room.created_at.isoformat(),
-        "privacy": privacy,
-        "anonymity": anonymity,
-        "entry_closed": "0",
-    }
-    game_data = serialize_game_for_redis(game_dict)
-    params_clean = {k: v for k, v in params_data.items() if v is not None}
+    try:
+        room = Room(
+            title=title,
+            user_limit=user_limit,
+            privacy=privacy,
+            anonymity=anonymity,
+            creator=uid,
+            creator_name=creator_name,
+            game=game_dict,
+        )
+        session.add(room)
+        await session.commit()
+        await session.refresh(room)
+
+        params_data = {
+            "id": room.id,
+            "title": room.title,
+            "user_limit": room.user_limit,
+            "creator": room.creator,
+            "creator_name": creator_name,
+            "creator_role": normalize_user_role(ident.get("role") or "user"),
+            "creator_avatar_name": (profile or {}).get("avatar_name"),
+            "created_at": room.created_at.isoformat(),
+            "privacy": privacy,
+            "anonymity": anonymity,
+            "entry_closed": "0",
+        }
+        game_data = serialize_game_for_redis(game_dict)
+        params_clean = {k: v for k, v in params_data.items() if v is not None}
+
+        async with r.pipeline() as p:
+            await p.hset(f"room:{room.id}:params", mapping=params_clean)
+            await p.hset(f"room:{room.id}:game", mapping=game_data)
+            await p.zadd("rooms:index", {str(room.id): int(room.created_at.timestamp())})
+            await p.sadd(f"user:{uid}:rooms", str(room.id))
+            await p.set(f"room:{room.id}:empty_since", int(room.created_at.timestamp()), ex=3600*24*30)
+            await p.zrem(ROOM_RESERVATIONS_KEY, str(reservation))
+            await p.zrem(user_room_reservations_key(uid), str(reservation))
+            await p.execute()
 
-    async with r.pipeline() as p:
-        await p.hset(f"room:{room.id}:params", mapping=params_clean)
-        await p.hset(f"room:{room.id}:game", mapping=game_data)
-        await p.zadd("rooms:index", {str(room.id): int(room.created_at.timestamp())})
-        await p.sadd(f"user:{uid}:rooms", str(room.id))
-        await p.set(f"room:{room.id}:empty_since", int(room.created_at.timestamp()), ex=3600*24*30)
-        await p.execute()
+    except BaseException:
+        with suppress(Exception):
+            await release_room_slot(r, uid, reservation)
+        raise
 
+    await enter_hidden_room_viewers(r, room.id, [uid], anonymity=anonymity)
     await emit_rooms_upsert(room.id)
 
-    schedule_room_gc(room.id)
+    await enqueue_room_gc(r, room.id)
 
     await log_action(
         session,
@@ -160,19 +184,10 @@ async def create_room(payload: RoomCreateIn, session: AsyncSession = Depends(get
 @rate_limited(lambda ident, **_: f"rl:rooms:active_list:{ident['id']}", limit=5, window_s=1)
 async def list_active_rooms(ident: Identity = Depends(get_identity)) -> list[RoomBriefOut]:
     r = get_redis()
-    raw_ids = await r.zrange("rooms:index", 0, -1)
-    ids: list[int] = []
-    for raw in raw_ids or []:
-        try:
-            rid = int(raw)
-        except Exception:
-            continue
-        if rid > 0:
-            ids.append(rid)
-    if not ids:
+    items = await get_lobby_briefs(r)
+    if not items:
         return []
 
-    items = await get_rooms_brief(r, ids)
     items = await filter_rooms_for_viewer(r, items, str(ident.get("role") or "user"), int(ident.get("id") or 0))
     out: list[RoomBriefOut] = []
     for item in items:
@@ -184,6 +199,49 @@ async def list_active_rooms(ident: Identity = Depends(get_identity)) -> list[Roo
     return out
 
 
+@router.get("/lobby", response_model=RoomsPageOut)
+@log_route("rooms.lobby")
+@rate_limited(lambda ident, **_: f"rl:rooms:lobby:{ident['id']}", limit=10, window_s=1)
+async def lobby_rooms(
+    state: Literal["idle", "game"] | None = None,
+    privacy: Literal["open", "private"] | None = None,
+    mode: Literal["normal", "rating"] | None = None,
+    free_seats: bool = False,
+    spectate: bool = False,
+    sort: Literal["newest", "oldest"] = "newest",
+    cursor: str | None = None,
+    limit: int = 50,
+    ident: Identity = Depends(get_identity),
+) -> RoomsPageOut:
+    try:
+        cursor_id = int(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid_cursor")
+
+    r = get_redis()
+    items, next_id = await query_lobby(
+        r,
+        role=str(ident.get("role") or "user"),
+        uid=int(ident.get("id") or 0),
+        state=state,
+        privacy=privacy,
+        mode=mode,
+        free_seats=free_seats,
+        spectate=spectate,
+        cursor=cursor_id,
+        limit=max(1, min(100, int(limit))),
+        newest_first=sort == "newest",
+    )
+    out: list[RoomBriefOut] = []
+    for item in items:
+        try:
+            out.append(RoomBriefOut(**item))
+        except Exception:
+            continue
+
+    return RoomsPageOut(items=out, next_cursor=str(next_id) if next_id else None)
+
+
 @router.get("/{room_id}/info", response_model=RoomInfoOut, response_model_exclude_none=True)
 @log_route("rooms.room_info")
 async def room_info(
@@ -464,6 +522,8 @@ async def apply(room_id: int, ident: Identity = Depends(get_identity), db: Async
             room=f"user:{creator}",
             namespace="/auth",
         )
+    with suppress(Exception):
+        await emit_room_requests_update(room_id, creator, changed=[uid], session=db)
 
     details = f"Подача заявки в комнату room_id={room_id} title={title} creator={creator}"
     if creator_name:
@@ -489,195 +549,211 @@ async def list_requests(room_id: int, ident: Identity = Depends(get_identity), d
     if int(params.get("creator") or 0) != int(ident["id"]):
         raise HTTPException(status_code=403, detail="forbidden")
 
-    pending_ids = {int(x) for x in (await r.smembers(f"room:{room_id}:pending") or [])}
-    allow_ids = {int(x) for x in (await r.smembers(f"room:{room_id}:allow") or [])}
-    ids = pending_ids | allow_ids
-    if not ids:
-        return []
+    return [RoomRequestOut(**item) for item in await list_room_request_items(r, db, room_id)]
 
-    raw_order = await r.zrevrange(f"room:{room_id}:requests", 0, -1, withscores=True)
-    order_ids: list[int] = []
-    request_times: dict[int, datetime] = {}
-    seen = set()
-    for raw in raw_order or []:
-        try:
-            uid = int(raw[0])
-        except Exception:
-            continue
-        if uid in ids and uid not in seen:
-            order_ids.append(uid)
-            seen.add(uid)
-        try:
-            score = float(raw[1])
-            if score > 0:
-                request_times[uid] = datetime.fromtimestamp(score, tz=timezone.utc)
-        except Exception:
-            pass
 
-    missing_ids = sorted(ids - seen)
-    if missing_ids:
+async def _approve_room_requests(r, db: AsyncSession, room_id: int, params: dict, ident: Identity, user_ids: list[int], *, pending_only: bool = False) -> list[int]:
+    if pending_only:
+        res = await r.eval(
+            APPROVE_PENDING_LUA,
+            3,
+            f"room:{room_id}:pending",
+            f"room:{room_id}:allow",
+            f"room:{room_id}:requests",
+            str(int(time())),
+            *[str(user_id) for user_id in user_ids],
+        )
+        approved = [int(user_id) for user_id in res or []]
+    else:
         async with r.pipeline(transaction=True) as p:
-            for idx, uid in enumerate(missing_ids):
-                await p.zadd(f"room:{room_id}:requests", {str(uid): -idx}, nx=True)
-            await p.execute()
-        order_ids.extend(missing_ids)
+            for user_id in user_ids:
+                await p.srem(f"room:{room_id}:pending", str(user_id))
+                await p.sadd(f"room:{room_id}:allow", str(user_id))
+                await p.zadd(f"room:{room_id}:requests", {str(user_id): int(time())}, nx=True)
+            res = await p.execute()
+
+        approved = [user_id for idx, user_id in enumerate(user_ids) if int(res[idx * 3 + 1] or 0)]
+    if not approved:
+        return []
 
-    user_map = await get_user_profiles_cached(db, ids)
-    items: list[RoomRequestOut] = []
-    for uid in order_ids:
-        profile = user_map.get(uid)
-        if not profile:
-            continue
+    owner_uid = int(ident["id"])
+    title_room = (params.get("title") or "").strip()
+    toast_title = "Доступ разрешен"
+    toast_text = f"Вход в «{title_room}» разрешен"
 
-        status = "pending" if uid in pending_ids else "approved"
-        items.append(RoomRequestOut(
-            id=uid,
-            username=cast(str | None, profile.get("username")),
-            avatar_name=cast(str | None, profile.get("avatar_name")),
-            role=str(profile.get("role") or "user"),
-            theme_color=cast(str | None, profile.get("theme_color")),
-            theme_icon=cast(str | None, profile.get("theme_icon")),
-            status=status,
-            requested_at=request_times.get(uid),
-        ))
+    await enter_hidden_room_viewers(r, room_id, approved, anonymity=str(params.get("anonymity") or "visible"))
+    with suppress(Exception):
+        await emit_rooms_upsert(room_id)
 
-    return items
+    for user_id in approved:
+        with suppress(Exception):
+            await sio.emit("notify",
+                           {"title": toast_title,
+                            "text": toast_text,
+                            "date": datetime.now(timezone.utc).isoformat(),
+                            "kind": "approve",
+                            "room_id": room_id,
+                            "action": {"kind": "route", "label": "Перейти", "to": f"/room/{room_id}"},
+                            "ttl_ms": 10000,
+                            "read": False},
+                           room=f"user:{user_id}",
+                           namespace="/auth")
+            await sio.emit("room_app_approved",
+                           {"room_id": room_id, "user_id": user_id},
+                           room=f"user:{owner_uid}",
+                           namespace="/auth")
+    with suppress(Exception):
+        await emit_room_requests_update(room_id, owner_uid, changed=approved, session=db)
+
+    profiles = await get_user_profiles_cached(db, approved)
+    for user_id in approved:
+        target_username = str((profiles.get(user_id) or {}).get("username") or "")
+        details = f"Одобрена заявка в комнату room_id={room_id} title={title_room} target_user={user_id}"
+        if target_username:
+            details += f" target_username={target_username}"
+        await log_action(
+            db,
+            user_id=owner_uid,
+            username=ident["username"],
+            action="room_approve",
+            details=details,
+        )
 
+    return approved
 
-@router.post("/{room_id}/requests/{user_id}/approve", response_model=Ok)
-@log_route("rooms.approve")
-@rate_limited(lambda ident, room_id, user_id, **_: f"rl:rooms:approve:{ident['id']}:{room_id}", limit=10, window_s=1)
-@require_room_creator("room_id")
-async def approve(room_id: int, user_id: int, ident: Identity = Depends(get_identity), db: AsyncSession = Depends(get_session)) -> Ok:
-    r = get_redis()
-    params = await get_room_params_or_404(r, room_id)
 
-    if int(params.get("creator") or 0) != int(ident["id"]):
-        raise HTTPException(status_code=403, detail="forbidden")
+async def _deny_room_requests(r, db: AsyncSession, room_id: int, params: dict, ident: Identity, user_ids: list[int]) -> list[int]:
+    if (params.get("privacy") or "open") != "private":
+        raise HTTPException(status_code=400, detail="not_private")
+
+    raw_gstate = await r.hgetall(f"room:{room_id}:game_state")
+    phase = str(raw_gstate.get("phase") or "idle")
+    if phase != "idle":
+        raise HTTPException(status_code=409, detail="game_in_progress")
 
     async with r.pipeline(transaction=True) as p:
-        await p.srem(f"room:{room_id}:pending", str(user_id))
-        await p.sadd(f"room:{room_id}:allow", str(user_id))
-        await p.zadd(f"room:{room_id}:requests", {str(user_id): int(time())}, nx=True)
+        for user_id in user_ids:
+            await p.srem(f"room:{room_id}:allow", str(user_id))
+            await p.srem(f"room:{room_id}:pending", str(user_id))
+            await p.zrem(f"room:{room_id}:requests", str(user_id))
         res = await p.execute()
 
-    added = int(res[1] or 0)
-    if added == 0:
-        return Ok()
+    revoked = [user_id for idx, user_id in enumerate(user_ids) if int(res[idx * 3] or 0)]
+    dropped = [user_id for idx, user_id in enumerate(user_ids) if not int(res[idx * 3] or 0) and int(res[idx * 3 + 1] or 0)]
+    if not revoked and not dropped:
+        return []
 
+    owner_uid = int(ident["id"])
     title_room = (params.get("title") or "").strip()
-    toast_title = "Доступ разрешен"
-    toast_text = f"Вход в «{title_room}» разрешен"
-
-    with suppress(Exception):
-        await emit_rooms_upsert(room_id)
+    is_hidden_room = str(params.get("anonymity") or "visible") == "hidden"
+    if is_hidden_room and revoked:
+        await leave_hidden_room_viewers(room_id, revoked)
+    toast_title = "Доступ к комнате отозван"
+    toast_text = f"Вход в «{title_room}» больше недоступен."
 
+    for user_id in revoked:
+        with suppress(Exception):
+            await sio.emit("notify",
+                           {"title": toast_title,
+                            "text": toast_text,
+                            "date": datetime.now(timezone.utc).isoformat(),
+                            "kind": "info",
+                            "room_id": room_id,
+                            "ttl_ms": 10000,
+                            "read": False},
+                           room=f"user:{user_id}",
+                           namespace="/auth")
+            await sio.emit("room_app_revoked",
+                           {"room_id": room_id, "user_id": user_id},
+                           room=f"user:{owner_uid}",
+                           namespace="/auth")
+            await sio.emit("room_app_revoked",
+                           {"room_id": room_id, "user_id": user_id},
+                           room=f"user:{user_id}",
+                           namespace="/auth")
+            if is_hidden_room:
+                await sio.emit("rooms_remove",
+                               {"id": room_id},
+                               room=f"user:{user_id}",
+                               namespace="/rooms")
+    for user_id in dropped:
+        with suppress(Exception):
+            await sio.emit("room_app_revoked",
+                           {"room_id": room_id, "user_id": user_id, "silent": True},
+                           room=f"user:{user_id}",
+                           namespace="/auth")
     with suppress(Exception):
-        await sio.emit("notify",
-                       {"title": toast_title,
-                        "text": toast_text,
-                        "date": datetime.now(timezone.utc).isoformat(),
-                        "kind": "approve",
-                        "room_id": room_id,
-                        "action": {"kind": "route", "label": "Перейти", "to": f"/room/{room_id}"},
-                        "ttl_ms": 10000,
-                        "read": False},
-                       room=f"user:{user_id}",
-                       namespace="/auth")
-        await sio.emit("room_app_approved",
-                       {"room_id": room_id, "user_id": user_id},
-                       room=f"user:{int(ident['id'])}",
-                       namespace="/auth")
-
-    target_profile = await get_user_profile_cached(db, int(user_id))
-    target_username = str((target_profile or {}).get("username") or "")
-    details = f"Одобрена заявка в комнату room_id={room_id} title={title_room} target_user={user_id}"
-    if target_username:
-        details += f" target_username={target_username}"
-    await log_action(
-        db,
-        user_id=int(ident["id"]),
-        username=ident["username"],
-        action="room_approve",
-        details=details,
-    )
+        await emit_room_requests_update(room_id, owner_uid, removed=[*revoked, *dropped], session=db)
+
+    profiles = await get_user_profiles_cached(db, [*revoked, *dropped])
+    for user_id in [*revoked, *dropped]:
+        target_username = str((profiles.get(user_id) or {}).get("username") or "")
+        if user_id in revoked:
+            details = f"Доступ к комнате отозван room_id={room_id} title={title_room} target_user={user_id}"
+        else:
+            details = f"Заявка в комнату отклонена room_id={room_id} title={title_room} target_user={user_id}"
+        if target_username:
+            details += f" target_username={target_username}"
+        await log_action(
+            db,
+            user_id=owner_uid,
+            username=ident["username"],
+            action="room_revoke" if user_id in revoked else "room_deny",
+            details=details,
+        )
 
-    return Ok()
+    return [*revoked, *dropped]
 
 
-@router.post("/{room_id}/requests/{user_id}/deny", response_model=Ok)
-@log_route("rooms.deny")
-@rate_limited(lambda ident, room_id, user_id, **_: f"rl:rooms:deny:{ident['id']}:{room_id}", limit=10, window_s=1)
+@router.post("/{room_id}/requests/batch", response_model=RoomRequestsBatchOut)
+@log_route("rooms.requests_batch")
+@rate_limited(lambda ident, room_id, **_: f"rl:rooms:requests_batch:{ident['id']}:{room_id}", limit=5, window_s=1)
 @require_room_creator("room_id")
-async def deny(room_id: int, user_id: int, ident: Identity = Depends(get_identity), db: AsyncSession = Depends(get_session)) -> Ok:
+async def requests_batch(room_id: int, payload: RoomRequestsBatchIn, ident: Identity = Depends(get_identity), db: AsyncSession = Depends(get_session)) -> RoomRequestsBatchOut:
     r = get_redis()
     params = await get_room_params_or_404(r, room_id)
 
     if int(params.get("creator") or 0) != int(ident["id"]):
         raise HTTPException(status_code=403, detail="forbidden")
 
+    approve_ids = list(dict.fromkeys(int(x) for x in payload.approve if int(x) > 0))
+    deny_ids = list(dict.fromkeys(int(x) for x in payload.deny if int(x) > 0))
+    if set(approve_ids) & set(deny_ids):
+        raise HTTPException(status_code=422, detail="conflicting_decisions")
+
     if (params.get("privacy") or "open") != "private":
         raise HTTPException(status_code=400, detail="not_private")
 
-    raw_gstate = await r.hgetall(f"room:{room_id}:game_state")
-    phase = str(raw_gstate.get("phase") or "idle")
-    if phase != "idle":
-        raise HTTPException(status_code=409, detail="game_in_progress")
+    denied = await _deny_room_requests(r, db, room_id, params, ident, deny_ids) if deny_ids else []
+    approved = await _approve_room_requests(r, db, room_id, params, ident, approve_ids, pending_only=True) if approve_ids else []
+    return RoomRequestsBatchOut(approved=approved, denied=denied)
 
-    if not await r.sismember(f"room:{room_id}:allow", str(user_id)):
-        return Ok()
 
-    async with r.pipeline(transaction=True) as p:
-        await p.srem(f"room:{room_id}:allow", str(user_id))
-        await p.srem(f"room:{room_id}:pending", str(user_id))
-        await p.zrem(f"room:{room_id}:requests", str(user_id))
-        res = await p.execute()
+@router.post("/{room_id}/requests/{user_id}/approve", response_model=Ok)
+@log_route("rooms.approve")
+@rate_limited(lambda ident, room_id, user_id, **_: f"rl:rooms:approve:{ident['id']}:{room_id}", limit=10, window_s=1)
+@require_room_creator("room_id")
+async def approve(room_id: int, user_id: int, ident: Identity = Depends(get_identity), db: AsyncSession = Depends(get_session)) -> Ok:
+    r = get_redis()
+    params = await get_room_params_or_404(r, room_id)
 
-    removed = int(res[0] or 0)
-    if removed == 0:
-        return Ok()
+    if int(params.get("creator") or 0) != int(ident["id"]):
+        raise HTTPException(status_code=403, detail="forbidden")
 
-    title_room = (params.get("title") or "").strip()
-    is_hidden_room = str(params.get("anonymity") or "visible") == "hidden"
-    toast_title = "Доступ к комнате отозван"
-    toast_text = f"Вход в «{title_room}» больше недоступен."
+    await _approve_room_requests(r, db, room_id, params, ident, [user_id])
+    return Ok()
 
-    with suppress(Exception):
-        await sio.emit("notify",
-                       {"title": toast_title,
-                        "text": toast_text,
-                        "date": datetime.now(timezone.utc).isoformat(),
-                        "kind": "info",
-                        "room_id": room_id,
-                        "ttl_ms": 10000,
-                        "read": False},
-                       room=f"user:{user_id}",
-                       namespace="/auth")
-        await sio.emit("room_app_revoked",
-                       {"room_id": room_id, "user_id": user_id},
-                       room=f"user:{int(ident['id'])}",
-                       namespace="/auth")
-        await sio.emit("room_app_revoked",
-                       {"room_id": room_id, "user_id": user_id},
-                       room=f"user:{user_id}",
-                       namespace="/auth")
-        if is_hidden_room:
-            await sio.emit("rooms_remove",
-                           {"id": room_id},
-                           room=f"user:{user_id}",
-                           namespace="/rooms")
 
-    target_profile = await get_user_profile_cached(db, int(user_id))
-    target_username = str((target_profile or {}).get("username") or "")
-    details = f"Доступ к комнате отозван room_id={room_id} title={title_room} target_user={user_id}"
-    if target_username:
-        details += f" target_username={target_username}"
-    await log_action(
-        db,
-        user_id=int(ident["id"]),
-        username=ident["username"],
-        action="room_revoke",
-        details=details,
-    )
+@router.post("/{room_id}/requests/{user_id}/deny", response_model=Ok)
+@log_route("rooms.deny")
+@rate_limited(lambda ident, room_id, user_id, **_: f"rl:rooms:deny:{ident['id']}:{room_id}", limit=10, window_s=1)
+@require_room_creator("room_id")
+async def deny(room_id: int, user_id: int, ident: Identity = Depends(get_identity), db: AsyncSession = Depends(get_session)) -> Ok:
+    r = get_redis()
+    params = await get_room_params_or_404(r, room_id)
+
+    if int(params.get("creator") or 0) != int(ident["id"]):
+        raise HTTPException(status_code=403, detail="forbidden")
 
+    await _deny_room_requests(r, db, room_id, params, ident, [user_id])
     return Ok()
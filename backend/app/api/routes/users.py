@@ -111,7 +111,7 @@ from ...services.global_chat import (
 from ...services.minio import (
     put_avatar_async,
     build_chat_image_object_name,
-    delete_object_async,
+    delete_chat_image_object_async,
     put_chat_image_async,
     build_chat_image_post_upload_async,
     ALLOWED_CT,
@@ -1517,7 +1517,7 @@ async def delete_chat_image(key: str, ident: Identity = Depends(get_identity), d
     if await is_global_chat_image_referenced(db, normalized_key):
         return Ok()
 
-    await delete_object_async(normalized_key)
+    await delete_chat_image_object_async(normalized_key)
     return Ok()
 
 
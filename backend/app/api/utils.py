@@ -4,6 +4,7 @@ import secrets
 import unicodedata
 import asyncio
 import calendar
+import json
 from contextlib import suppress
 import structlog
 from time import time
@@ -44,6 +45,7 @@ from ..services.nickname_limits import (
 )
 from ..services.blacklist import clear_user_blacklist_if_subscription_inactive
 from ..services.telegram import send_text_message
+from ..services.username_search import find_fuzzy_username_candidates
 from ..schemas.common import Ok, Identity
 if TYPE_CHECKING:
     from ..schemas.auth import BotResetIn, BotStatusIn, BotVerifyIn
@@ -87,8 +89,10 @@ __all__ = [
     "site_settings_out",
     "public_settings_out",
     "game_settings_out",
-    "schedule_room_gc",
-    "gc_empty_room_and_emit",
+    "ROOM_GC_DUE_KEY",
+    "ROOM_SINGLE_GC_DUE_KEY",
+    "enqueue_room_gc",
+    "enqueue_room_gc_safe",
     "normalize_pagination",
     "build_registrations_series",
     "build_registrations_monthly_series",
@@ -109,6 +113,10 @@ __all__ = [
     "build_room_user_stats",
     "sum_room_stream_seconds",
     "fetch_live_room_stats",
+    "get_live_room_stats",
+    "refresh_live_room_snapshots",
+    "finalize_live_room_snapshot",
+    "LIVE_ROOM_STATS_KEY",
     "has_live_room_snapshot",
     "redis_hash",
     "int_or_zero",
@@ -153,6 +161,8 @@ __all__ = [
     "send_sanction_finished_telegram_notice",
     "delete_gif_avatar_for_inactive_subscription",
     "emit_sanctions_update",
+    "sanctions_state_key",
+    "get_sanctions_state_cached",
     "build_user_out_payload",
     "emit_auth_profile_sync",
     "refresh_rooms_after",
@@ -289,6 +299,32 @@ SUSPEND_HOSTED_WORKOFF_LOOKAHEAD = timedelta(minutes=5)
 EXPIRED_SANCTION_CHAT_NOTICE_TTL_S = 60 * 60 * 24 * 365
 EXPIRED_SUBSCRIPTION_SYNC_TTL_S = 14 * 24 * 60 * 60
 SUBSCRIPTION_EXPIRING_SOON_NOTICE_BEFORE = timedelta(days=3)
+LIVE_ROOM_STATS_KEY = "rooms:live:stats"
+LIVE_ROOM_STATS_MAX_AGE_SECONDS = 30
+SANCTIONS_STATE_TTL_SECONDS = 60
+SANCTIONS_STATE_FILL_LUA = r"""
+if redis.call('HEXISTS', KEYS[1], 'ban_active') == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'ban_active', ARGV[2], 'timeout_expires_at', ARGV[3], 'suspend_expires_at', ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+LIVE_ROOM_STATS_STORE_LUA = r"""
+local stored = {}
+for i = 1, #ARGV, 2 do
+    local params_key = KEYS[2 + (i + 1) / 2]
+    if redis.call('EXISTS', params_key) == 1 and redis.call('ZSCORE', KEYS[2], ARGV[i]) then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+        stored[#stored + 1] = ARGV[i]
+    else
+        redis.call('HDEL', KEYS[1], ARGV[i])
+    end
+end
+return stored
+"""
+ROOM_GC_DUE_KEY = "rooms:gc:due"
+ROOM_SINGLE_GC_DUE_KEY = "rooms:gc:single_due"
 SUBSCRIPTION_EXPIRING_SOON_NOTICE_TTL_S = 14 * 24 * 60 * 60
 AUTO_DELETE_UNVERIFIED_ACCOUNT_LOCK_TTL_S = 60 * 60
 TIMED_KINDS = {SANCTION_TIMEOUT, SANCTION_SUSPEND}
@@ -1466,6 +1502,17 @@ def is_within_single_typo(candidate: str, query: str) -> bool:
     return edits <= 1
 
 
+def _filter_single_typo_candidates(candidates: Iterable[tuple[int, str]], needle: str) -> list[int]:
+    out: list[int] = []
+    seen: set[int] = set()
+    for user_id, candidate in candidates:
+        if user_id not in seen and is_within_single_typo(candidate, needle):
+            seen.add(user_id)
+            out.append(user_id)
+
+    return out
+
+
 async def find_user_ids_by_username_search(session: AsyncSession, username: str, *, include_deleted: bool = True) -> list[int]:
     needle = normalize_username_search_term(username)
     if not needle:
@@ -1487,13 +1534,8 @@ async def find_user_ids_by_username_search(session: AsyncSession, username: str,
     if len(needle) < 3:
         return []
 
-    candidate_rows = await session.execute(select(User.id, User.username).where(*filters))
-    fuzzy_ids: list[int] = []
-    for user_id, candidate_username in candidate_rows.all():
-        if candidate_username and is_within_single_typo(str(candidate_username), needle):
-            fuzzy_ids.append(int(user_id))
-
-    return fuzzy_ids
+    candidates = await find_fuzzy_username_candidates(session, needle, include_deleted=include_deleted)
+    return _filter_single_typo_candidates(candidates, needle)
 
 
 async def find_user_ids_by_admin_search(session: AsyncSession, query: str) -> list[int]:
@@ -1524,15 +1566,8 @@ async def find_user_ids_by_admin_search(session: AsyncSession, query: str) -> li
     if len(needle) < 3:
         return []
 
-    candidate_rows = await session.execute(select(User.id, User.username, User.telegram_nickname))
-    return [
-        int(user_id)
-        for user_id, candidate_username, candidate_telegram_nickname in candidate_rows.all()
-        if (
-            (candidate_username and is_within_single_typo(str(candidate_username), needle))
-            or (candidate_telegram_nickname and is_within_single_typo(str(candidate_telegram_nickname), needle))
-        )
-    ]
+    candidates = await find_fuzzy_username_candidates(session, needle, fields=("username", "telegram_nickname"))
+    return _filter_single_typo_candidates(candidates, needle)
 
 
 def normalize_password(raw: str, *, allow_whitespace: bool = False) -> str:
@@ -1590,6 +1625,50 @@ def bot_status_rate_key(payload: BotStatusIn, **_: object) -> str:
     return f"rl:bot:status:telegram:{int(payload.telegram_id)}"
 
 
+def sanctions_state_key(user_id: int) -> str:
+    return f"user:{int(user_id)}:sanctions_state"
+
+
+def _sanctions_state_mapping(active: dict[str, Optional[UserSanction]]) -> dict[str, str]:
+    timeout = active.get(SANCTION_TIMEOUT)
+    suspend = active.get(SANCTION_SUSPEND)
+    timeout_expires_at = cast(Optional[datetime], timeout.expires_at) if timeout else None
+    suspend_expires_at = cast(Optional[datetime], suspend.expires_at) if suspend else None
+    return {
+        "ban_active": "1" if active.get(SANCTION_BAN) else "0",
+        "timeout_expires_at": str(int(timeout_expires_at.timestamp()) if timeout_expires_at else 0),
+        "suspend_expires_at": str(int(suspend_expires_at.timestamp()) if suspend_expires_at else 0),
+    }
+
+
+async def get_sanctions_state_cached(db: AsyncSession, user_id: int) -> dict[str, int]:
+    key = sanctions_state_key(user_id)
+    r = get_redis()
+    try:
+        state = await r.hgetall(key)
+    except Exception:
+        state = {}
+
+    if not state or "ban_active" not in state:
+        state = _sanctions_state_mapping(await fetch_active_sanctions(db, int(user_id)))
+        with suppress(Exception):
+            await r.eval(
+                SANCTIONS_STATE_FILL_LUA,
+                1,
+                key,
+                SANCTIONS_STATE_TTL_SECONDS,
+                state["ban_active"],
+                state["timeout_expires_at"],
+                state["suspend_expires_at"],
+            )
+
+    return {
+        "ban_active": 1 if _parse_int(state.get("ban_active")) > 0 else 0,
+        "timeout_expires_at": _parse_int(state.get("timeout_expires_at")),
+        "suspend_expires_at": _parse_int(state.get("suspend_expires_at")),
+    }
+
+
 async def emit_sanctions_update(session: AsyncSession, user_id: int) -> None:
     active = await fetch_active_sanctions(session, user_id)
     timeout = active.get(SANCTION_TIMEOUT)
@@ -1597,19 +1676,12 @@ async def emit_sanctions_update(session: AsyncSession, user_id: int) -> None:
     suspend = active.get(SANCTION_SUSPEND)
     timeout_expires_at = cast(Optional[datetime], timeout.expires_at) if timeout else None
     suspend_expires_at = cast(Optional[datetime], suspend.expires_at) if suspend else None
-    timeout_ts = int(timeout_expires_at.timestamp()) if timeout_expires_at else 0
-    suspend_ts = int(suspend_expires_at.timestamp()) if suspend_expires_at else 0
     ban_active = bool(ban)
-    state_key = f"user:{int(user_id)}:sanctions_state"
     try:
-        await get_redis().hset(
-            state_key,
-            mapping={
-                "ban_active": "1" if ban_active else "0",
-                "timeout_expires_at": str(timeout_ts),
-                "suspend_expires_at": str(suspend_ts),
-            },
-        )
+        async with get_redis().pipeline() as p:
+            await p.hset(sanctions_state_key(user_id), mapping=_sanctions_state_mapping(active))
+            await p.expire(sanctions_state_key(user_id), SANCTIONS_STATE_TTL_SECONDS)
+            await p.execute()
     except Exception:
         pass
     payload = {
@@ -2406,11 +2478,11 @@ async def emit_expired_timed_sanctions_chat_notices(*, batch_limit: int = 100) -
 async def ensure_room_access_allowed(db: AsyncSession, user_id: int) -> None:
     from ..security.parameters import get_cached_settings
 
-    active = await fetch_active_sanctions(db, int(user_id))
-    if active.get(SANCTION_BAN):
+    state = await get_sanctions_state_cached(db, int(user_id))
+    if state["ban_active"]:
         raise HTTPException(status_code=403, detail="user_banned")
 
-    if active.get(SANCTION_TIMEOUT):
+    if state["timeout_expires_at"] > int(time()):
         raise HTTPException(status_code=403, detail="user_timeout")
 
     user = await db.get(User, int(user_id))
@@ -3523,7 +3595,7 @@ async def check_sanctions_expired(user_id: int, *, throttle_s: int = 30) -> None
         if not ok:
             return
 
-    key = f"user:{user_id}:sanctions_state"
+    key = sanctions_state_key(user_id)
     try:
         prev = await r.hgetall(key)
     except Exception:
@@ -3537,14 +3609,17 @@ async def check_sanctions_expired(user_id: int, *, throttle_s: int = 30) -> None
     next_suspend_ts = prev_suspend_ts if prev_suspend_ts > now_ts else 0
     if next_timeout_ts != prev_timeout_ts or next_suspend_ts != prev_suspend_ts:
         try:
-            await r.hset(
-                key,
-                mapping={
-                    "ban_active": "1" if prev_ban else "0",
-                    "timeout_expires_at": str(next_timeout_ts),
-                    "suspend_expires_at": str(next_suspend_ts),
-                },
-            )
+            async with r.pipeline() as p:
+                await p.hset(
+                    key,
+                    mapping={
+                        "ban_active": "1" if prev_ban else "0",
+                        "timeout_expires_at": str(next_timeout_ts),
+                        "suspend_expires_at": str(next_suspend_ts),
+                    },
+                )
+                await p.expire(key, SANCTIONS_STATE_TTL_SECONDS)
+                await p.execute()
         except Exception:
             pass
 
@@ -3725,6 +3800,20 @@ def normalize_pagination(page: int, limit: int) -> tuple[int, int, int]:
     return norm_limit, norm_page, offset
 
 
+def encode_keyset_cursor(created_at: datetime, row_id: int) -> str:
+    delta = created_at.astimezone(timezone.utc) - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return f"{delta // timedelta(microseconds=1)}.{int(row_id)}"
+
+
+def decode_keyset_cursor(raw: str) -> tuple[datetime, int]:
+    try:
+        micros, row_id = str(raw or "").split(".", 1)
+        return datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(microseconds=int(micros)), int(row_id)
+
+    except (TypeError, ValueError, OverflowError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid_cursor")
+
+
 async def build_registrations_series(session: AsyncSession, start_dt: datetime, end_dt: datetime) -> list[RegistrationsPoint]:
     from ..schemas.admin import RegistrationsPoint
 
@@ -3904,7 +3993,7 @@ async def _load_rooms_for_active_users_stats(session: AsyncSession, *, start_dt:
     live_stats: dict[int, dict[str, Any]] = {}
     if live_room_ids:
         try:
-            live_stats = await fetch_live_room_stats(get_redis(), live_room_ids)
+            live_stats = await get_live_room_stats(get_redis(), live_room_ids)
         except Exception:
             log.warning("admin_stats.active_users.live_fetch_failed", rooms=len(live_room_ids))
 
@@ -3987,7 +4076,7 @@ async def calc_total_stream_seconds(session: AsyncSession) -> int:
     live_stats: dict[int, dict[str, Any]] = {}
     if active_room_ids:
         try:
-            live_stats = await fetch_live_room_stats(get_redis(), sorted(set(active_room_ids)))
+            live_stats = await get_live_room_stats(get_redis(), sorted(set(active_room_ids)))
         except Exception:
             log.warning("admin_stats.total_stream.live_fetch_failed", rooms=len(active_room_ids))
 
@@ -4022,7 +4111,7 @@ async def calc_room_stream_seconds_in_range(session: AsyncSession, start_dt: dat
     live_stats: dict[int, dict[str, Any]] = {}
     if active_room_ids:
         try:
-            live_stats = await fetch_live_room_stats(get_redis(), sorted(set(active_room_ids)))
+            live_stats = await get_live_room_stats(get_redis(), sorted(set(active_room_ids)))
         except Exception:
             log.warning("admin_stats.period_stream.live_fetch_failed", rooms=len(active_room_ids))
 
@@ -4929,7 +5018,7 @@ def has_live_room_snapshot(stats: object) -> bool:
     return True
 
 
-async def fetch_live_room_stats(r, room_ids: list[int]) -> dict[int, dict[str, Any]]:
+async def _fetch_live_room_snapshots(r, room_ids: list[int]) -> dict[int, dict[str, Any]]:
     if not room_ids:
         return {}
 
@@ -4957,7 +5046,7 @@ async def fetch_live_room_stats(r, room_ids: list[int]) -> dict[int, dict[str, A
             await p.hgetall(f"room:{rid}:game")
         raw = await p.execute()
 
-    room_chunks: dict[int, dict[str, Any]] = {}
+    out: dict[int, dict[str, Any]] = {}
     join_reqs: list[tuple[int, str]] = []
     step = 9
     for idx, rid in enumerate(room_ids):
@@ -4981,8 +5070,7 @@ async def fetch_live_room_stats(r, room_ids: list[int]) -> dict[int, dict[str, A
         privacy_raw = params_vals[6] if len(params_vals) > 6 else None
         anonymity_raw = params_vals[7] if len(params_vals) > 7 else None
 
-        members = set(members_raw or [])
-        for uid in members:
+        for uid in set(members_raw or []):
             join_reqs.append((rid, str(uid)))
 
         game_payload: dict[str, Any] | None = None
@@ -5004,9 +5092,10 @@ async def fetch_live_room_stats(r, room_ids: list[int]) -> dict[int, dict[str, A
             except Exception:
                 game_payload = None
 
-        room_chunks[rid] = {
+        out[rid] = {
+            "at": now_ts,
             "visitors": _map_seconds(visitors_raw),
-            "members": members,
+            "visitors_join": {},
             "spectators": _map_seconds(spectators_raw),
             "spectators_join": _map_seconds(spectators_join_raw),
             "streams": _map_seconds(screen_raw),
@@ -5029,65 +5118,102 @@ async def fetch_live_room_stats(r, room_ids: list[int]) -> dict[int, dict[str, A
                 await p.hget(f"room:{rid}:user:{uid}:info", "join_date")
             join_vals = await p.execute()
         for i, (rid, uid) in enumerate(join_reqs):
-            join_ts = _parse_int(join_vals[i])
-            visitors_map: dict[str, int] = room_chunks[rid]["visitors"]
-            if join_ts > 0:
-                dt = now_ts - join_ts
-                if dt > 0:
-                    visitors_map[uid] = visitors_map.get(uid, 0) + dt
-                else:
-                    visitors_map.setdefault(uid, 0)
-            else:
-                visitors_map.setdefault(uid, 0)
+            out[rid]["visitors_join"][uid] = _parse_int(join_vals[i])
 
-    out: dict[int, dict[str, Any]] = {}
-    for rid, chunk in room_chunks.items():
-        spectators_map: dict[str, int] = chunk["spectators"]
-        for uid, join_ts in chunk["spectators_join"].items():
-            if join_ts > 0:
-                dt = now_ts - int(join_ts)
-                if dt > 0:
-                    spectators_map[uid] = spectators_map.get(uid, 0) + dt
-                else:
-                    spectators_map.setdefault(uid, 0)
-            else:
-                spectators_map.setdefault(uid, 0)
-
-        stream_map: dict[str, int] = chunk["streams"]
-        screen_owner = int(chunk["screen_owner"])
-        screen_started_at = int(chunk["screen_started_at"])
-        if screen_owner > 0:
-            owner_key = str(screen_owner)
-            if screen_started_at > 0:
-                dt = now_ts - screen_started_at
-                if dt > 0:
-                    stream_map[owner_key] = stream_map.get(owner_key, 0) + dt
-                else:
-                    stream_map.setdefault(owner_key, 0)
-            else:
-                stream_map.setdefault(owner_key, 0)
+    return out
 
-        stream_seconds = sum(int(v or 0) for v in stream_map.values())
-        out[rid] = {
-            "visitors": chunk["visitors"],
-            "spectators": spectators_map,
-            "streams": stream_map,
-            "visitors_count": len(chunk["visitors"]),
-            "spectators_count": len(spectators_map),
-            "stream_seconds": stream_seconds,
-            "has_stream": bool(stream_map) or screen_owner > 0,
-            "title": chunk["title"],
-            "user_limit": chunk["user_limit"],
-            "creator": chunk["creator"],
-            "creator_name": chunk["creator_name"],
-            "creator_avatar_name": chunk["creator_avatar_name"],
-            "created_at": chunk["created_at"],
-            "privacy": chunk["privacy"],
-            "anonymity": chunk["anonymity"],
-            "game": chunk["game"],
-        }
 
-    return out
+def _add_open_seconds(target: dict[str, int], uid: str, started_at: int, now_ts: int) -> None:
+    dt = now_ts - int(started_at or 0) if started_at and started_at > 0 else 0
+    if dt > 0:
+        target[uid] = target.get(uid, 0) + dt
+    else:
+        target.setdefault(uid, 0)
+
+
+def finalize_live_room_snapshot(snapshot: Mapping[str, Any], now_ts: int | None = None) -> dict[str, Any]:
+    now_ts = int(time()) if now_ts is None else now_ts
+    visitors_map = dict(snapshot.get("visitors") or {})
+    for uid, join_ts in (snapshot.get("visitors_join") or {}).items():
+        _add_open_seconds(visitors_map, str(uid), int(join_ts or 0), now_ts)
+
+    spectators_map = dict(snapshot.get("spectators") or {})
+    for uid, join_ts in (snapshot.get("spectators_join") or {}).items():
+        _add_open_seconds(spectators_map, str(uid), int(join_ts or 0), now_ts)
+
+    stream_map = dict(snapshot.get("streams") or {})
+    screen_owner = int(snapshot.get("screen_owner") or 0)
+    if screen_owner > 0:
+        _add_open_seconds(stream_map, str(screen_owner), int(snapshot.get("screen_started_at") or 0), now_ts)
+
+    return {
+        "visitors": visitors_map,
+        "spectators": spectators_map,
+        "streams": stream_map,
+        "visitors_count": len(visitors_map),
+        "spectators_count": len(spectators_map),
+        "stream_seconds": sum(int(v or 0) for v in stream_map.values()),
+        "has_stream": bool(stream_map) or screen_owner > 0,
+        "title": snapshot.get("title"),
+        "user_limit": snapshot.get("user_limit"),
+        "creator": snapshot.get("creator"),
+        "creator_name": snapshot.get("creator_name"),
+        "creator_avatar_name": snapshot.get("creator_avatar_name"),
+        "created_at": snapshot.get("created_at"),
+        "privacy": snapshot.get("privacy"),
+        "anonymity": snapshot.get("anonymity"),
+        "game": snapshot.get("game"),
+    }
+
+
+async def fetch_live_room_stats(r, room_ids: list[int]) -> dict[int, dict[str, Any]]:
+    snapshots = await _fetch_live_room_snapshots(r, room_ids)
+    now_ts = int(time())
+    return {rid: finalize_live_room_snapshot(snapshot, now_ts) for rid, snapshot in snapshots.items()}
+
+
+async def refresh_live_room_snapshots(r, room_ids: list[int]) -> dict[int, dict[str, Any]]:
+    snapshots = await _fetch_live_room_snapshots(r, room_ids)
+    if not snapshots:
+        return {}
+
+    args: list[str] = []
+    for rid, snapshot in snapshots.items():
+        args += [str(rid), json.dumps(snapshot, ensure_ascii=False, separators=(",", ":"))]
+    stored = await r.eval(
+        LIVE_ROOM_STATS_STORE_LUA,
+        2 + len(snapshots),
+        LIVE_ROOM_STATS_KEY,
+        "rooms:index",
+        *[f"room:{rid}:params" for rid in snapshots],
+        *args,
+    )
+    live = {int(rid) for rid in stored or []}
+    return {rid: snapshot for rid, snapshot in snapshots.items() if rid in live}
+
+
+async def get_live_room_stats(r, room_ids: list[int]) -> dict[int, dict[str, Any]]:
+    if not room_ids:
+        return {}
+
+    now_ts = int(time())
+    snapshots: dict[int, dict[str, Any]] = {}
+    missing: list[int] = []
+    for rid, raw in zip(room_ids, await r.hmget(LIVE_ROOM_STATS_KEY, *[str(rid) for rid in room_ids])):
+        try:
+            snapshot = json.loads(raw) if raw else None
+        except Exception:
+            snapshot = None
+        if not snapshot or now_ts - int(snapshot.get("at") or 0) > LIVE_ROOM_STATS_MAX_AGE_SECONDS:
+            missing.append(rid)
+            continue
+
+        snapshots[rid] = snapshot
+
+    if missing:
+        snapshots.update(await refresh_live_room_snapshots(r, missing))
+
+    return {rid: finalize_live_room_snapshot(snapshots[rid], now_ts) for rid in room_ids if rid in snapshots}
 
 
 async def _fetch_users_last_room_activity_id(session: AsyncSession, ids: list[int], *, room_column: Any, live_key: str, log_event: str) -> dict[int, int | None]:
@@ -5112,7 +5238,7 @@ async def _fetch_users_last_room_activity_id(session: AsyncSession, ids: list[in
     live_stats: dict[int, dict[str, Any]] = {}
     if active_room_ids:
         try:
-            live_stats = await fetch_live_room_stats(get_redis(), sorted(set(active_room_ids)))
+            live_stats = await get_live_room_stats(get_redis(), sorted(set(active_room_ids)))
         except Exception:
             log.warning(log_event, rooms=len(active_room_ids))
 
@@ -5239,7 +5365,7 @@ async def aggregate_user_room_time_stats(session: AsyncSession, ids: list[int],
     active_room_ids = [int(rid) for rid, deleted_at, _vis, _scr, _spec in room_rows if deleted_at is None]
     if active_room_ids:
         try:
-            live_stats = await fetch_live_room_stats(get_redis(), sorted(set(active_room_ids)))
+            live_stats = await get_live_room_stats(get_redis(), sorted(set(active_room_ids)))
         except Exception:
             log.warning("user_room_stats.live_fetch_failed", rooms=len(active_room_ids))
 
@@ -5442,26 +5568,23 @@ async def emit_rooms_upsert(rid: int) -> None:
         log.warning("rooms.upsert.emit_failed", rid=rid, err=type(e).__name__)
 
 
-async def gc_room_after_delay(rid: int, delay_s: int | None = None) -> None:
-    from ..realtime.utils import gc_empty_room
-
-    if delay_s is None:
-        from ..security.parameters import get_cached_settings
-        delay_s = max(0, int(get_cached_settings().rooms_empty_ttl_seconds))
-
-    await asyncio.sleep(max(0, delay_s))
-    await gc_empty_room(rid)
-
+async def enqueue_room_gc(r, rid: int) -> bool:
+    from ..security.parameters import get_cached_settings
 
-def schedule_room_gc(rid: int, delay_s: int | None = None) -> None:
-    asyncio.create_task(gc_room_after_delay(rid, delay_s))
+    empty_since = _parse_int(await r.get(f"room:{rid}:empty_since"))
+    if empty_since <= 0:
+        return False
 
+    ttl_seconds = max(0, int(get_cached_settings().rooms_empty_ttl_seconds))
+    await r.zadd(ROOM_GC_DUE_KEY, {str(int(rid)): empty_since + ttl_seconds})
+    return True
 
-async def gc_empty_room_and_emit(rid: int, *, expected_seq: int | None = None) -> None:
-    from ..realtime.utils import gc_empty_room
 
-    with suppress(Exception):
-        await gc_empty_room(rid, expected_seq=expected_seq)
+async def enqueue_room_gc_safe(rid: int) -> None:
+    try:
+        await enqueue_room_gc(get_redis(), rid)
+    except Exception:
+        log.warning("gc.enqueue_failed", rid=rid)
 
 
 async def refresh_rooms_after(delay_s: int, reason: str) -> None:
@@ -5710,7 +5833,7 @@ async def close_room_as_staff(*, room_id: int, ident: Identity, session: AsyncSe
             occ = -1
         should_gc = occ == 0
     if should_gc:
-        asyncio.create_task(gc_empty_room_and_emit(room_id, expected_seq=gc_seq_on_empty))
+        await enqueue_room_gc_safe(room_id)
 
     details = (
         f"Закрытие комнаты room_id={room_id} title={title} "
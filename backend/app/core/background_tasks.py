@@ -2,10 +2,11 @@ from __future__ import annotations
 import asyncio
 from contextlib import suppress
 from datetime import datetime, timedelta, timezone
-from time import time
+from time import monotonic, time
 from typing import Any
 from sqlalchemy import select
 from ..api.utils import (
+    ROOM_GC_DUE_KEY,
     delete_stale_unverified_accounts,
     emit_auth_profile_sync,
     emit_expired_timed_sanctions_chat_notices,
@@ -14,17 +15,40 @@ from ..api.utils import (
     sync_expired_profile_subscriptions,
 )
 from ..models.user import User
-from ..security.parameters import refresh_app_settings
-from ..services.minio import delete_stale_pending_chat_images_async, ensure_bucket
+from ..realtime.connections import (
+    SESSION_REVOKE_CHANNEL,
+    SESSION_SWEEP_INTERVAL_SECONDS,
+    apply_session_revocation,
+    sweep_local_socket_sessions,
+)
+from ..security.parameters import get_cached_settings, refresh_app_settings
+from ..services.audit_log import reset_log_actions_cache, run_audit_log_sink, stop_audit_log_sink
+from ..services.log_partitions import backfill_unpartitioned_logs, maintain_log_partitions
+from ..services.minio import delete_stale_pending_chat_images_async, ensure_bucket, shutdown_chat_image_pool
+from ..services.moderation_sweep import stop_moderation_sweep
 from ..services.nickname_limits import reset_monthly_nickname_change_limits
 from ..services.telegram import get_telegram_nickname
 from .clients import get_redis
 from .db import SessionLocal
+from .loop_monitor import start_loop_monitor, stop_loop_monitor
+from .metrics import (
+    METRICS_PUBLISH_INTERVAL_SECONDS,
+    publish_metrics_snapshot,
+    record_loop_failure,
+    record_loop_lag,
+    record_loop_success,
+    set_gauge,
+    withdraw_metrics_snapshot,
+)
+from .settings import settings
 
 __all__ = ["LifespanBackgroundTasks", "verify_runtime_dependencies"]
 
 EMPTY_ROOM_MARKER_TTL_SECONDS = 30 * 24 * 60 * 60
 EMPTY_ROOM_GC_SCAN_INTERVAL_SECONDS = 60
+LOG_BACKFILL_PAUSE_SECONDS = 0.2
+LOG_BACKFILL_RETRY_SECONDS = 60
+ROOM_GC_POLL_INTERVAL_SECONDS = 1.0
 TELEGRAM_NICKNAME_SYNC_INTERVAL_SECONDS = 1.0
 
 
@@ -59,16 +83,28 @@ class LifespanBackgroundTasks:
         self._empty_rooms_gc_task: asyncio.Task[None] | None = None
         self._stale_chat_uploads_task: asyncio.Task[None] | None = None
         self._telegram_nickname_sync_task: asyncio.Task[None] | None = None
-        self._empty_room_gc_tasks: dict[int, asyncio.Task[None]] = {}
+        self._session_revocation_task: asyncio.Task[None] | None = None
+        self._session_sweep_task: asyncio.Task[None] | None = None
+        self._audit_log_task: asyncio.Task[None] | None = None
+        self._log_partitions_task: asyncio.Task[None] | None = None
+        self._metrics_task: asyncio.Task[None] | None = None
+        self._room_gc_task: asyncio.Task[None] | None = None
 
     def start(self) -> None:
+        start_loop_monitor(get_redis(), threshold_ms=settings.LOOP_STALL_THRESHOLD_MS)
         self._settings_task = asyncio.create_task(self.settings_pubsub_loop())
         self._expired_sanctions_chat_task = asyncio.create_task(self.expired_sanctions_chat_loop())
         self._expired_subscriptions_task = asyncio.create_task(self.expired_profile_subscriptions_loop())
         self._stale_unverified_accounts_task = asyncio.create_task(self.stale_unverified_accounts_loop())
         self._empty_rooms_gc_task = asyncio.create_task(self.empty_rooms_gc_loop())
+        self._room_gc_task = asyncio.create_task(self.room_gc_loop())
         self._stale_chat_uploads_task = asyncio.create_task(self.stale_chat_uploads_loop())
         self._telegram_nickname_sync_task = asyncio.create_task(self.telegram_nickname_sync_loop())
+        self._session_revocation_task = asyncio.create_task(self.session_revocation_loop())
+        self._session_sweep_task = asyncio.create_task(self.session_sweep_loop())
+        self._audit_log_task = asyncio.create_task(run_audit_log_sink())
+        self._log_partitions_task = asyncio.create_task(self.log_partitions_loop())
+        self._metrics_task = asyncio.create_task(self.metrics_publish_loop())
 
     async def stop(self) -> None:
         try:
@@ -78,17 +114,34 @@ class LifespanBackgroundTasks:
                 self._expired_subscriptions_task,
                 self._stale_unverified_accounts_task,
                 self._empty_rooms_gc_task,
+                self._room_gc_task,
                 self._stale_chat_uploads_task,
                 self._telegram_nickname_sync_task,
+                self._session_revocation_task,
+                self._session_sweep_task,
+                self._log_partitions_task,
+                self._metrics_task,
             )
             for managed_task in managed_tasks:
                 await self._cancel_and_wait(managed_task)
-            for gc_task in tuple(self._empty_room_gc_tasks.values()):
-                await self._cancel_and_wait(gc_task)
-            self._empty_room_gc_tasks.clear()
+            await stop_audit_log_sink(self._audit_log_task)
+            await stop_loop_monitor()
+            await withdraw_metrics_snapshot(get_redis())
+            shutdown_chat_image_pool()
         except Exception:
             self._log.warning("app.shutdown.settings_task_failed")
 
+        try:
+            await stop_moderation_sweep()
+        except Exception:
+            self._log.warning("app.shutdown.moderation_sweep_failed")
+
+    @staticmethod
+    async def _sleep(loop: str, delay_s: float) -> None:
+        started = monotonic()
+        await asyncio.sleep(delay_s)
+        record_loop_lag(loop, monotonic() - started - delay_s)
+
     @staticmethod
     async def _cancel_and_wait(background_task: asyncio.Task[None] | None) -> None:
         if background_task is None:
@@ -97,27 +150,6 @@ class LifespanBackgroundTasks:
         with suppress(asyncio.CancelledError):
             await background_task
 
-    def schedule_empty_room_gc(self, room_id: int) -> None:
-        rid = int(room_id)
-        existing = self._empty_room_gc_tasks.get(rid)
-        if existing and not existing.done():
-            return
-
-        async def _runner() -> None:
-            try:
-                from ..realtime.utils import gc_empty_room
-                await gc_empty_room(rid)
-            except asyncio.CancelledError:
-                raise
-            except Exception:
-                self._log.exception("app.rooms.empty_gc.recovery_failed", rid=rid)
-            finally:
-                current = self._empty_room_gc_tasks.get(rid)
-                if current is asyncio.current_task():
-                    del self._empty_room_gc_tasks[rid]
-
-        self._empty_room_gc_tasks[rid] = asyncio.create_task(_runner())
-
     async def recover_empty_rooms_gc(self) -> None:
         r = get_redis()
         try:
@@ -150,6 +182,8 @@ class LifespanBackgroundTasks:
             return
 
         now_ts = str(int(time()))
+        ttl_seconds = max(0, int(get_cached_settings().rooms_empty_ttl_seconds))
+        due: dict[str, int] = {}
         for index, rid in enumerate(room_ids):
             raw_occupancy, raw_phase, raw_empty_since = rows[index * 3: index * 3 + 3]
             try:
@@ -173,20 +207,48 @@ class LifespanBackgroundTasks:
                         await r.set(marker_key, now_ts, xx=True, ex=EMPTY_ROOM_MARKER_TTL_SECONDS)
                     else:
                         await r.set(marker_key, now_ts, nx=True, ex=EMPTY_ROOM_MARKER_TTL_SECONDS)
+                    empty_since = str(await r.get(marker_key) or now_ts)
                 except Exception:
                     self._log.exception("app.rooms.empty_gc.empty_since_restore_failed", rid=rid)
                     continue
 
-            self.schedule_empty_room_gc(rid)
+            due[str(rid)] = int(empty_since) + ttl_seconds
+
+        if due:
+            await r.zadd(ROOM_GC_DUE_KEY, due, nx=True)
 
     async def empty_rooms_gc_loop(self) -> None:
         try:
             while True:
                 try:
                     await self.recover_empty_rooms_gc()
+                    record_loop_success("empty_rooms_gc")
                 except Exception:
+                    record_loop_failure("empty_rooms_gc")
                     self._log.exception("app.rooms.empty_gc.recovery_loop_failed")
-                await asyncio.sleep(EMPTY_ROOM_GC_SCAN_INTERVAL_SECONDS)
+                await self._sleep("empty_rooms_gc", EMPTY_ROOM_GC_SCAN_INTERVAL_SECONDS)
+        except asyncio.CancelledError:
+            pass
+
+    async def room_gc_loop(self) -> None:
+        from ..realtime.utils import ROOM_GC_BATCH_SIZE, get_room_gc_backlog, run_room_gc_batch, run_single_room_gc_batch
+
+        try:
+            while True:
+                try:
+                    while await run_single_room_gc_batch() >= ROOM_GC_BATCH_SIZE:
+                        await asyncio.sleep(0)
+                    while await run_room_gc_batch() >= ROOM_GC_BATCH_SIZE:
+                        await asyncio.sleep(0)
+                    backlog = await get_room_gc_backlog(get_redis())
+                    set_gauge("room_gc_backlog", backlog["due"], queue="empty")
+                    set_gauge("room_gc_backlog", backlog["single_due"], queue="single")
+                    set_gauge("room_gc_lag_seconds", backlog["lag_seconds"])
+                    record_loop_success("room_gc")
+                except Exception:
+                    record_loop_failure("room_gc")
+                    self._log.exception("app.rooms.gc.batch_failed")
+                await self._sleep("room_gc", ROOM_GC_POLL_INTERVAL_SECONDS)
         except asyncio.CancelledError:
             pass
 
@@ -195,12 +257,14 @@ class LifespanBackgroundTasks:
             while True:
                 next_run = _next_local_daily_run_at(hour=3, minute=0)
                 delay_s = max(0.0, (next_run - datetime.now(next_run.tzinfo)).total_seconds())
-                await asyncio.sleep(delay_s)
+                await self._sleep("stale_chat_uploads", delay_s)
                 try:
                     deleted = await delete_stale_pending_chat_images_async()
                     if deleted:
                         self._log.info("app.chat.pending_uploads_cleaned", deleted=deleted)
+                    record_loop_success("stale_chat_uploads")
                 except Exception:
+                    record_loop_failure("stale_chat_uploads")
                     self._log.exception("app.chat.pending_upload_cleanup_failed")
         except asyncio.CancelledError:
             pass
@@ -215,10 +279,12 @@ class LifespanBackgroundTasks:
                     run_at=next_run.isoformat(),
                     delay_s=int(delay_s),
                 )
-                await asyncio.sleep(delay_s)
+                await self._sleep("telegram_nickname_sync", delay_s)
                 try:
                     await self.sync_telegram_nicknames()
+                    record_loop_success("telegram_nickname_sync")
                 except Exception:
+                    record_loop_failure("telegram_nickname_sync")
                     self._log.exception("app.telegram_nicknames.sync_failed")
         except asyncio.CancelledError:
             pass
@@ -301,7 +367,9 @@ class LifespanBackgroundTasks:
                 try:
                     async with SessionLocal() as session:
                         await refresh_app_settings(session)
+                    record_loop_success("settings_pubsub")
                 except Exception:
+                    record_loop_failure("settings_pubsub")
                     self._log.warning("app.settings.refresh_failed")
         except asyncio.CancelledError:
             pass
@@ -311,14 +379,98 @@ class LifespanBackgroundTasks:
             with suppress(Exception):
                 await pubsub.close()
 
+    async def session_revocation_loop(self) -> None:
+        try:
+            while True:
+                pubsub = get_redis().pubsub()
+                try:
+                    await pubsub.subscribe(SESSION_REVOKE_CHANNEL)
+                    async for message in pubsub.listen():
+                        if not message or message.get("type") != "message":
+                            continue
+                        try:
+                            await apply_session_revocation(str(message.get("data") or ""))
+                            record_loop_success("session_revocation")
+                        except Exception:
+                            record_loop_failure("session_revocation")
+                            self._log.exception("app.sessions.revocation_failed")
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    self._log.warning("app.sessions.revocation_listener_failed")
+                finally:
+                    with suppress(Exception):
+                        await pubsub.unsubscribe(SESSION_REVOKE_CHANNEL)
+                    with suppress(Exception):
+                        await pubsub.close()
+                await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            pass
+
+    async def session_sweep_loop(self) -> None:
+        try:
+            while True:
+                await self._sleep("session_sweep", SESSION_SWEEP_INTERVAL_SECONDS)
+                try:
+                    await sweep_local_socket_sessions()
+                    record_loop_success("session_sweep")
+                except Exception:
+                    record_loop_failure("session_sweep")
+                    self._log.exception("app.sessions.sweep_failed")
+        except asyncio.CancelledError:
+            pass
+
     async def expired_sanctions_chat_loop(self) -> None:
         try:
             while True:
                 try:
                     await emit_expired_timed_sanctions_chat_notices()
+                    record_loop_success("expired_sanctions_chat")
                 except Exception:
+                    record_loop_failure("expired_sanctions_chat")
                     self._log.exception("app.sanctions.expired_chat_loop_failed")
-                await asyncio.sleep(15)
+                await self._sleep("expired_sanctions_chat", 15)
+        except asyncio.CancelledError:
+            pass
+
+    async def backfill_log_partitions(self) -> None:
+        moved_total = 0
+        while True:
+            try:
+                moved = await backfill_unpartitioned_logs()
+            except Exception:
+                record_loop_failure("log_partitions")
+                self._log.exception("app.logs.partitions_backfill_failed", moved=moved_total)
+                await self._sleep("log_partitions", LOG_BACKFILL_RETRY_SECONDS)
+                continue
+
+            if moved is None:
+                return
+            if moved == 0:
+                await reset_log_actions_cache()
+                self._log.info("app.logs.partitions_backfilled", moved=moved_total)
+                return
+
+            moved_total += moved
+            await self._sleep("log_partitions", LOG_BACKFILL_PAUSE_SECONDS)
+
+    async def log_partitions_loop(self) -> None:
+        try:
+            await self.backfill_log_partitions()
+            while True:
+                next_run = _next_local_daily_run_at(hour=4, minute=30)
+                delay_s = max(0.0, (next_run - datetime.now(next_run.tzinfo)).total_seconds())
+                await self._sleep("log_partitions", delay_s)
+                try:
+                    created, dropped = await maintain_log_partitions()
+                    if dropped:
+                        await reset_log_actions_cache()
+                    if created or dropped:
+                        self._log.info("app.logs.partitions_maintained", created=created, dropped=dropped)
+                    record_loop_success("log_partitions")
+                except Exception:
+                    record_loop_failure("log_partitions")
+                    self._log.exception("app.logs.partitions_maintenance_failed")
         except asyncio.CancelledError:
             pass
 
@@ -329,9 +481,11 @@ class LifespanBackgroundTasks:
                     deleted = await delete_stale_unverified_accounts()
                     if deleted > 0:
                         self._log.info("app.users.auto_delete_unverified.done", deleted=deleted)
+                    record_loop_success("stale_unverified_accounts")
                 except Exception:
+                    record_loop_failure("stale_unverified_accounts")
                     self._log.exception("app.users.auto_delete_unverified.failed")
-                await asyncio.sleep(15 * 60)
+                await self._sleep("stale_unverified_accounts", 15 * 60)
         except asyncio.CancelledError:
             pass
 
@@ -345,7 +499,8 @@ class LifespanBackgroundTasks:
                     run_at=next_run.isoformat(),
                     delay_s=int(delay_s),
                 )
-                await asyncio.sleep(delay_s)
+                await self._sleep("expired_profile_subscriptions", delay_s)
+                failed = False
                 try:
                     reset_users = await reset_monthly_nickname_change_limits()
                     if reset_users > 0:
@@ -357,6 +512,7 @@ class LifespanBackgroundTasks:
                             scheduled_at=next_run.isoformat(),
                         )
                 except Exception:
+                    failed = True
                     self._log.exception("app.users.nickname_changes_monthly_reset.failed")
                 try:
                     synced = await sync_expired_profile_subscriptions()
@@ -366,6 +522,7 @@ class LifespanBackgroundTasks:
                         scheduled_at=next_run.isoformat(),
                     )
                 except Exception:
+                    failed = True
                     self._log.exception("app.subscriptions.expired_sync.failed")
                 try:
                     notified = await notify_expiring_profile_subscriptions()
@@ -375,7 +532,25 @@ class LifespanBackgroundTasks:
                         scheduled_at=next_run.isoformat(),
                     )
                 except Exception:
+                    failed = True
                     self._log.exception("app.subscriptions.expiring_soon.failed")
+                if failed:
+                    record_loop_failure("expired_profile_subscriptions")
+                else:
+                    record_loop_success("expired_profile_subscriptions")
+        except asyncio.CancelledError:
+            pass
+
+    async def metrics_publish_loop(self) -> None:
+        try:
+            while True:
+                try:
+                    await publish_metrics_snapshot(get_redis())
+                    record_loop_success("metrics_publish")
+                except Exception:
+                    record_loop_failure("metrics_publish")
+                    self._log.warning("app.metrics.publish_failed")
+                await self._sleep("metrics_publish", METRICS_PUBLISH_INTERVAL_SECONDS)
         except asyncio.CancelledError:
             pass
 
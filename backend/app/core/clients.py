@@ -2,7 +2,9 @@ from __future__ import annotations
 import structlog
 import redis.asyncio as redis
 from minio import Minio
+from redis.asyncio.client import Pipeline
 from ..core.settings import settings
+from .metrics import observe
 
 log = structlog.get_logger()
 
@@ -11,8 +13,19 @@ _minio_private: Minio | None = None
 _minio_public: Minio | None = None
 
 
+class _MeteredPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        observe("redis_pipeline_commands", len(self.command_stack))
+        return await super().execute(raise_on_error)
+
+
+class _MeteredRedis(redis.Redis):
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> Pipeline:
+        return _MeteredPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
 def _build_redis() -> redis.Redis:
-    return redis.Redis(
+    return _MeteredRedis(
         host=settings.REDIS_HOST,
         port=settings.REDIS_PORT,
         password=settings.REDIS_PASSWORD or None,
@@ -5,11 +5,13 @@ from typing import AsyncIterator
 from sqlalchemy import text
 from ..security.admin_guard import assert_protected_admin_invariants
 from ..security.parameters import ensure_app_settings
+from ..services.log_partitions import prepare_log_partitions
 from ..services.sanction_rules import ensure_sanction_rules
 from .background_tasks import LifespanBackgroundTasks, verify_runtime_dependencies
 from .clients import close_clients, init_clients
 from .db import Base, SessionLocal, engine
-from .logging import configure_logging
+from .metrics import instrument_db_pool
+from .logging import configure_logging, get_logging_stats, shutdown_logging
 from .settings import settings
 
 
@@ -20,6 +22,7 @@ async def lifespan(app) -> AsyncIterator[None]:
     log.info("app.startup", project=settings.PROJECT_NAME, domain=settings.DOMAIN)
 
     init_clients()
+    instrument_db_pool(engine.sync_engine.pool)
 
     try:
         async with engine.begin() as conn:
@@ -36,8 +39,24 @@ async def lifespan(app) -> AsyncIterator[None]:
             await conn.execute(text(
                 "ALTER TABLE users ADD COLUMN IF NOT EXISTS streaming_url VARCHAR(512)"
             ))
+            await conn.execute(text(
+                "ALTER TABLE global_chat_messages ADD COLUMN IF NOT EXISTS image_meta JSONB"
+            ))
+            await prepare_log_partitions(conn)
             # 2222222222222222222222222222222222222222222222
 
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                await conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_users_username_trgm ON users USING gin (lower(username) gin_trgm_ops)"
+                ))
+                await conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS ix_users_telegram_nickname_trgm ON users USING gin (lower(telegram_nickname) gin_trgm_ops)"
+                ))
+        except Exception:
+            log.warning("app.startup.trigram_indexes_unavailable")
+
         async with SessionLocal() as session:
             await ensure_app_settings(session)
             await ensure_sanction_rules(session)
@@ -72,4 +91,5 @@ async def lifespan(app) -> AsyncIterator[None]:
         except Exception:
             log.warning("app.shutdown.engine_dispose_failed")
 
-        log.info("app.shutdown.ok")
+        log.info("app.shutdown.ok", **get_logging_stats())
+        shutdown_logging()
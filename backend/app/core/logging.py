@@ -1,21 +1,143 @@
 from __future__ import annotations
+import asyncio
 import json
 import logging
+import queue
+import random
 import sys
+import threading
+import zlib
+from logging.handlers import QueueHandler, QueueListener
 from typing import Any
 import structlog
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 from ..models.log import AppLog
+from ..services.audit_log import enqueue_audit_log, remember_log_actions
+from .settings import settings
+
+SAMPLED_LOG_EVENTS = frozenset({"request.start", "route.start", "route.end"})
+_SAMPLED_LOG_LEVELS = frozenset({"debug", "info"})
+
+_log_stats = {"dropped": 0, "sampled_out": 0, "evicted": 0}
+_log_stats_lock = threading.Lock()
+_log_listener: QueueListener | None = None
+_PENDING_LOG_ACTIONS_KEY = "pending_log_actions"
+_remember_tasks: set[asyncio.Task[None]] = set()
+
+
+def _bump_log_stat(name: str) -> None:
+    with _log_stats_lock:
+        _log_stats[name] += 1
+
+
+class _BoundedQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.structlog_contextvars = structlog.contextvars.get_contextvars()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            return
+
+        except queue.Full:
+            pass
+
+        if record.levelno < logging.WARNING:
+            _bump_log_stat("dropped")
+            return
+
+        try:
+            self.queue.get_nowait()
+            _bump_log_stat("evicted")
+        except queue.Empty:
+            pass
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _bump_log_stat("dropped")
+
+
+def _sample_noisy_events(_, __, event_dict: dict[str, Any]) -> dict[str, Any]:
+    rate = settings.LOG_SAMPLE_RATE
+    if rate >= 1.0 or event_dict.get("level") not in _SAMPLED_LOG_LEVELS or event_dict.get("event") not in SAMPLED_LOG_EVENTS:
+        return event_dict
+
+    request_id = event_dict.get("request_id")
+    if request_id:
+        keep = zlib.crc32(str(request_id).encode()) % 10000 < rate * 10000
+    else:
+        keep = random.random() < rate
+
+    if not keep:
+        _bump_log_stat("sampled_out")
+        raise structlog.DropEvent
+
+    return event_dict
+
+
+def _merge_record_contextvars(_, __, event_dict: dict[str, Any]) -> dict[str, Any]:
+    record = event_dict.get("_record")
+    for key, value in (getattr(record, "structlog_contextvars", None) or {}).items():
+        event_dict.setdefault(key, value)
+
+    return event_dict
+
+
+def get_logging_stats() -> dict[str, int]:
+    with _log_stats_lock:
+        stats = dict(_log_stats)
+    listener = _log_listener
+    stats["queued"] = listener.queue.qsize() if listener else 0
+    return stats
+
+
+def shutdown_logging() -> None:
+    global _log_listener
+    listener, _log_listener = _log_listener, None
+    if listener is None:
+        return
+
+    listener.stop()
+    root = logging.getLogger()
+    root.handlers = list(listener.handlers)
+
+
+@event.listens_for(Session, "after_commit")
+def _remember_committed_log_actions(session: Session) -> None:
+    actions = session.info.pop(_PENDING_LOG_ACTIONS_KEY, None)
+    if not actions:
+        return
+
+    try:
+        task = asyncio.get_running_loop().create_task(remember_log_actions(actions))
+    except RuntimeError:
+        return
+
+    _remember_tasks.add(task)
+    task.add_done_callback(_remember_tasks.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_log_actions(session: Session) -> None:
+    session.info.pop(_PENDING_LOG_ACTIONS_KEY, None)
 
 
 def configure_logging() -> None:
-    pre = [
-        structlog.contextvars.merge_contextvars,
+    global _log_listener
+    shutdown_logging()
+
+    shared = [
         structlog.processors.add_log_level,
+        _sample_noisy_events,
         structlog.processors.StackInfoRenderer(),
         structlog.processors.format_exc_info,
         structlog.processors.TimeStamper(fmt="iso", utc=True),
     ]
+    pre = [structlog.contextvars.merge_contextvars, *shared]
 
     structlog.configure(
         processors=[*pre, structlog.stdlib.ProcessorFormatter.wrap_for_formatter],
@@ -28,12 +150,16 @@ def configure_logging() -> None:
     handler = logging.StreamHandler(sys.stdout)
     handler.setFormatter(
         structlog.stdlib.ProcessorFormatter(
-            processor=structlog.processors.JSONRenderer(), foreign_pre_chain=pre
+            processor=structlog.processors.JSONRenderer(), foreign_pre_chain=[_merge_record_contextvars, *shared]
         )
     )
 
+    log_queue: queue.Queue[logging.LogRecord] = queue.Queue(maxsize=max(1, settings.LOG_QUEUE_SIZE))
+    _log_listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _log_listener.start()
+
     root = logging.getLogger()
-    root.handlers = [handler]
+    root.handlers = [_BoundedQueueHandler(log_queue)]
     root.setLevel(logging.INFO)
 
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
@@ -46,6 +172,18 @@ async def log_action(db: AsyncSession, *, user_id: int | None, username: str | N
         except Exception:
             details = str(details)
 
-    db.add(AppLog(user_id=user_id, username=username, action=action, details=details or ""))
-    if commit:
+    if not commit:
+        db.add(AppLog(user_id=user_id, username=username, action=action, details=details or ""))
+        db.info.setdefault(_PENDING_LOG_ACTIONS_KEY, set()).add(action)
+        return
+
+    if db.new or db.dirty or db.deleted:
+        db.add(AppLog(user_id=user_id, username=username, action=action, details=details or ""))
         await db.commit()
+        await remember_log_actions({action})
+        return
+
+    if db.in_transaction():
+        await db.commit()
+
+    enqueue_audit_log(user_id=user_id, username=username, action=action, details=details or "")
@@ -0,0 +1,204 @@
+from __future__ import annotations
+import asyncio
+import json
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from contextlib import suppress
+from time import monotonic
+from typing import Any
+import structlog
+from redis.asyncio import Redis
+from .metrics import inc_counter, register_collector, set_gauge, worker_id
+
+log = structlog.get_logger()
+
+LOOP_LAG_PROBE_INTERVAL_SECONDS = 0.1
+LOOP_LAG_WINDOW_SIZE = 600
+LOOP_STALL_SAMPLE_INTERVAL_SECONDS = 0.05
+LOOP_STALL_MAX_SAMPLES = 20
+LOOP_STALL_STACK_DEPTH = 30
+LOOP_STALLS_KEY = "diag:loop_stalls"
+LOOP_STALLS_KEEP = 50
+
+_CONTEXT_KEYS = ("request_id", "method", "path", "route", "auth_user_id", "sio_namespace", "sio_event", "sid")
+
+_lags: deque[float] = deque(maxlen=LOOP_LAG_WINDOW_SIZE)
+_heartbeat = monotonic()
+_threshold_s = 0.25
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_thread_id: int | None = None
+_lock = threading.Lock()
+_active_stall: dict[str, Any] | None = None
+_watchdog_stop = threading.Event()
+_watchdog: threading.Thread | None = None
+_probe_task: asyncio.Task[None] | None = None
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct * (len(ordered) - 1))))]
+
+
+def get_loop_lag_summary() -> dict[str, Any]:
+    values = list(_lags)
+    return {
+        "worker": worker_id,
+        "threshold_ms": round(_threshold_s * 1000.0, 1),
+        "samples": len(values),
+        "p50_ms": round(_percentile(values, 0.5) * 1000.0, 2),
+        "p99_ms": round(_percentile(values, 0.99) * 1000.0, 2),
+        "max_ms": round(max(values, default=0.0) * 1000.0, 2),
+    }
+
+
+def _collect_loop_lag() -> None:
+    values = list(_lags)
+    set_gauge("event_loop_lag_p99_seconds", _percentile(values, 0.99))
+    set_gauge("event_loop_lag_max_seconds", max(values, default=0.0))
+
+
+def _task_context(task: asyncio.Task[Any] | None) -> dict[str, Any]:
+    if task is None:
+        return {}
+
+    out: dict[str, Any] = {"task": task.get_name(), "coro": getattr(task.get_coro(), "__qualname__", repr(task.get_coro()))}
+    get_context = getattr(task, "get_context", None)
+    if get_context is None:
+        return out
+
+    with suppress(Exception):
+        for var, value in get_context().items():
+            key = var.name.removeprefix("structlog_")
+            if var.name.startswith("structlog_") and key in _CONTEXT_KEYS and value is not Ellipsis:
+                out[key] = value if isinstance(value, (int, float)) else str(value)
+
+    return out
+
+
+def _sample_stall() -> None:
+    global _active_stall
+    frame = sys._current_frames().get(_loop_thread_id or 0)
+    if frame is None:
+        return
+
+    stack = tuple(f"{entry.filename}:{entry.lineno} in {entry.name}" for entry in traceback.extract_stack(frame, limit=LOOP_STALL_STACK_DEPTH))
+    with _lock:
+        if _active_stall is None:
+            task = None
+            with suppress(Exception):
+                task = asyncio.current_task(_loop) if _loop else None
+            _active_stall = {
+                "started_at": time.time() - (monotonic() - _heartbeat),
+                "context": _task_context(task),
+                "stacks": Counter(),
+                "samples": 0,
+            }
+
+        if _active_stall["samples"] < LOOP_STALL_MAX_SAMPLES:
+            _active_stall["stacks"][stack] += 1
+            _active_stall["samples"] += 1
+
+
+def _watchdog_main() -> None:
+    while not _watchdog_stop.wait(LOOP_STALL_SAMPLE_INTERVAL_SECONDS):
+        if monotonic() - _heartbeat >= LOOP_LAG_PROBE_INTERVAL_SECONDS + _threshold_s:
+            try:
+                _sample_stall()
+            except Exception:
+                pass
+
+
+def _take_stall(lag_s: float) -> dict[str, Any] | None:
+    global _active_stall
+    with _lock:
+        stall, _active_stall = _active_stall, None
+
+    if stall is None:
+        return None
+
+    return {
+        "worker": worker_id,
+        "started_at": stall["started_at"],
+        "duration_ms": round(lag_s * 1000.0, 1),
+        "context": stall["context"],
+        "samples": stall["samples"],
+        "stacks": [{"count": count, "frames": list(frames)} for frames, count in stall["stacks"].most_common(3)],
+    }
+
+
+async def _publish_stall(r: Redis, stall: dict[str, Any]) -> None:
+    async with r.pipeline() as p:
+        await p.lpush(LOOP_STALLS_KEY, json.dumps(stall, ensure_ascii=False, separators=(",", ":")))
+        await p.ltrim(LOOP_STALLS_KEY, 0, LOOP_STALLS_KEEP - 1)
+        await p.execute()
+
+
+async def _probe_loop(r: Redis) -> None:
+    global _heartbeat
+    while True:
+        expected = monotonic() + LOOP_LAG_PROBE_INTERVAL_SECONDS
+        await asyncio.sleep(LOOP_LAG_PROBE_INTERVAL_SECONDS)
+        now = monotonic()
+        _heartbeat = now
+        lag = max(0.0, now - expected)
+        _lags.append(lag)
+        if lag < _threshold_s:
+            continue
+
+        inc_counter("event_loop_stalls_total")
+        stall = _take_stall(lag)
+        if stall is None:
+            continue
+
+        log.warning("event_loop.stall", duration_ms=stall["duration_ms"], **{f"stall_{k}": v for k, v in stall["context"].items()})
+        try:
+            await _publish_stall(r, stall)
+        except Exception:
+            log.warning("event_loop.stall_publish_failed")
+
+
+def start_loop_monitor(r: Redis, *, threshold_ms: int) -> None:
+    global _loop, _loop_thread_id, _threshold_s, _heartbeat, _watchdog, _probe_task
+    if _probe_task is not None:
+        return
+
+    _loop = asyncio.get_running_loop()
+    _loop_thread_id = threading.get_ident()
+    _threshold_s = max(0.01, threshold_ms / 1000.0)
+    _heartbeat = monotonic()
+    _watchdog_stop.clear()
+    _watchdog = threading.Thread(target=_watchdog_main, name="loop-watchdog", daemon=True)
+    _watchdog.start()
+    _probe_task = asyncio.create_task(_probe_loop(r))
+
+
+async def stop_loop_monitor() -> None:
+    global _watchdog, _probe_task
+    task, _probe_task = _probe_task, None
+    if task is not None:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+    _watchdog_stop.set()
+    thread, _watchdog = _watchdog, None
+    if thread is not None:
+        thread.join(timeout=1.0)
+
+
+async def fetch_loop_stalls(r: Redis, *, limit: int = LOOP_STALLS_KEEP) -> list[dict[str, Any]]:
+    out: list[dict[str, Any]] = []
+    for raw in await r.lrange(LOOP_STALLS_KEY, 0, max(0, limit - 1)):
+        with suppress(Exception):
+            out.append(json.loads(raw))
+
+    return out
+
+
+register_collector(_collect_loop_lag)
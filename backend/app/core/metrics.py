@@ -0,0 +1,256 @@
+from __future__ import annotations
+import json
+import os
+import socket
+import time
+from bisect import bisect_left
+from contextlib import suppress
+from typing import Any, Callable, Iterable
+import structlog
+from redis.asyncio import Redis
+
+log = structlog.get_logger()
+
+METRICS_WORKERS_KEY = "metrics:workers"
+METRICS_PUBLISH_INTERVAL_SECONDS = 5.0
+METRICS_WORKER_STALE_SECONDS = 30.0
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+METRICS: dict[str, tuple[str, str, tuple[float, ...] | None]] = {
+    "http_requests_total": ("counter", "HTTP requests by route and status.", None),
+    "http_request_duration_seconds": ("histogram", "HTTP request latency by route.", LATENCY_BUCKETS),
+    "http_requests_in_flight": ("gauge", "HTTP requests currently being served.", None),
+    "sio_events_total": ("counter", "Socket.IO events handled by namespace and event.", None),
+    "sio_event_duration_seconds": ("histogram", "Socket.IO event handler latency.", LATENCY_BUCKETS),
+    "sio_events_in_flight": ("gauge", "Socket.IO event handlers currently running.", None),
+    "sio_connected_sockets": ("gauge", "Connected Socket.IO sockets by namespace.", None),
+    "db_pool_checkout_wait_seconds": ("histogram", "Time spent waiting for a pooled DB connection.", LATENCY_BUCKETS),
+    "db_pool_checkout_failures_total": ("counter", "DB pool checkouts that raised.", None),
+    "db_pool_connections": ("gauge", "DB pool connections by state.", None),
+    "redis_pipeline_commands": ("histogram", "Commands per executed Redis pipeline.", SIZE_BUCKETS),
+    "background_loop_lag_seconds": ("gauge", "How late the last background loop wake-up was.", None),
+    "background_loop_last_success_timestamp_seconds": ("gauge", "Unix time of the last successful background loop run.", None),
+    "background_loop_failures_total": ("counter", "Background loop iterations that raised.", None),
+    "event_loop_lag_p99_seconds": ("gauge", "p99 event loop scheduling delay over the last minute.", None),
+    "event_loop_lag_max_seconds": ("gauge", "Max event loop scheduling delay over the last minute.", None),
+    "event_loop_stalls_total": ("counter", "Event loop stalls above the configured threshold.", None),
+    "friend_closeness_compute_seconds": ("histogram", "Time spent computing friend closeness pairs for closed rooms.", LATENCY_BUCKETS),
+    "friend_closeness_upsert_seconds": ("histogram", "Time spent upserting friend closeness rows.", LATENCY_BUCKETS),
+    "friend_closeness_pairs": ("histogram", "Friend closeness rows written per upsert.", SIZE_BUCKETS),
+    "room_gc_backlog": ("gauge", "Rooms past their garbage collection deadline by queue.", None),
+    "room_gc_lag_seconds": ("gauge", "Age of the oldest overdue empty-room garbage collection deadline.", None),
+    "metrics_worker_up": ("gauge", "Workers that published metrics recently.", None),
+}
+
+_PER_WORKER_GAUGES = frozenset({
+    "background_loop_lag_seconds",
+    "background_loop_last_success_timestamp_seconds",
+    "event_loop_lag_p99_seconds",
+    "event_loop_lag_max_seconds",
+    "room_gc_backlog",
+    "room_gc_lag_seconds",
+})
+
+worker_id = f"{socket.gethostname()}:{os.getpid()}"
+_counters: dict[tuple[str, tuple[tuple[str, str], ...]], float] = {}
+_gauges: dict[tuple[str, tuple[tuple[str, str], ...]], float] = {}
+_histograms: dict[tuple[str, tuple[tuple[str, str], ...]], list[float]] = {}
+_collectors: list[Callable[[], None]] = []
+
+
+def _labels(labels: dict[str, Any]) -> tuple[tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc_counter(name: str, value: float = 1.0, **labels: Any) -> None:
+    key = (name, _labels(labels))
+    _counters[key] = _counters.get(key, 0.0) + value
+
+
+def set_gauge(name: str, value: float, **labels: Any) -> None:
+    _gauges[(name, _labels(labels))] = float(value)
+
+
+def add_gauge(name: str, value: float, **labels: Any) -> None:
+    key = (name, _labels(labels))
+    _gauges[key] = _gauges.get(key, 0.0) + value
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    buckets = METRICS[name][2] or LATENCY_BUCKETS
+    key = (name, _labels(labels))
+    row = _histograms.get(key)
+    if row is None:
+        row = _histograms[key] = [0.0] * (len(buckets) + 3)
+
+    idx = bisect_left(buckets, value)
+    row[idx] += 1
+    row[-2] += value
+    row[-1] += 1
+
+
+def register_collector(collector: Callable[[], None]) -> None:
+    _collectors.append(collector)
+
+
+def record_loop_lag(loop: str, lag_s: float) -> None:
+    set_gauge("background_loop_lag_seconds", max(0.0, lag_s), loop=loop)
+
+
+def record_loop_success(loop: str) -> None:
+    set_gauge("background_loop_last_success_timestamp_seconds", time.time(), loop=loop)
+
+
+def record_loop_failure(loop: str) -> None:
+    inc_counter("background_loop_failures_total", loop=loop)
+
+
+def instrument_db_pool(pool: Any) -> None:
+    if getattr(pool, "_metrics_instrumented", False):
+        return
+
+    do_get = pool._do_get
+
+    def _timed_do_get() -> Any:
+        started = time.perf_counter()
+        try:
+            return do_get()
+        except Exception:
+            inc_counter("db_pool_checkout_failures_total")
+            raise
+        finally:
+            observe("db_pool_checkout_wait_seconds", time.perf_counter() - started)
+
+    def _collect_pool_usage() -> None:
+        set_gauge("db_pool_connections", pool.checkedout(), state="checked_out")
+        set_gauge("db_pool_connections", pool.checkedin(), state="idle")
+        set_gauge("db_pool_connections", max(0, pool.overflow()), state="overflow")
+        set_gauge("db_pool_connections", pool.size(), state="size")
+
+    pool._do_get = _timed_do_get
+    pool._metrics_instrumented = True
+    register_collector(_collect_pool_usage)
+
+
+def _snapshot() -> dict[str, list[Any]]:
+    for collector in _collectors:
+        try:
+            collector()
+        except Exception:
+            log.warning("metrics.collector_failed", collector=getattr(collector, "__name__", "?"))
+
+    return {
+        "counters": [[name, list(labels), value] for (name, labels), value in _counters.items()],
+        "gauges": [[name, list(labels), value] for (name, labels), value in _gauges.items()],
+        "histograms": [[name, list(labels), row] for (name, labels), row in _histograms.items()],
+    }
+
+
+async def publish_metrics_snapshot(r: Redis) -> None:
+    payload = json.dumps({"ts": time.time(), "data": _snapshot()}, separators=(",", ":"))
+    async with r.pipeline() as p:
+        await p.hset(METRICS_WORKERS_KEY, worker_id, payload)
+        await p.expire(METRICS_WORKERS_KEY, int(METRICS_WORKER_STALE_SECONDS * 4))
+        await p.execute()
+
+
+async def withdraw_metrics_snapshot(r: Redis) -> None:
+    with suppress(Exception):
+        await r.hdel(METRICS_WORKERS_KEY, worker_id)
+
+
+def _merge(workers: Iterable[tuple[str, dict[str, list[Any]]]]) -> tuple[dict, dict, dict]:
+    counters: dict[tuple[str, tuple], float] = {}
+    gauges: dict[tuple[str, tuple], float] = {}
+    histograms: dict[tuple[str, tuple], list[float]] = {}
+    for source, data in workers:
+        for name, labels, value in data.get("counters") or []:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0.0) + float(value)
+        for name, labels, value in data.get("gauges") or []:
+            pairs = tuple(tuple(pair) for pair in labels)
+            if name in _PER_WORKER_GAUGES:
+                pairs = tuple(sorted((*pairs, ("worker", source))))
+            key = (name, pairs)
+            gauges[key] = gauges.get(key, 0.0) + float(value)
+        for name, labels, row in data.get("histograms") or []:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            merged = histograms.get(key)
+            if merged is None or len(merged) != len(row):
+                histograms[key] = [float(v) for v in row]
+            else:
+                for idx, value in enumerate(row):
+                    merged[idx] += float(value)
+        gauges[("metrics_worker_up", ())] = gauges.get(("metrics_worker_up", ()), 0.0) + 1
+
+    return counters, gauges, histograms
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(pairs: Iterable[tuple[str, str]]) -> str:
+    items = [f'{k}="{_escape_label(v)}"' for k, v in pairs]
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _render(counters: dict, gauges: dict, histograms: dict) -> str:
+    lines: list[str] = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "counter":
+            for (metric, pairs), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(pairs)} {_format_value(value)}")
+        elif kind == "gauge":
+            for (metric, pairs), value in sorted(gauges.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(pairs)} {_format_value(value)}")
+        else:
+            bounds = buckets or LATENCY_BUCKETS
+            for (metric, pairs), row in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0.0
+                for bound, count in zip((*bounds, float("inf")), row[:len(bounds) + 1]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else _format_value(bound)
+                    lines.append(f"{name}_bucket{_format_labels((*pairs, ('le', le)))} {_format_value(cumulative)}")
+                lines.append(f"{name}_sum{_format_labels(pairs)} {_format_value(row[-2])}")
+                lines.append(f"{name}_count{_format_labels(pairs)} {_format_value(row[-1])}")
+
+    return "\n".join(lines) + "\n"
+
+
+async def render_cluster_metrics(r: Redis) -> str:
+    await publish_metrics_snapshot(r)
+    raw = await r.hgetall(METRICS_WORKERS_KEY)
+    now = time.time()
+    workers: list[tuple[str, dict[str, list[Any]]]] = []
+    stale: list[str] = []
+    for source, payload in (raw or {}).items():
+        try:
+            parsed = json.loads(payload)
+        except Exception:
+            stale.append(source)
+            continue
+
+        if now - float(parsed.get("ts") or 0) > METRICS_WORKER_STALE_SECONDS:
+            stale.append(source)
+            continue
+
+        workers.append((str(source), parsed.get("data") or {}))
+
+    if stale:
+        with suppress(Exception):
+            await r.hdel(METRICS_WORKERS_KEY, *stale)
+
+    return _render(*_merge(workers))
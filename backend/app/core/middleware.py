@@ -6,11 +6,10 @@ from jwt import ExpiredSignatureError, InvalidTokenError
 from sqlalchemy import update, func
 from starlette.types import ASGIApp, Receive, Scope, Send, Message
 from .clients import get_redis
-from ..security.admin_guard import normalize_protected_admin_role
-from ..security.auth_tokens import decode_token
+from .metrics import add_gauge, inc_counter, observe
+from ..security.auth_tokens import begin_request_auth_memo, decode_token, end_request_auth_memo, read_session_sid
 from ..core.db import SessionLocal
 from ..models.user import User
-from ..services.user_cache import read_user_profile_cache
 
 log = structlog.get_logger()
 
@@ -46,7 +45,7 @@ def _is_https_request(scope: Scope) -> bool:
     return False
 
 
-async def build_auth_log_context(auth_header: str) -> dict[str, object]:
+def build_auth_log_context(auth_header: str) -> dict[str, object]:
     header = str(auth_header or "").strip()
     if not header:
         return {}
@@ -71,33 +70,10 @@ async def build_auth_log_context(auth_header: str) -> dict[str, object]:
         if uid <= 0:
             return {"auth_status": "bad_sub"}
 
-        sid = str(payload.get("sid") or "")
-        role_from_token = str(payload.get("role") or "user")
-        role = role_from_token
-        username = str(payload.get("username") or f"user{uid}")
-
-        redis = get_redis()
-        current_sid = await redis.get(f"user:{uid}:sid")
-        if not sid or not current_sid or current_sid != sid:
-            return {
-                "auth_status": "sid_mismatch",
-                "auth_token_user_id": uid,
-            }
-
-        profile = await read_user_profile_cache(uid, redis_client=redis)
-        if profile:
-            if profile.get("username"):
-                username = str(profile["username"])
-            if profile.get("role"):
-                role = str(profile["role"])
-
-        role = normalize_protected_admin_role(uid, role, fallback_role=role_from_token)
-
         return {
-            "auth_status": "ok",
-            "auth_user_id": uid,
-            "auth_username": username,
-            "auth_role": role,
+            "auth_status": "unverified",
+            "auth_token_user_id": uid,
+            "auth_token_role": str(payload.get("role") or "user"),
         }
 
     except ExpiredSignatureError:
@@ -176,7 +152,7 @@ class LoggingMiddleware:
             forwarded_for=forwarded_for,
             user_agent=user_agent,
         )
-        auth_ctx = await build_auth_log_context(auth_header)
+        auth_ctx = build_auth_log_context(auth_header)
         if auth_ctx:
             structlog.contextvars.bind_contextvars(**auth_ctx)
 
@@ -197,14 +173,22 @@ class LoggingMiddleware:
                 headers_sent = True
             await send(message)
 
+        memo_token = begin_request_auth_memo()
+        add_gauge("http_requests_in_flight", 1)
         try:
             await self.app(scope, receive, send_wrapper)
         except Exception as exc:
             log.exception("request.error", error=str(exc))
             raise
         finally:
-            dur_ms = (time.perf_counter() - t0) * 1000.0
-            log.info("request.end", duration_ms=round(dur_ms, 2), status_code=status_code)
+            end_request_auth_memo(memo_token)
+            add_gauge("http_requests_in_flight", -1)
+            dur_s = time.perf_counter() - t0
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            method = str(scope.get("method") or "")
+            inc_counter("http_requests_total", method=method, route=route, status=status_code or 500)
+            observe("http_request_duration_seconds", dur_s, method=method, route=route)
+            log.info("request.end", duration_ms=round(dur_s * 1000.0, 2), status_code=status_code)
             try:
                 structlog.contextvars.clear_contextvars()
             except Exception as e:
@@ -244,7 +228,7 @@ class LastLoginTouchMiddleware:
                     r = get_redis()
                     uid = int(p["sub"])
                     sid = str(p.get("sid") or "")
-                    cur = await r.get(f"user:{uid}:sid")
+                    cur = await read_session_sid(uid, redis_client=r)
                     if cur and cur == sid:
                         if await r.set(f"user:{uid}:last_touch", "1", ex=self.ttl_s, nx=True):
                             async with SessionLocal() as s:
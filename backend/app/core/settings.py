@@ -46,6 +46,12 @@ class Settings(BaseSettings):
 
     BACKEND_CORS_ORIGINS: List[str] = []
     ONLINE_TTL_SECONDS: int = 60
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_SAMPLE_RATE: float = 1.0
+    AUDIT_LOG_REDIS_SPILL: bool = True
+    LOG_RETENTION_MONTHS: int = 0
+    METRICS_TOKEN: str = ""
+    LOOP_STALL_THRESHOLD_MS: int = 250
     ROOM_RECONNECT_GRACE_SECONDS: int = 4
 
     REGISTRATION_ENABLED: bool = True
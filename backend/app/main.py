@@ -1,12 +1,15 @@
 from __future__ import annotations
+import secrets
 from pathlib import Path
 import socketio
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 from .api.router import api_router
+from .core.clients import get_redis
 from .core.handlers import setup_exception_handlers
 from .core.lifespan import lifespan
+from .core.metrics import render_cluster_metrics
 from .core.middleware import LoggingMiddleware, LastLoginTouchMiddleware, SecurityHeadersMiddleware
 from .realtime.sio import sio, register_namespaces
 from .core.settings import settings
@@ -27,8 +30,8 @@ def build_fastapi() -> FastAPI:
         redoc_url=None,
         openapi_url=None,
     )
-    main_app.add_middleware(LoggingMiddleware)
     main_app.add_middleware(LastLoginTouchMiddleware)
+    main_app.add_middleware(LoggingMiddleware)
 
     main_app.add_middleware(
         CORSMiddleware,
@@ -60,6 +63,15 @@ def build_fastapi() -> FastAPI:
             headers={"Cache-Control": "no-store"},
         )
 
+    @main_app.get("/internal/metrics", include_in_schema=False)
+    async def internal_metrics(authorization: str = Header("")) -> PlainTextResponse:
+        token = settings.METRICS_TOKEN
+        if token and not secrets.compare_digest(authorization.encode(), f"Bearer {token}".encode()):
+            raise HTTPException(status_code=404, detail="not_found")
+
+        body = await render_cluster_metrics(get_redis())
+        return PlainTextResponse(body, media_type="text/plain; version=0.0.4", headers={"Cache-Control": "no-store"})
+
     return main_app
 
 
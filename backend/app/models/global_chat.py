@@ -22,6 +22,7 @@ class GlobalChatMessage(Base):
     deleted_by_user_id: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
     reply_to_message_id: Mapped[int | None] = mapped_column(ForeignKey("global_chat_messages.id", ondelete="SET NULL"), nullable=True, index=True)
     image_object_key: Mapped[str | None] = mapped_column(Text, nullable=True)
+    image_meta: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
     mention_spans: Mapped[list[dict]] = mapped_column(JSONB, nullable=False, default=list, server_default="[]")
 
 
@@ -1,17 +1,22 @@
 from __future__ import annotations
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import BigInteger, String, DateTime, Integer, func, Text
+from sqlalchemy import BigInteger, String, DateTime, Index, Integer, func, Text
 from sqlalchemy.orm import Mapped, mapped_column
 from ..core.db import Base
 
 
 class AppLog(Base):
     __tablename__ = "logs"
+    __table_args__ = (
+        Index("ix_logs_action_created_at", "action", "created_at"),
+        Index("ix_logs_user_id_created_at", "user_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True, index=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
     username: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)
     action: Mapped[str] = mapped_column(String(64), nullable=False)
     details: Mapped[str] = mapped_column(Text, nullable=False, default="")
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True, server_default=func.now(), nullable=False)
@@ -1,6 +1,8 @@
 from __future__ import annotations
 import asyncio
+import json
 from contextlib import suppress
+from time import monotonic
 from typing import Any, Mapping
 import structlog
 from ..core.clients import get_redis
@@ -14,8 +16,14 @@ log = structlog.get_logger()
 
 AUTHENTICATED_NAMESPACES = ("/auth", "/chat", "/room", "/rooms")
 _REGISTRY_TTL_SECONDS = max(86400, int(settings.REFRESH_EXP_DAY) * 86400 + 3600)
-_SESSION_WATCHDOG_SECONDS = 30
-_watchdog_tasks: dict[tuple[str, str], asyncio.Task[None]] = {}
+SESSION_REVOKE_CHANNEL = "sio:session:revoke"
+SESSION_SWEEP_INTERVAL_SECONDS = 300
+_SESSION_SWEEP_BATCH = 100
+SESSION_VALIDATION_CACHE_TTL_SECONDS = 10.0
+_SESSION_VALIDATION_CACHE_MAX = 20_000
+_session_validation_cache: dict[tuple[int, str], tuple[float, str]] = {}
+_local_sockets: dict[int, dict[tuple[str, str], str]] = {}
+_local_socket_owners: dict[tuple[str, str], int] = {}
 
 
 class _SocketSessionRejected(Exception):
@@ -25,48 +33,58 @@ class _SocketSessionRejected(Exception):
         self.emit_force_logout = emit_force_logout
 
 
-def _stop_session_watchdog(socket_sid: str, namespace: str) -> None:
-    task = _watchdog_tasks.pop((namespace, socket_sid), None)
-    current = asyncio.current_task()
-    if task and task is not current and not task.done():
-        task.cancel()
+def _cache_session_validation(user_id: int, auth_sid: str, profile_role: str) -> None:
+    now = monotonic()
+    if len(_session_validation_cache) >= _SESSION_VALIDATION_CACHE_MAX:
+        for cache_key, (expires_at, _) in tuple(_session_validation_cache.items()):
+            if expires_at <= now:
+                del _session_validation_cache[cache_key]
+        if len(_session_validation_cache) >= _SESSION_VALIDATION_CACHE_MAX:
+            _session_validation_cache.clear()
+    _session_validation_cache[(user_id, auth_sid)] = (now + SESSION_VALIDATION_CACHE_TTL_SECONDS, profile_role)
 
 
-async def _session_watchdog(socket_sid: str, namespace: str) -> None:
-    try:
-        while True:
-            await asyncio.sleep(_SESSION_WATCHDOG_SECONDS)
-            if await validate_socket_session(socket_sid, namespace=namespace) is None:
-                return
+def _cached_session_role(user_id: int, auth_sid: str) -> str | None:
+    cache_key = (user_id, auth_sid)
+    cached = _session_validation_cache.get(cache_key)
+    if cached is None:
+        return None
 
-    except asyncio.CancelledError:
-        raise
+    expires_at, profile_role = cached
+    if expires_at <= monotonic():
+        _session_validation_cache.pop(cache_key, None)
+        return None
+
+    return profile_role
+
+
+def invalidate_session_validation_cache(user_id: int, *, auth_sid: str | None = None) -> None:
+    if auth_sid:
+        _session_validation_cache.pop((user_id, auth_sid), None)
+        return
+
+    for cache_key in [key for key in _session_validation_cache if key[0] == user_id]:
+        del _session_validation_cache[cache_key]
 
-    except Exception:
-        log.exception(
-            "sio.session.watchdog_failed",
-            namespace=namespace,
-        )
-        await _disconnect_socket(
-            user_id=0,
-            socket_sid=socket_sid,
-            namespace=namespace,
-            reason="auth_service_unavailable",
-            emit_force_logout=False,
-        )
-    finally:
-        current = asyncio.current_task()
-        watchdog_key = (namespace, socket_sid)
-        if _watchdog_tasks.get(watchdog_key) is current:
-            del _watchdog_tasks[watchdog_key]
-
-
-def _start_session_watchdog(socket_sid: str, namespace: str) -> None:
-    _stop_session_watchdog(socket_sid, namespace)
-    _watchdog_tasks[(namespace, socket_sid)] = asyncio.create_task(
-        _session_watchdog(socket_sid, namespace),
-        name=f"sio-auth-watchdog:{namespace}:{socket_sid}",
-    )
+
+def _track_local_socket(user_id: int, socket_sid: str, namespace: str, auth_sid: str) -> None:
+    socket_key = (namespace, socket_sid)
+    _untrack_local_socket(socket_sid, namespace)
+    _local_socket_owners[socket_key] = user_id
+    _local_sockets.setdefault(user_id, {})[socket_key] = auth_sid
+
+
+def _untrack_local_socket(socket_sid: str, namespace: str) -> None:
+    socket_key = (namespace, socket_sid)
+    uid = _local_socket_owners.pop(socket_key, None)
+    if uid is None:
+        return
+
+    sockets = _local_sockets.get(uid)
+    if sockets is not None:
+        sockets.pop(socket_key, None)
+        if not sockets:
+            _local_sockets.pop(uid, None)
 
 
 def _registry_key(user_id: int, namespace: str) -> str:
@@ -94,11 +112,11 @@ async def register_user_socket(
         await p.hset(key, mapping={socket_sid: auth_sid})
         await p.expire(key, _REGISTRY_TTL_SECONDS)
         await p.execute()
-    _start_session_watchdog(socket_sid, namespace)
+    _track_local_socket(uid, socket_sid, namespace, auth_sid)
 
 
 async def unregister_user_socket(*, user_id: int, socket_sid: str, namespace: str) -> None:
-    _stop_session_watchdog(socket_sid, namespace)
+    _untrack_local_socket(socket_sid, namespace)
     uid = int(user_id)
     if uid <= 0 or not socket_sid:
         return
@@ -107,6 +125,26 @@ async def unregister_user_socket(*, user_id: int, socket_sid: str, namespace: st
         await get_redis().hdel(_registry_key(uid, namespace), socket_sid)
 
 
+async def enter_user_sockets_room(user_id: int, room: str, *, namespace: str) -> None:
+    uid = int(user_id)
+    if uid <= 0:
+        return
+
+    for socket_sid in await get_redis().hkeys(_registry_key(uid, namespace)) or []:
+        with suppress(Exception):
+            await sio.enter_room(str(socket_sid), room, namespace=namespace)
+
+
+async def leave_user_sockets_room(user_id: int, room: str, *, namespace: str) -> None:
+    uid = int(user_id)
+    if uid <= 0:
+        return
+
+    for socket_sid in await get_redis().hkeys(_registry_key(uid, namespace)) or []:
+        with suppress(Exception):
+            await sio.leave_room(str(socket_sid), room, namespace=namespace)
+
+
 async def _disconnect_socket(
     *,
     user_id: int,
@@ -114,6 +152,7 @@ async def _disconnect_socket(
     namespace: str,
     reason: str,
     emit_force_logout: bool = True,
+    ignore_queue: bool = False,
 ) -> None:
     if emit_force_logout:
         with suppress(Exception):
@@ -122,9 +161,10 @@ async def _disconnect_socket(
                 {"reason": reason},
                 to=socket_sid,
                 namespace=namespace,
+                ignore_queue=ignore_queue,
             )
     try:
-        await sio.disconnect(socket_sid, namespace=namespace)
+        await sio.disconnect(socket_sid, namespace=namespace, ignore_queue=ignore_queue)
     except Exception:
         log.warning(
             "sio.session.disconnect_failed",
@@ -144,33 +184,89 @@ async def disconnect_user_sockets(
         return 0
 
     r = get_redis()
-    disconnected = 0
-    for namespace in AUTHENTICATED_NAMESPACES:
-        key = _registry_key(uid, namespace)
-        try:
-            registered = await r.hgetall(key)
-        except Exception:
-            log.exception(
-                "sio.session.registry_read_failed",
-                user_id=uid,
-                namespace=namespace,
-            )
-            continue
+    keys = [_registry_key(uid, namespace) for namespace in AUTHENTICATED_NAMESPACES]
+    try:
+        async with r.pipeline() as p:
+            for key in keys:
+                await p.hgetall(key)
+            registries = await p.execute()
+    except Exception:
+        log.exception("sio.session.registry_read_failed", user_id=uid)
+        registries = [{} for _ in keys]
 
+    targets: list[tuple[str, str, str]] = []
+    for namespace, key, registered in zip(AUTHENTICATED_NAMESPACES, keys, registries):
         for socket_sid, registered_auth_sid in (registered or {}).items():
             if only_auth_sid and str(registered_auth_sid) != str(only_auth_sid):
                 continue
+            targets.append((namespace, key, str(socket_sid)))
+
+    invalidate_session_validation_cache(uid, auth_sid=only_auth_sid)
+    message = json.dumps({"uid": uid, "reason": reason, "auth_sid": only_auth_sid or ""})
+    try:
+        await r.publish(SESSION_REVOKE_CHANNEL, message)
+    except Exception:
+        log.exception("sio.session.revoke_publish_failed", user_id=uid)
+        for namespace, _, socket_sid in targets:
             await _disconnect_socket(
                 user_id=uid,
-                socket_sid=str(socket_sid),
+                socket_sid=socket_sid,
                 namespace=namespace,
                 reason=reason,
             )
-            disconnected += 1
-            with suppress(Exception):
-                await r.hdel(key, socket_sid)
 
-    return disconnected
+    if targets:
+        with suppress(Exception):
+            async with r.pipeline() as p:
+                for _, key, socket_sid in targets:
+                    await p.hdel(key, socket_sid)
+                await p.execute()
+
+    return len(targets)
+
+
+async def apply_session_revocation(raw_message: str) -> int:
+    try:
+        payload = json.loads(raw_message)
+        uid = int(payload.get("uid") or 0)
+        reason = str(payload.get("reason") or "session_revoked")
+        only_auth_sid = str(payload.get("auth_sid") or "")
+    except (TypeError, ValueError, AttributeError):
+        log.warning("sio.session.revoke_message_invalid")
+        return 0
+
+    invalidate_session_validation_cache(uid, auth_sid=only_auth_sid or None)
+    sockets = _local_sockets.get(uid)
+    if uid <= 0 or not sockets:
+        return 0
+
+    targets = [
+        socket_key
+        for socket_key, auth_sid in sockets.items()
+        if not only_auth_sid or auth_sid == only_auth_sid
+    ]
+    for namespace, socket_sid in targets:
+        _untrack_local_socket(socket_sid, namespace)
+        await _disconnect_socket(
+            user_id=uid,
+            socket_sid=socket_sid,
+            namespace=namespace,
+            reason=reason,
+            ignore_queue=True,
+        )
+    return len(targets)
+
+
+async def sweep_local_socket_sessions() -> int:
+    rejected = 0
+    for idx, (namespace, socket_sid) in enumerate(tuple(_local_socket_owners)):
+        if (namespace, socket_sid) not in _local_socket_owners:
+            continue
+        if await validate_socket_session(socket_sid, namespace=namespace, use_cache=False) is None:
+            rejected += 1
+        if idx % _SESSION_SWEEP_BATCH == _SESSION_SWEEP_BATCH - 1:
+            await asyncio.sleep(0)
+    return rejected
 
 
 async def revoke_user_session(
@@ -210,13 +306,11 @@ async def revoke_user_session(
         expected,
     ) or "")
 
-    target_auth_sid = expected or removed_current_sid
-    if target_auth_sid:
-        await disconnect_user_sockets(
-            uid,
-            reason=reason,
-            only_auth_sid=target_auth_sid,
-        )
+    await disconnect_user_sockets(
+        uid,
+        reason=reason,
+        only_auth_sid=expected or None,
+    )
     return bool(removed_current_sid)
 
 
@@ -225,6 +319,7 @@ async def validate_socket_session(
     *,
     namespace: str,
     auth_optional: bool = False,
+    use_cache: bool = True,
 ) -> Mapping[str, Any] | None:
     try:
         session = await sio.get_session(socket_sid, namespace=namespace)
@@ -246,6 +341,14 @@ async def validate_socket_session(
         if not auth_sid:
             raise _SocketSessionRejected("session_expired")
 
+        session_role = normalize_user_role(str(session.get("base_role") or session.get("role") or "user"))
+        cached_role = _cached_session_role(uid, auth_sid) if use_cache else None
+        if cached_role is not None:
+            if session_role != cached_role:
+                raise _SocketSessionRejected("role_changed")
+
+            return session
+
         r = get_redis()
         async with r.pipeline() as p:
             await p.get(f"user:{uid}:sid")
@@ -265,15 +368,15 @@ async def validate_socket_session(
         if profile.get("deleted_at"):
             raise _SocketSessionRejected("account_deleted")
 
-        session_role = str(session.get("base_role") or session.get("role") or "user")
-        profile_role = normalize_protected_admin_role(
+        profile_role = normalize_user_role(normalize_protected_admin_role(
             uid,
             str(profile.get("role") or "user"),
             fallback_role="user",
-        )
-        if normalize_user_role(session_role) != normalize_user_role(profile_role):
+        ))
+        if session_role != profile_role:
             raise _SocketSessionRejected("role_changed")
 
+        _cache_session_validation(uid, auth_sid, profile_role)
         return session
 
     except _SocketSessionRejected as exc:
@@ -321,7 +321,7 @@ async def chat_send(sid, data):
             if message is None:
                 original_image_key = image_object_key
                 try:
-                    image_object_key = await finalize_global_chat_image(
+                    image_object_key, image_meta = await finalize_global_chat_image(
                         user_id=uid,
                         image_object_key=image_object_key,
                     )
@@ -337,6 +337,7 @@ async def chat_send(sid, data):
                     text=text,
                     reply_to_message_id=reply_to_message_id,
                     image_object_key=image_object_key,
+                    image_meta=image_meta,
                 )
                 if created:
                     promoted_orphan_key = None
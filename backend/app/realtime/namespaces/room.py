@@ -74,7 +74,6 @@ from ..utils import (
     emit_rooms_event_safe,
     emit_rooms_occupancy_safe,
     emit_rooms_spectators_safe,
-    get_public_spectators_count,
     get_game_runtime_and_roles_view,
     emit_state_changed_filtered,
     stop_screen_for_user,
@@ -291,22 +290,16 @@ async def join(sid, data) -> JoinAck:
                     async with SessionLocal() as s:
                         can_bypass_spectators_capacity = await user_has_active_subscription(s, uid)
 
-                try:
-                    already_spectator = await r.sismember(f"room:{rid}:spectators", str(uid))
-                except Exception:
-                    already_spectator = False
-                if not already_spectator:
-                    if not can_bypass_spectators_capacity:
-                        spectators_count = await get_public_spectators_count(r, rid)
-                        if spectators_count >= spectators_limit:
-                            return {"ok": False, "error": "spectators_full", "status": 409}
-
                 spectator_code, spectator_added = await join_spectator_atomic(
                     r,
                     rid,
                     uid,
                     hidden_role_bypass=hidden_role_bypass,
+                    public=base_role_normalized != ROLE_ADMIN,
+                    capacity=None if can_bypass_spectators_capacity else spectators_limit,
                 )
+                if spectator_code == -8:
+                    return {"ok": False, "error": "spectators_full", "status": 409}
                 if spectator_code == -3:
                     return {"ok": False, "error": "room_closed", "status": 410}
 
@@ -1,12 +1,12 @@
 from __future__ import annotations
 import structlog
 from ..sio import sio
-from ..utils import get_rooms_brief, validate_auth, filter_rooms_for_viewer
+from ..utils import ADMIN_LIVE_ROOMS_SIO_ROOM, attach_lobby_versions, join_visible_hidden_rooms, payload_dict, positive_int, query_lobby, set_live_rooms_watcher, to_bool01, validate_auth
 from ..connections import register_user_socket, unregister_user_socket
 from ...core.clients import get_redis
 from ...core.roles import ROLE_ADMIN, ROLE_MODER, normalize_user_role
 from ...security.decorators import rate_limited_sio
-from ...schemas.realtime import RoomsListAck
+from ...schemas.realtime import RoomsListAck, StateAck
 
 log = structlog.get_logger()
 
@@ -43,6 +43,10 @@ async def connect(sid, environ, auth):
             auth_sid=vr.auth_sid,
         )
         await sio.enter_room(sid, f"user:{uid}", namespace="/rooms")
+        try:
+            await join_visible_hidden_rooms(get_redis(), sid, uid)
+        except Exception:
+            log.warning("rooms.connect.hidden_rooms_failed", sid=sid, uid=uid)
     role = normalize_user_role(role)
     if role == ROLE_ADMIN:
         await sio.enter_room(sid, "role:admin", namespace="/rooms")
@@ -58,7 +62,7 @@ async def connect(sid, environ, auth):
     session_ns="/rooms",
     auth_optional=True,
 )
-async def rooms_list(sid) -> RoomsListAck:
+async def rooms_list(sid, data=None) -> RoomsListAck:
     try:
         role = "user"
         uid = 0
@@ -70,21 +74,57 @@ async def rooms_list(sid) -> RoomsListAck:
             role = "user"
             uid = 0
 
+        query = payload_dict(data)
+        state = str(query.get("state") or "")
+        privacy = str(query.get("privacy") or "")
+        mode = str(query.get("mode") or "")
         r = get_redis()
-        rids = list(map(int, await r.zrevrange("rooms:index", 0, 99)))
-        if not rids:
-            return {"ok": True, "rooms": []}
-
-        rooms = await get_rooms_brief(r, rids)
-        rooms = await filter_rooms_for_viewer(r, rooms, role, uid)
+        rooms, next_id = await query_lobby(
+            r,
+            role=role,
+            uid=uid,
+            state=state if state in ("idle", "game") else None,
+            privacy=privacy if privacy in ("open", "private") else None,
+            mode=mode if mode in ("normal", "rating") else None,
+            free_seats=to_bool01(query.get("free_seats")),
+            spectate=to_bool01(query.get("spectate")),
+            cursor=positive_int(query.get("cursor")) or None,
+            limit=max(1, min(100, positive_int(query.get("limit")) or 100)),
+            newest_first=query.get("sort") != "oldest",
+        )
+        rooms = await attach_lobby_versions(r, rooms)
 
-        return {"ok": True, "rooms": rooms}
+        return {"ok": True, "rooms": rooms, "next_cursor": str(next_id) if next_id else None}
 
     except Exception:
         log.exception("rooms.list.error", sid=sid)
         return {"ok": False, "rooms": []}
 
 
+@sio.event(namespace="/rooms")
+@rate_limited_sio(
+    lambda sid, uid=None, **__: f"rl:sio:admin_rooms_subscribe:{uid or sid}",
+    limit=10,
+    window_s=1,
+    session_ns="/rooms",
+)
+async def admin_rooms_subscribe(sid, data=None) -> StateAck:
+    try:
+        sess = await sio.get_session(sid, namespace="/rooms")
+    except Exception:
+        sess = None
+    if normalize_user_role((sess or {}).get("role")) != ROLE_ADMIN:
+        return {"ok": False}
+
+    on = to_bool01(payload_dict(data).get("on", True))
+    if on:
+        await sio.enter_room(sid, ADMIN_LIVE_ROOMS_SIO_ROOM, namespace="/rooms")
+    else:
+        await sio.leave_room(sid, ADMIN_LIVE_ROOMS_SIO_ROOM, namespace="/rooms")
+    await set_live_rooms_watcher(get_redis(), sid, on)
+    return {"ok": True}
+
+
 @sio.event(namespace="/rooms")
 async def disconnect(sid):
     try:
@@ -94,3 +134,7 @@ async def disconnect(sid):
         uid = 0
     if uid > 0:
         await unregister_user_socket(user_id=uid, socket_sid=sid, namespace="/rooms")
+    try:
+        await set_live_rooms_watcher(get_redis(), sid, False)
+    except Exception as e:
+        log.warning("rooms.live.unwatch_failed", sid=sid, err=type(e).__name__)
@@ -3,6 +3,7 @@ from importlib import import_module
 import sys
 import socketio
 import structlog
+from ..core.metrics import register_collector, set_gauge
 from ..core.settings import settings
 
 log = structlog.get_logger()
@@ -31,8 +32,20 @@ sio = socketio.AsyncServer(
 )
 
 
+SIO_NAMESPACES = ("/auth", "/chat", "/room", "/rooms")
+
+
+def _collect_connected_sockets() -> None:
+    rooms = sio.manager.rooms
+    for namespace in SIO_NAMESPACES:
+        set_gauge("sio_connected_sockets", len((rooms.get(namespace) or {}).get(None) or {}), namespace=namespace)
+
+
+register_collector(_collect_connected_sockets)
+
+
 def audit_sio_event_guards() -> None:
-    protected_namespaces = {"/auth", "/chat", "/room", "/rooms"}
+    protected_namespaces = set(SIO_NAMESPACES)
     exempt_events = {"connect", "disconnect"}
     for namespace, handlers in sio.handlers.items():
         if namespace not in protected_namespaces:
@@ -3,8 +3,9 @@ import asyncio
 import json
 import random
 import structlog
+from heapq import heappop, heappush
 from math import ceil
-from time import time
+from time import perf_counter, time
 from contextlib import suppress
 from random import shuffle, randint
 from sqlalchemy import select, func, delete, or_
@@ -14,8 +15,10 @@ from redis.exceptions import ResponseError
 from jwt import ExpiredSignatureError
 from datetime import datetime, timezone
 from typing import Any, Dict, Mapping, cast, Optional, List, Iterable
+from uuid import uuid4
 from dataclasses import dataclass
 from .sio import sio
+from .connections import enter_user_sockets_room, leave_user_sockets_room
 from ..core.db import SessionLocal
 from ..core.roles import ROLE_ADMIN, ROLE_MODER, can_room_moderate, normalize_user_role, room_moderation_role
 from ..core.settings import settings
@@ -27,6 +30,7 @@ from ..models.friend import FriendCloseness
 from ..schemas.realtime import GameStartAck
 from ..core.clients import get_redis
 from ..core.logging import log_action
+from ..core.metrics import observe
 from ..security.admin_guard import normalize_protected_admin_role
 from ..security.auth_tokens import decode_token
 from ..api.utils import (
@@ -34,6 +38,13 @@ from ..api.utils import (
     active_alive_game_room_key,
     active_game_rooms_key,
     get_active_game_rooms,
+    enqueue_room_gc,
+    enqueue_room_gc_safe,
+    LIVE_ROOM_STATS_KEY,
+    ROOM_GC_DUE_KEY,
+    ROOM_SINGLE_GC_DUE_KEY,
+    finalize_live_room_snapshot,
+    refresh_live_room_snapshots,
     reduce_suspend_after_hosted_game,
 )
 from ..services.global_chat import emit_global_chat_permissions_updated
@@ -105,6 +116,11 @@ __all__ = [
     "get_profiles_snapshot",
     "join_room_atomic",
     "join_spectator_atomic",
+    "ROOM_RESERVATIONS_KEY",
+    "ROOM_RESERVATION_TTL_SECONDS",
+    "user_room_reservations_key",
+    "reserve_room_slot",
+    "release_room_slot",
     "leave_room_atomic",
     "leave_room_atomic_if_epoch",
     "leave_spectator_atomic_if_epoch",
@@ -118,13 +134,26 @@ __all__ = [
     "schedule_guarded_disconnect_cleanup",
     "reset_room_session",
     "finalize_guarded_disconnect_cleanup",
-    "gc_empty_room",
+    "ROOM_GC_BATCH_SIZE",
+    "run_room_gc_batch",
+    "run_single_room_gc_batch",
+    "get_room_gc_backlog",
     "claim_screen",
     "get_rooms_brief",
+    "get_lobby_briefs",
+    "query_lobby",
+    "attach_lobby_versions",
     "filter_rooms_for_viewer",
+    "hidden_room_sio_room",
+    "enter_hidden_room_viewers",
+    "leave_hidden_room_viewers",
+    "join_visible_hidden_rooms",
     "emit_rooms_upsert_safe",
     "emit_rooms_event_safe",
     "emit_rooms_remove_safe",
+    "ADMIN_LIVE_ROOMS_SIO_ROOM",
+    "set_live_rooms_watcher",
+    "schedule_live_room_refresh",
     "init_roles_deck",
     "assign_role_for_user",
     "claim_night_check",
@@ -186,6 +215,9 @@ __all__ = [
     "normalize_uid_set",
     "room_request_cleanup_for_game_start",
     "emit_room_requests_pruned_for_game_start",
+    "list_room_request_items",
+    "fetch_room_request_items",
+    "emit_room_requests_update",
     "get_positive_setting_int",
     "wink_spot_chance",
     "randomize_limit",
@@ -241,7 +273,35 @@ _leave_sha: str | None = None
 _leave_if_epoch_sha: str | None = None
 _spectator_leave_if_epoch_sha: str | None = None
 _disconnect_cleanup_tasks: dict[tuple[int, int], asyncio.Task[None]] = {}
-_single_gc_tasks: dict[int, tuple[str, asyncio.Task[None]]] = {}
+LOBBY_BRIEFS_KEY = "rooms:lobby:briefs"
+LOBBY_VERSION_KEY = "rooms:lobby:version"
+LOBBY_BLOB_KEY = "rooms:lobby:blob"
+LOBBY_SENT_KEY = "rooms:lobby:sent"
+LOBBY_BROADCAST_WINDOW_SECONDS = 0.25
+LOBBY_FACET_PREFIX = "rooms:lobby:f:"
+LOBBY_FACETS_READY_KEY = "rooms:lobby:f:ready"
+LOBBY_QUERY_CACHE_SECONDS = 2
+LOBBY_QUERY_MAX_ROUNDS = 5
+_lobby_cache: tuple[str, list[dict]] | None = None
+_lobby_dirty: set[int] = set()
+_room_creator_roles: dict[int, str] = {}
+_ROOM_CREATOR_ROLES_MAX = 10000
+_lobby_flush_task: asyncio.Task[None] | None = None
+ROOM_GC_BATCH_SIZE = 50
+ROOM_GC_LOCK_TTL_SECONDS = 60
+ROOM_GC_RETRY_SECONDS = 30
+FRIEND_CLOSENESS_MAX_PAIRS_PER_ROOM = 500
+FRIEND_CLOSENESS_UPSERT_CHUNK = 2000
+ADMIN_LIVE_ROOMS_SIO_ROOM = "admin:live_rooms"
+LIVE_ROOMS_WATCHERS_KEY = "rooms:live:watch"
+LIVE_ROOMS_WATCHER_TTL_SECONDS = 90
+LIVE_ROOMS_WATCHER_HEARTBEAT_SECONDS = 30
+LIVE_ROOMS_BROADCAST_WINDOW_SECONDS = 1.0
+_live_rooms_dirty: set[int] = set()
+_live_rooms_removed: set[int] = set()
+_live_rooms_flush_task: asyncio.Task[None] | None = None
+_live_rooms_watchers: set[str] = set()
+_live_rooms_heartbeat_task: asyncio.Task[None] | None = None
 HOST_BLUR_AUTO_OFF_SECONDS = 120
 _host_blur_auto_tasks: dict[int, asyncio.Task[None]] = {}
 SPEECH_FINISH_MIN_SECONDS = 3
@@ -252,6 +312,201 @@ SCREEN_QUALITY_LOW = "low"
 SCREEN_QUALITY_MEDIUM = "medium"
 SCREEN_QUALITY_HIGH = "high"
 SCREEN_QUALITIES = {SCREEN_QUALITY_LOW, SCREEN_QUALITY_MEDIUM, SCREEN_QUALITY_HIGH}
+ROOM_RESERVATIONS_KEY = "rooms:reservations"
+ROOM_RESERVATION_SEQ_KEY = "rooms:reservation:seq"
+ROOM_RESERVATION_TTL_SECONDS = 30
+
+_ROOM_GC_KEY_SUFFIXES = (
+    "positions",
+    "visitors",
+    "params",
+    "game",
+    "spectators",
+    "spectators_public",
+    "spectators_time",
+    "spectators_join",
+    "single_since",
+    "gc_single_lock",
+    "allow",
+    "pending",
+    "requests",
+    "invited",
+    "screen_time",
+    "screen_owner",
+    "screen_quality",
+    "screen_started_at",
+    "ready",
+    "speaker_alert_cycles",
+    "speaker_alert_active",
+    "game_state",
+    "game_seats",
+    "game_players",
+    "game_alive",
+    "roles_cards",
+    "roles_taken",
+    "game_roles",
+    "game_fouls",
+    "game_short_speech_used",
+    "game_nominees",
+    "game_nom_speakers",
+    "game_votes",
+)
+
+ROOM_GC_HOLD_LUA = r"""
+-- KEYS: gc_lock, members, empty_since, gc_seq
+if redis.call('GET', KEYS[1]) ~= ARGV[1]
+    or redis.call('SCARD', KEYS[2]) ~= 0
+    or (redis.call('GET', KEYS[3]) or '') ~= ARGV[2]
+    or (redis.call('GET', KEYS[4]) or '') ~= ARGV[3] then
+    return 0
+end
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+ROOM_GC_RELEASE_LUA = r"""
+for i = 1, #KEYS do
+    if redis.call('GET', KEYS[i]) == ARGV[1] then
+        redis.call('DEL', KEYS[i])
+    end
+end
+return 1
+"""
+
+ROOM_GC_CLEAR_LUA = r"""
+if redis.call('GET', KEYS[8]) ~= ARGV[5]
+    or redis.call('SCARD', KEYS[1]) ~= 0
+    or (redis.call('GET', KEYS[2]) or '') ~= ARGV[2]
+    or (redis.call('GET', KEYS[3]) or '') ~= ARGV[3] then
+    return 0
+end
+if ARGV[4] == '1' then
+    redis.call('SREM', KEYS[7], ARGV[1])
+end
+redis.call('DEL', KEYS[1], KEYS[2], KEYS[3], KEYS[8])
+for i = 9, #KEYS do
+    redis.call('DEL', KEYS[i])
+end
+redis.call('ZREM', KEYS[4], ARGV[1])
+redis.call('ZREM', KEYS[5], ARGV[1])
+redis.call('ZREM', KEYS[6], ARGV[1])
+return 1
+"""
+
+LOBBY_FACETS = ("all", "state:idle", "state:game", "privacy:open", "privacy:private", "mode:normal", "mode:rating", "seats:free", "spectate:open")
+LOBBY_FACET_KEYS = tuple(f"{LOBBY_FACET_PREFIX}{facet}" for facet in LOBBY_FACETS)
+
+LOBBY_INDEX_LUA = r"""
+local FACETS = {'all', 'state:idle', 'state:game', 'privacy:open', 'privacy:private', 'mode:normal', 'mode:rating', 'seats:free', 'spectate:open'}
+local FACET_BASE = #KEYS - #FACETS
+local FACET_KEYS = {}
+for i, facet in ipairs(FACETS) do
+    FACET_KEYS[facet] = KEYS[FACET_BASE + i]
+end
+local function lobby_unindex(rid)
+    for _, facet in ipairs(FACETS) do
+        redis.call('ZREM', FACET_KEYS[facet], rid)
+    end
+end
+local function lobby_index(rid, item)
+    lobby_unindex(rid)
+    local score = tonumber(rid)
+    local in_game = item['in_game'] == true
+    local occupancy = tonumber(item['occupancy']) or 0
+    local user_limit = tonumber(item['user_limit']) or 0
+    redis.call('ZADD', FACET_KEYS['all'], score, rid)
+    redis.call('ZADD', FACET_KEYS['state:' .. (in_game and 'game' or 'idle')], score, rid)
+    redis.call('ZADD', FACET_KEYS['privacy:' .. (item['privacy'] == 'private' and 'private' or 'open')], score, rid)
+    redis.call('ZADD', FACET_KEYS['mode:' .. (item['game_mode'] == 'rating' and 'rating' or 'normal')], score, rid)
+    if not in_game and item['entry_closed'] ~= true and occupancy < user_limit then
+        redis.call('ZADD', FACET_KEYS['seats:free'], score, rid)
+    end
+    if in_game and (tonumber(item['spectators_limit']) or 0) > 0 then
+        redis.call('ZADD', FACET_KEYS['spectate:open'], score, rid)
+    end
+end
+"""
+
+LOBBY_STORE_LUA = LOBBY_INDEX_LUA + r"""
+local item = cjson.decode(ARGV[2])
+local raw = redis.call('HGET', KEYS[1], ARGV[1])
+if raw and ARGV[3] == '1' then
+    return 0
+end
+if raw and item['spectators_count'] == nil then
+    item['spectators_count'] = cjson.decode(raw)['spectators_count']
+end
+redis.call('HSET', KEYS[1], ARGV[1], cjson.encode(item))
+lobby_index(ARGV[1], item)
+if ARGV[3] ~= '1' then
+    redis.call('INCR', KEYS[2])
+end
+return 1
+"""
+
+LOBBY_PATCH_LUA = LOBBY_INDEX_LUA + r"""
+local raw = redis.call('HGET', KEYS[1], ARGV[1])
+if not raw then
+    return 0
+end
+local item = cjson.decode(raw)
+if item[ARGV[2]] == tonumber(ARGV[3]) then
+    return 0
+end
+item[ARGV[2]] = tonumber(ARGV[3])
+redis.call('HSET', KEYS[1], ARGV[1], cjson.encode(item))
+lobby_index(ARGV[1], item)
+redis.call('INCR', KEYS[2])
+return 1
+"""
+
+LOBBY_DROP_LUA = LOBBY_INDEX_LUA + r"""
+lobby_unindex(ARGV[1])
+redis.call('HDEL', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('INCR', KEYS[3])
+return 1
+"""
+
+LOBBY_REINDEX_LUA = LOBBY_INDEX_LUA + r"""
+local raw = redis.call('HGETALL', KEYS[1])
+for i = 1, #raw, 2 do
+    lobby_index(raw[i], cjson.decode(raw[i + 1]))
+end
+redis.call('SET', KEYS[2], '1')
+return #raw / 2
+"""
+
+LOBBY_DIFF_LUA = r"""
+local cur_raw = redis.call('HGET', KEYS[1], ARGV[1])
+if not cur_raw then
+    redis.call('HDEL', KEYS[2], ARGV[1])
+    return false
+end
+local cur = cjson.decode(cur_raw)
+local base = 0
+local prev = {}
+local sent_raw = redis.call('HGET', KEYS[2], ARGV[1])
+if sent_raw then
+    local sent = cjson.decode(sent_raw)
+    base = tonumber(sent['v']) or 0
+    prev = sent['room'] or {}
+end
+local changes = {}
+local changed = false
+for k, v in pairs(cur) do
+    if prev[k] ~= v then
+        changes[k] = v
+        changed = true
+    end
+end
+if not changed then
+    return false
+end
+local v = base + 1
+redis.call('HSET', KEYS[2], ARGV[1], cjson.encode({v = v, room = cur}))
+return {cjson.encode({id = tonumber(ARGV[1]), from = base, v = v, changes = changes}), tostring(cur['anonymity'] or 'visible'), tostring(cur['creator'] or 0)}
+"""
 
 LOCK_RELEASE_LUA = r"""
 if redis.call('GET', KEYS[1]) == ARGV[1] then
@@ -260,6 +515,24 @@ end
 return 0
 """
 
+ROOM_RESERVE_LUA = r"""
+local now = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', now)
+redis.call('ZREMRANGEBYSCORE', KEYS[4], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) + redis.call('ZCARD', KEYS[3]) >= tonumber(ARGV[3]) then
+    return -1
+end
+if redis.call('SCARD', KEYS[2]) + redis.call('ZCARD', KEYS[4]) >= tonumber(ARGV[4]) then
+    return -2
+end
+local token = redis.call('INCR', KEYS[5])
+local expires = now + tonumber(ARGV[2])
+redis.call('ZADD', KEYS[3], expires, token)
+redis.call('ZADD', KEYS[4], expires, token)
+redis.call('PEXPIRE', KEYS[4], ARGV[2])
+return token
+"""
+
 ROLE_ASSIGN_LUA = r"""
 local phase = redis.call('HGET', KEYS[1], 'phase') or 'idle'
 if phase ~= 'roles_pick' then
@@ -431,10 +704,132 @@ async def room_request_cleanup_for_game_start(r, rid: int, keep_user_ids: set[in
     return remove_allow, remove_pending, remove_requests, removed_ids
 
 
+def _room_request_item(uid: int, profile: Mapping[str, Any], *, approved: bool, requested_ts: float) -> dict[str, Any]:
+    return {
+        "id": uid,
+        "username": profile.get("username"),
+        "avatar_name": profile.get("avatar_name"),
+        "role": str(profile.get("role") or "user"),
+        "theme_color": profile.get("theme_color"),
+        "theme_icon": profile.get("theme_icon"),
+        "status": "approved" if approved else "pending",
+        "requested_at": datetime.fromtimestamp(requested_ts, tz=timezone.utc).isoformat() if requested_ts > 0 else None,
+    }
+
+
+async def list_room_request_items(r, session: AsyncSession, rid: int) -> list[dict[str, Any]]:
+    async with r.pipeline() as p:
+        await p.smembers(f"room:{rid}:pending")
+        await p.smembers(f"room:{rid}:allow")
+        await p.zrevrange(f"room:{rid}:requests", 0, -1, withscores=True)
+        raw_pending, raw_allow, raw_order = await p.execute()
+
+    pending_ids = normalize_uid_set(raw_pending)
+    ids = pending_ids | normalize_uid_set(raw_allow)
+    if not ids:
+        return []
+
+    order_ids: list[int] = []
+    request_times: dict[int, float] = {}
+    for raw_uid, raw_score in raw_order or []:
+        try:
+            uid = int(raw_uid)
+        except Exception:
+            continue
+        if uid in ids and uid not in request_times:
+            order_ids.append(uid)
+            request_times[uid] = float(raw_score or 0)
+
+    missing_ids = sorted(ids - set(request_times))
+    if missing_ids:
+        async with r.pipeline(transaction=True) as p:
+            for idx, uid in enumerate(missing_ids):
+                await p.zadd(f"room:{rid}:requests", {str(uid): -idx}, nx=True)
+            await p.execute()
+        order_ids.extend(missing_ids)
+
+    profiles = await get_user_profiles_cached(session, ids)
+    return [
+        _room_request_item(uid, profiles[uid], approved=uid not in pending_ids, requested_ts=request_times.get(uid, 0.0))
+        for uid in order_ids
+        if profiles.get(uid)
+    ]
+
+
+async def fetch_room_request_items(r, session: AsyncSession, rid: int, user_ids: Iterable[int]) -> list[dict[str, Any]]:
+    ids = sorted(normalize_uid_set(list(user_ids)))
+    if not ids:
+        return []
+
+    async with r.pipeline() as p:
+        for uid in ids:
+            await p.sismember(f"room:{rid}:pending", str(uid))
+            await p.sismember(f"room:{rid}:allow", str(uid))
+            await p.zscore(f"room:{rid}:requests", str(uid))
+        raw = await p.execute()
+
+    states: dict[int, tuple[bool, float]] = {}
+    for idx, uid in enumerate(ids):
+        pending, allowed, score = raw[idx * 3:idx * 3 + 3]
+        if pending or allowed:
+            states[uid] = (not pending, float(score or 0))
+    if not states:
+        return []
+
+    profiles = await get_user_profiles_cached(session, states.keys())
+    items = [
+        _room_request_item(uid, profiles[uid], approved=approved, requested_ts=requested_ts)
+        for uid, (approved, requested_ts) in states.items()
+        if profiles.get(uid)
+    ]
+    items.sort(key=lambda item: item["requested_at"] or "", reverse=True)
+    return items
+
+
+async def emit_room_requests_update(
+    rid: int,
+    owner_uid: int,
+    *,
+    changed: Iterable[int] = (),
+    removed: Iterable[int] = (),
+    source: str | None = None,
+    session: AsyncSession | None = None,
+) -> None:
+    changed_ids = normalize_uid_set(list(changed))
+    removed_ids = normalize_uid_set(list(removed))
+    if owner_uid <= 0 or not (changed_ids or removed_ids):
+        return
+
+    items: list[dict[str, Any]] = []
+    if changed_ids:
+        r = get_redis()
+        if session is None:
+            async with SessionLocal() as s:
+                items = await fetch_room_request_items(r, s, rid, changed_ids)
+        else:
+            items = await fetch_room_request_items(r, session, rid, changed_ids)
+
+    present_ids = {int(item["id"]) for item in items}
+    payload: dict[str, Any] = {
+        "room_id": rid,
+        "items": items,
+        "removed": sorted((removed_ids | changed_ids) - present_ids),
+    }
+    if source:
+        payload["source"] = source
+    await sio.emit("room_requests", payload, room=f"user:{owner_uid}", namespace="/auth")
+
+
 async def emit_room_requests_pruned_for_game_start(rid: int, removed_user_ids: set[int], owner_uid: int) -> None:
     if not removed_user_ids:
         return
 
+    if owner_uid > 0:
+        try:
+            await emit_room_requests_update(rid, owner_uid, removed=removed_user_ids, source="game_start_cleanup")
+        except Exception:
+            log.warning("sio.game_start.room_request_owner_sync_failed", rid=rid, owner_uid=owner_uid, count=len(removed_user_ids))
+
     for removed_uid in sorted(removed_user_ids):
         payload = {
             "room_id": rid,
@@ -442,16 +837,6 @@ async def emit_room_requests_pruned_for_game_start(rid: int, removed_user_ids: s
             "silent": True,
             "source": "game_start_cleanup",
         }
-        if owner_uid > 0:
-            try:
-                await sio.emit("room_app_revoked", payload, room=f"user:{owner_uid}", namespace="/auth")
-            except Exception:
-                log.warning(
-                    "sio.game_start.room_request_owner_sync_failed",
-                    rid=rid,
-                    owner_uid=owner_uid,
-                    user_id=removed_uid,
-                )
         try:
             await sio.emit("room_app_revoked", payload, room=f"user:{removed_uid}", namespace="/auth")
         except Exception:
@@ -599,7 +984,7 @@ async def finalize_guarded_disconnect_cleanup(*, rid: int, uid: int, expected_ep
 
     if was_member:
         try:
-            removed, occ, gc_seq, pos_updates = await leave_room_atomic_if_epoch(
+            removed, occ, _, pos_updates = await leave_room_atomic_if_epoch(
                 r,
                 rid,
                 uid,
@@ -650,15 +1035,7 @@ async def finalize_guarded_disconnect_cleanup(*, rid: int, uid: int, expected_ep
             except Exception:
                 phase = "idle"
             if phase == "idle":
-                async def _gc() -> None:
-                    try:
-                        removed_room = await gc_empty_room(rid, expected_seq=gc_seq)
-                        if not removed_room:
-                            await gc_empty_room(rid)
-                    except Exception:
-                        log.exception("gc.failed", rid=rid)
-
-                asyncio.create_task(_gc())
+                await enqueue_room_gc_safe(rid)
 
     elif was_spectator:
         try:
@@ -1142,7 +1519,7 @@ KEYS_STATE: tuple[str, ...] = ("mic", "cam", "speakers", "visibility")
 KEYS_BLOCK: tuple[str, ...] = (*KEYS_STATE, "screen")
 
 JOIN_LUA = r"""
--- KEYS: params, members, positions, info, empty_since, single_since, allow
+-- KEYS: params, members, positions, info, empty_since, single_since, allow, gc_lock
 local params       = KEYS[1]
 local members      = KEYS[2]
 local positions    = KEYS[3]
@@ -1150,6 +1527,7 @@ local info         = KEYS[4]
 local empty_since  = KEYS[5]
 local single_since = KEYS[6]
 local allow         = KEYS[7]
+local gc_lock      = KEYS[8]
 
 local rid       = ARGV[1]
 local uid       = tonumber(ARGV[2])
@@ -1159,6 +1537,7 @@ local now       = tonumber(ARGV[4])
 local lim = tonumber(redis.call('HGET', params, 'user_limit') or '0')
 if not lim or lim <= 0 then return {-3,0,0,0} end
 if redis.call('HGET', params, 'entry_closed') == '1' then return {-3,0,0,0} end
+if redis.call('EXISTS', gc_lock) == 1 then return {-3,0,0,0} end
 
 local creator = tonumber(redis.call('HGET', params, 'creator') or '0')
 local privacy = redis.call('HGET', params, 'privacy') or 'open'
@@ -1220,15 +1599,18 @@ return {new_pos, new_pos, 0, 0}
 """
 
 SPECTATOR_JOIN_LUA = r"""
--- KEYS: params, game_state, game_players, spectators, allow, spectators_join
+-- KEYS: params, game_state, game_players, spectators, allow, spectators_join, spectators_public
 local params          = KEYS[1]
 local game_state      = KEYS[2]
 local game_players    = KEYS[3]
 local spectators      = KEYS[4]
 local allow            = KEYS[5]
 local spectators_join = KEYS[6]
+local spectators_public = KEYS[7]
 local uid              = ARGV[1]
 local hidden_role_bypass = ARGV[3]
+local is_public        = ARGV[4]
+local capacity         = tonumber(ARGV[5])
 
 if redis.call('EXISTS', params) == 0 then return {-3, 0} end
 if redis.call('HGET', params, 'entry_closed') == '1' then return {-3, 0} end
@@ -1247,7 +1629,16 @@ if uid == head or redis.call('SISMEMBER', game_players, uid) == 1 then
     return {-7, 0}
 end
 
+if is_public == '1' and capacity >= 0 and redis.call('SISMEMBER', spectators, uid) == 0 then
+    if redis.call('SCARD', spectators_public) >= capacity then
+        return {-8, 0}
+    end
+end
+
 local added = redis.call('SADD', spectators, uid)
+if is_public == '1' then
+    redis.call('SADD', spectators_public, uid)
+end
 redis.call('HSET', spectators_join, uid, ARGV[2])
 return {1, added}
 """
@@ -1385,7 +1776,7 @@ return {occ, 0, #updates/2, unpack(updates)}
 
 
 SPECTATOR_LEAVE_IF_EPOCH_LUA = r"""
--- KEYS: spectators, spectators_join, spectators_time, current_room, epoch_key, ready, bg_state, sid_key
+-- KEYS: spectators, spectators_join, spectators_time, current_room, epoch_key, ready, bg_state, sid_key, spectators_public
 local spectators      = KEYS[1]
 local spectators_join = KEYS[2]
 local spectators_time = KEYS[3]
@@ -1394,6 +1785,7 @@ local epoch_key       = KEYS[5]
 local ready           = KEYS[6]
 local bg_state        = KEYS[7]
 local sid_key         = KEYS[8]
+local spectators_public = KEYS[9]
 
 local uid            = tonumber(ARGV[1])
 local now            = tonumber(ARGV[2])
@@ -1426,6 +1818,7 @@ if raw_join then
 end
 
 local removed = redis.call('SREM', spectators, uid)
+redis.call('SREM', spectators_public, uid)
 redis.call('HDEL', spectators_join, uid)
 redis.call('SREM', ready, uid)
 redis.call('DEL', epoch_key, bg_state, sid_key)
@@ -2838,6 +3231,7 @@ async def account_screen_time(r, rid: int, uid: int) -> None:
         dt = min(dt, 4*3600)
         await r.hincrby(f"room:{rid}:screen_time", str(uid), dt)
     await r.delete(f"room:{rid}:screen_started_at")
+    schedule_live_room_refresh(rid)
 
 
 async def init_roles_deck(r, rid: int) -> None:
@@ -2887,17 +3281,19 @@ async def get_rooms_brief(r, ids: Iterable[int]) -> List[dict]:
             await p.hget(f"room:{rid}:game_state", "phase")
             await p.scard(f"room:{rid}:game_alive")
             await p.scard(f"room:{rid}:game_players")
+            await p.hmget(f"room:{rid}:game", "mode", "spectators_limit")
         raw = await p.execute()
 
     briefs: List[dict] = []
     need_db: set[int] = set()
 
-    for i in range(0, len(raw), 5):
+    for i in range(0, len(raw), 6):
         vals = raw[i]
         occ_members = int(raw[i + 1] or 0)
         phase_raw = raw[i + 2]
         alive_cnt = int(raw[i + 3] or 0)
         players_total = int(raw[i + 4] or 0)
+        game_mode, spectators_limit = raw[i + 5] or (None, None)
 
         if not vals:
             continue
@@ -2931,6 +3327,8 @@ async def get_rooms_brief(r, ids: Iterable[int]) -> List[dict]:
             "in_game": in_game,
             "game_phase": phase,
             "entry_closed": entry_closed,
+            "game_mode": "rating" if str(game_mode or "normal") == "rating" else "normal",
+            "spectators_limit": _as_int(spectators_limit),
         })
 
     if need_db:
@@ -2949,6 +3347,172 @@ async def get_rooms_brief(r, ids: Iterable[int]) -> List[dict]:
     return briefs
 
 
+def _dump_lobby_brief(item: Mapping[str, Any]) -> str:
+    return json.dumps(dict(item), ensure_ascii=False, separators=(",", ":"))
+
+
+async def store_lobby_brief(r, item: Mapping[str, Any], *, only_missing: bool = False) -> None:
+    rid = int(item.get("id") or 0)
+    if rid <= 0:
+        return
+
+    await r.eval(LOBBY_STORE_LUA, 2 + len(LOBBY_FACET_KEYS), LOBBY_BRIEFS_KEY, LOBBY_VERSION_KEY, *LOBBY_FACET_KEYS, str(rid), _dump_lobby_brief(item), "1" if only_missing else "0")
+
+
+async def patch_lobby_brief(r, rid: int, field: str, value: int) -> None:
+    await r.eval(LOBBY_PATCH_LUA, 2 + len(LOBBY_FACET_KEYS), LOBBY_BRIEFS_KEY, LOBBY_VERSION_KEY, *LOBBY_FACET_KEYS, str(int(rid)), field, str(int(value)))
+
+
+async def drop_lobby_brief(r, rid: int) -> None:
+    await r.eval(LOBBY_DROP_LUA, 3 + len(LOBBY_FACET_KEYS), LOBBY_BRIEFS_KEY, LOBBY_SENT_KEY, LOBBY_VERSION_KEY, *LOBBY_FACET_KEYS, str(int(rid)))
+
+
+async def _rebuild_lobby(r, version: str) -> list[dict]:
+    async with r.pipeline() as p:
+        await p.zrange("rooms:index", 0, -1)
+        await p.hgetall(LOBBY_BRIEFS_KEY)
+        raw_ids, raw_briefs = await p.execute()
+
+    ids: list[int] = []
+    for raw in raw_ids or []:
+        rid = _as_int(raw)
+        if rid > 0:
+            ids.append(rid)
+
+    by_id: dict[int, dict] = {}
+    for raw_rid, raw in (raw_briefs or {}).items():
+        try:
+            by_id[int(raw_rid)] = json.loads(raw)
+        except Exception:
+            continue
+
+    indexed = set(ids)
+    missing = [rid for rid in ids if rid not in by_id]
+    stale = [str(rid) for rid in (raw_briefs or {}) if _as_int(rid) not in indexed]
+    filled = await get_rooms_brief(r, missing) if missing else []
+    for item in filled:
+        by_id[int(item["id"])] = item
+
+    rooms = [by_id[rid] for rid in ids if rid in by_id]
+    for item in filled:
+        await store_lobby_brief(r, item, only_missing=True)
+    for rid in stale:
+        await drop_lobby_brief(r, int(rid))
+
+    await r.set(LOBBY_BLOB_KEY, json.dumps({"v": version, "rooms": rooms}, ensure_ascii=False, separators=(",", ":")))
+    return rooms
+
+
+async def get_lobby_briefs(r) -> List[dict]:
+    global _lobby_cache
+    version = await r.get(LOBBY_VERSION_KEY)
+    if version is None:
+        await r.set(LOBBY_VERSION_KEY, "0", nx=True)
+        version = str(await r.get(LOBBY_VERSION_KEY) or "0")
+
+    cached = _lobby_cache
+    if cached is not None and cached[0] == version:
+        return list(cached[1])
+
+    rooms: list[dict] | None = None
+    try:
+        blob = json.loads(await r.get(LOBBY_BLOB_KEY) or "null")
+        if isinstance(blob, dict) and str(blob.get("v")) == version:
+            rooms = list(blob.get("rooms") or [])
+    except Exception:
+        rooms = None
+
+    if rooms is None:
+        rooms = await _rebuild_lobby(r, version)
+
+    _lobby_cache = (version, rooms)
+    return list(rooms)
+
+
+async def _lobby_query_key(r, facets: list[str]) -> str:
+    if not facets:
+        return f"{LOBBY_FACET_PREFIX}all"
+    if len(facets) == 1:
+        return f"{LOBBY_FACET_PREFIX}{facets[0]}"
+
+    key = "rooms:lobby:q:" + "+".join(sorted(facets))
+    if not await r.exists(key):
+        async with r.pipeline() as p:
+            await p.zinterstore(key, [f"{LOBBY_FACET_PREFIX}{facet}" for facet in facets], aggregate="MIN")
+            await p.expire(key, LOBBY_QUERY_CACHE_SECONDS)
+            await p.execute()
+
+    return key
+
+
+async def query_lobby(
+    r,
+    *,
+    role: str | None,
+    uid: int | None,
+    state: str | None = None,
+    privacy: str | None = None,
+    mode: str | None = None,
+    free_seats: bool = False,
+    spectate: bool = False,
+    cursor: int | None = None,
+    limit: int = 50,
+    newest_first: bool = True,
+) -> tuple[List[dict], int | None]:
+    await get_lobby_briefs(r)
+    if not await r.exists(LOBBY_FACETS_READY_KEY):
+        await r.eval(LOBBY_REINDEX_LUA, 2 + len(LOBBY_FACET_KEYS), LOBBY_BRIEFS_KEY, LOBBY_FACETS_READY_KEY, *LOBBY_FACET_KEYS)
+
+    facets: list[str] = []
+    if state:
+        facets.append(f"state:{state}")
+    if privacy:
+        facets.append(f"privacy:{privacy}")
+    if mode:
+        facets.append(f"mode:{mode}")
+    if free_seats:
+        facets.append("seats:free")
+    if spectate:
+        facets.append("spectate:open")
+    key = await _lobby_query_key(r, facets)
+
+    spectators_cap = max(0, int(get_cached_settings().spectators_limit))
+    batch = max(1, limit) * 2
+    out: List[dict] = []
+    position = cursor
+    for _ in range(LOBBY_QUERY_MAX_ROUNDS):
+        if newest_first:
+            raw_ids = await r.zrevrangebyscore(key, f"({position}" if position else "+inf", "-inf", start=0, num=batch)
+        else:
+            raw_ids = await r.zrangebyscore(key, f"({position}" if position else "-inf", "+inf", start=0, num=batch)
+        ids = [rid for rid in (_as_int(raw) for raw in raw_ids or []) if rid > 0]
+        if not ids:
+            return out, None
+
+        raw_briefs = await r.hmget(LOBBY_BRIEFS_KEY, *[str(rid) for rid in ids])
+        items: List[dict] = []
+        for raw in raw_briefs:
+            with suppress(Exception):
+                items.append(json.loads(raw))
+        if spectate:
+            items = [item for item in items if _as_int(item.get("spectators_count")) < spectators_cap]
+        visible = {_as_int(item.get("id")): item for item in await filter_rooms_for_viewer(r, items, role, uid)}
+
+        for rid in ids:
+            position = rid
+            item = visible.get(rid)
+            if item is None:
+                continue
+            out.append(item)
+            if len(out) >= limit:
+                return out, rid
+
+        if len(ids) < batch:
+            return out, None
+
+    return out, position
+
+
 def _as_int(value: Any, default: int = 0) -> int:
     try:
         return int(value)
@@ -2970,22 +3534,73 @@ async def _load_room_creator_roles(r, creators_by_rid: Mapping[int, int]) -> dic
     if not room_ids:
         return {}
 
-    roles_by_rid: dict[int, str] = {}
+    roles_by_rid = {rid: _room_creator_roles[rid] for rid in room_ids if rid in _room_creator_roles}
+    missing = [rid for rid in room_ids if rid not in roles_by_rid]
+    if not missing:
+        return roles_by_rid
+
     rows: list[Any] = []
     try:
         async with r.pipeline() as p:
-            for rid in room_ids:
+            for rid in missing:
                 await p.hget(f"room:{rid}:params", "creator_role")
             rows = await p.execute()
     except Exception:
         rows = []
 
-    for rid, creator_role in zip(room_ids, rows):
+    if len(_room_creator_roles) >= _ROOM_CREATOR_ROLES_MAX:
+        _room_creator_roles.clear()
+    for rid, creator_role in zip(missing, rows):
         roles_by_rid[rid] = normalize_user_role(creator_role)
+        if creator_role is not None:
+            _room_creator_roles[rid] = roles_by_rid[rid]
 
     return roles_by_rid
 
 
+def hidden_room_sio_room(rid: int) -> str:
+    return f"rooms:hidden:{int(rid)}"
+
+
+async def enter_hidden_room_viewers(r, rid: int, user_ids: Iterable[int], *, anonymity: str | None = None) -> None:
+    if anonymity is None:
+        try:
+            anonymity = str(await r.hget(f"room:{int(rid)}:params", "anonymity") or "visible")
+        except Exception:
+            anonymity = "visible"
+    if anonymity != "hidden":
+        return
+
+    for uid in sorted(_normalize_user_ids(user_ids)):
+        try:
+            await enter_user_sockets_room(uid, hidden_room_sio_room(rid), namespace="/rooms")
+        except Exception as e:
+            log.warning("rooms.hidden.enter_failed", rid=rid, uid=uid, err=type(e).__name__)
+
+
+async def leave_hidden_room_viewers(rid: int, user_ids: Iterable[int]) -> None:
+    for uid in sorted(_normalize_user_ids(user_ids)):
+        try:
+            await leave_user_sockets_room(uid, hidden_room_sio_room(rid), namespace="/rooms")
+        except Exception as e:
+            log.warning("rooms.hidden.leave_failed", rid=rid, uid=uid, err=type(e).__name__)
+
+
+async def join_visible_hidden_rooms(r, sid: str, uid: int) -> None:
+    if uid <= 0:
+        return
+
+    hidden = [item for item in await get_lobby_briefs(r) if str(item.get("anonymity") or "visible") == "hidden"]
+    if not hidden:
+        return
+
+    allow_by_rid = await _load_room_allow_membership(r, [_as_int(item.get("id")) for item in hidden], uid)
+    for item in hidden:
+        rid = _as_int(item.get("id"))
+        if _as_int(item.get("creator")) == uid or allow_by_rid.get(rid):
+            await sio.enter_room(sid, hidden_room_sio_room(rid), namespace="/rooms")
+
+
 async def _admin_created_hidden_room_ids(r, items: Iterable[Mapping[str, Any]]) -> set[int]:
     creators_by_rid: dict[int, int] = {}
     for item in items:
@@ -3078,66 +3693,27 @@ async def filter_rooms_for_viewer(r, items: Iterable[Mapping[str, Any]], role: s
     return out
 
 
-async def _hidden_room_viewers(r, rid: int, *, payload: Mapping[str, Any] | None = None) -> tuple[bool, set[int], bool]:
+async def _hidden_room_audience(r, rid: int, *, payload: Mapping[str, Any] | None = None) -> tuple[bool, bool]:
     room_id = _as_int(rid)
-    hidden_raw = ""
-    creator_hint = 0
-    if payload is not None:
-        hidden_raw = str(payload.get("anonymity") or "")
-        creator_hint = _as_int(payload.get("creator"))
-
-    if hidden_raw:
-        is_hidden = hidden_raw == "hidden"
-    else:
-        try:
-            raw = await r.hget(f"room:{room_id}:params", "anonymity")
-        except Exception:
-            raw = None
-        is_hidden = str(raw or "visible") == "hidden"
-
-    if not is_hidden:
-        return False, set(), False
-
-    if creator_hint > 0:
-        try:
-            raw_allow = await r.smembers(f"room:{room_id}:allow")
-        except Exception:
-            raw_allow = set()
-    else:
+    hidden_raw = str((payload or {}).get("anonymity") or "")
+    if not hidden_raw:
         try:
-            async with r.pipeline() as p:
-                await p.hget(f"room:{room_id}:params", "creator")
-                await p.smembers(f"room:{room_id}:allow")
-                res = await p.execute()
-            creator_hint = _as_int(res[0] if len(res) > 0 else 0)
-            raw_allow = res[1] if len(res) > 1 else set()
+            hidden_raw = str(await r.hget(f"room:{room_id}:params", "anonymity") or "visible")
         except Exception:
-            try:
-                creator_hint = _as_int(await r.hget(f"room:{room_id}:params", "creator"))
-            except Exception:
-                creator_hint = 0
-            try:
-                raw_allow = await r.smembers(f"room:{room_id}:allow")
-            except Exception:
-                raw_allow = set()
-
-    viewers: set[int] = _normalize_user_ids(raw_allow)
-    if creator_hint > 0:
-        viewers.add(creator_hint)
+            hidden_raw = "visible"
 
-    roles_by_rid = await _load_room_creator_roles(r, {room_id: creator_hint})
-    admin_created = roles_by_rid.get(room_id) == ROLE_ADMIN
+    if hidden_raw != "hidden":
+        return False, False
 
-    return True, viewers, admin_created
+    roles_by_rid = await _load_room_creator_roles(r, {room_id: _as_int((payload or {}).get("creator"))})
+    return True, roles_by_rid.get(room_id) == ROLE_ADMIN
 
 
-async def _emit_hidden_rooms_event(event: str, payload: Mapping[str, Any], viewer_ids: Iterable[int], *, include_moder: bool = True) -> None:
-    data = dict(payload)
-    await sio.emit(event, data, room="role:admin", namespace="/rooms")
+async def _emit_hidden_rooms_event(event: str, payload: Mapping[str, Any], rid: int, *, include_moder: bool = True) -> None:
+    rooms = [hidden_room_sio_room(rid), "role:admin"]
     if include_moder:
-        await sio.emit(event, data, room="role:moder", namespace="/rooms")
-    for uid in sorted(_normalize_user_ids(viewer_ids)):
-        await sio.emit(event, data, room=f"user:{uid}", namespace="/rooms")
+        rooms.append("role:moder")
+    await sio.emit(event, dict(payload), room=rooms, namespace="/rooms")
 
 
 async def emit_rooms_upsert_safe(r, rid: int, item: Mapping[str, Any] | None = None) -> None:
@@ -3149,50 +3725,206 @@ async def emit_rooms_upsert_safe(r, rid: int, item: Mapping[str, Any] | None = N
         return
 
     room_id = _as_int(payload.get("id") or rid)
-    is_hidden, viewer_ids, admin_created = await _hidden_room_viewers(r, room_id, payload=payload)
-    if is_hidden:
-        await _emit_hidden_rooms_event("rooms_upsert", payload, viewer_ids, include_moder=not admin_created)
+    try:
+        await store_lobby_brief(r, payload)
+    except Exception as e:
+        log.warning("rooms.lobby.store_failed", rid=room_id, err=type(e).__name__)
+        return
+
+    schedule_lobby_broadcast(room_id)
+    schedule_live_room_refresh(room_id)
+
+
+def schedule_lobby_broadcast(rid: int) -> None:
+    global _lobby_flush_task
+    _lobby_dirty.add(int(rid))
+    if _lobby_flush_task is None or _lobby_flush_task.done():
+        _lobby_flush_task = asyncio.create_task(_flush_lobby_broadcasts())
+
+
+async def _flush_lobby_broadcasts() -> None:
+    global _lobby_flush_task
+    await asyncio.sleep(LOBBY_BROADCAST_WINDOW_SECONDS)
+    _lobby_flush_task = None
+    rids = sorted(_lobby_dirty)
+    _lobby_dirty.clear()
+    if not rids:
+        return
+
+    r = get_redis()
+    try:
+        async with r.pipeline() as p:
+            for rid in rids:
+                await p.eval(LOBBY_DIFF_LUA, 2, LOBBY_BRIEFS_KEY, LOBBY_SENT_KEY, str(rid))
+            rows = await p.execute(raise_on_error=False)
+    except Exception as e:
+        log.warning("rooms.lobby.diff_failed", rooms=len(rids), err=type(e).__name__)
+        return
+
+    public: list[dict] = []
+    for rid, row in zip(rids, rows):
+        if not row or isinstance(row, Exception):
+            continue
+
+        delta = json.loads(row[0])
+        if str(row[1]) != "hidden":
+            public.append(delta)
+            continue
+
+        try:
+            _, admin_created = await _hidden_room_audience(r, rid, payload={"anonymity": "hidden", "creator": row[2]})
+            await _emit_hidden_rooms_event("rooms_delta", {"rooms": [delta]}, rid, include_moder=not admin_created)
+        except Exception as e:
+            log.warning("rooms.lobby.hidden_delta_failed", rid=rid, err=type(e).__name__)
+
+    if public:
+        try:
+            await sio.emit("rooms_delta", {"rooms": public}, namespace="/rooms")
+        except Exception as e:
+            log.warning("rooms.lobby.delta_failed", rooms=len(public), err=type(e).__name__)
+
+
+async def attach_lobby_versions(r, rooms: List[dict]) -> List[dict]:
+    if not rooms:
+        return rooms
+
+    raw = await r.hmget(LOBBY_SENT_KEY, *[str(item["id"]) for item in rooms])
+    for item, sent in zip(rooms, raw):
+        try:
+            item["v"] = int(json.loads(sent)["v"]) if sent else 0
+        except Exception:
+            item["v"] = 0
+
+    return rooms
+
+
+async def set_live_rooms_watcher(r, sid: str, on: bool) -> None:
+    global _live_rooms_heartbeat_task
+    if on:
+        _live_rooms_watchers.add(sid)
+        await r.zadd(LIVE_ROOMS_WATCHERS_KEY, {sid: int(time()) + LIVE_ROOMS_WATCHER_TTL_SECONDS})
+        if _live_rooms_heartbeat_task is None or _live_rooms_heartbeat_task.done():
+            _live_rooms_heartbeat_task = asyncio.create_task(_live_rooms_heartbeat())
+    else:
+        _live_rooms_watchers.discard(sid)
+        await r.zrem(LIVE_ROOMS_WATCHERS_KEY, sid)
+
+
+async def _live_rooms_heartbeat() -> None:
+    while _live_rooms_watchers:
+        await asyncio.sleep(LIVE_ROOMS_WATCHER_HEARTBEAT_SECONDS)
+        if not _live_rooms_watchers:
+            return
+
+        expires_at = int(time()) + LIVE_ROOMS_WATCHER_TTL_SECONDS
+        try:
+            await get_redis().zadd(LIVE_ROOMS_WATCHERS_KEY, {sid: expires_at for sid in _live_rooms_watchers})
+        except Exception as e:
+            log.warning("rooms.live.heartbeat_failed", watchers=len(_live_rooms_watchers), err=type(e).__name__)
+
+
+async def _has_live_rooms_watchers(r) -> bool:
+    now_ts = int(time())
+    async with r.pipeline() as p:
+        await p.zremrangebyscore(LIVE_ROOMS_WATCHERS_KEY, "-inf", now_ts)
+        await p.zcard(LIVE_ROOMS_WATCHERS_KEY)
+        _, watchers = await p.execute()
+    return int(watchers or 0) > 0
+
+
+def schedule_live_room_refresh(rid: int, *, removed: bool = False) -> None:
+    global _live_rooms_flush_task
+    if removed:
+        _live_rooms_dirty.discard(int(rid))
+        _live_rooms_removed.add(int(rid))
+    else:
+        _live_rooms_removed.discard(int(rid))
+        _live_rooms_dirty.add(int(rid))
+    if _live_rooms_flush_task is None or _live_rooms_flush_task.done():
+        _live_rooms_flush_task = asyncio.create_task(_flush_live_rooms())
+
+
+async def _flush_live_rooms() -> None:
+    global _live_rooms_flush_task
+    await asyncio.sleep(LIVE_ROOMS_BROADCAST_WINDOW_SECONDS)
+    _live_rooms_flush_task = None
+    rids = sorted(_live_rooms_dirty)
+    removed = sorted(_live_rooms_removed)
+    _live_rooms_dirty.clear()
+    _live_rooms_removed.clear()
+    if not rids and not removed:
+        return
+
+    r = get_redis()
+    snapshots: dict[int, dict[str, Any]] = {}
+    try:
+        if not await _has_live_rooms_watchers(r):
+            await r.hdel(LIVE_ROOM_STATS_KEY, *[str(rid) for rid in rids + removed])
+            return
+
+        if rids:
+            snapshots = await refresh_live_room_snapshots(r, rids)
+            removed = sorted({*removed, *(rid for rid in rids if rid not in snapshots)})
+        if removed:
+            await r.hdel(LIVE_ROOM_STATS_KEY, *[str(rid) for rid in removed])
+    except Exception as e:
+        log.warning("rooms.live.refresh_failed", rooms=len(rids) + len(removed), err=type(e).__name__)
         return
 
-    await sio.emit("rooms_upsert", payload, namespace="/rooms")
+    now_ts = int(time())
+    rooms = [{"id": rid, **finalize_live_room_snapshot(snapshot, now_ts)} for rid, snapshot in snapshots.items()]
+    try:
+        await sio.emit(
+            "admin_rooms_live",
+            {"at": now_ts, "rooms": rooms, "removed": removed},
+            room=ADMIN_LIVE_ROOMS_SIO_ROOM,
+            namespace="/rooms",
+        )
+    except Exception as e:
+        log.warning("rooms.live.emit_failed", rooms=len(rooms), err=type(e).__name__)
 
 
 async def emit_rooms_event_safe(r, rid: int, event: str, payload: Mapping[str, Any]) -> None:
-    is_hidden, viewer_ids, admin_created = await _hidden_room_viewers(r, rid)
+    if event == "rooms_stream":
+        schedule_live_room_refresh(rid)
+    is_hidden, admin_created = await _hidden_room_audience(r, rid)
     if is_hidden:
-        await _emit_hidden_rooms_event(event, payload, viewer_ids, include_moder=not admin_created)
+        await _emit_hidden_rooms_event(event, payload, rid, include_moder=not admin_created)
         return
 
     await sio.emit(event, dict(payload), namespace="/rooms")
 
 
-async def emit_rooms_remove_safe(r, rid: int, *, hidden: bool | None = None, viewer_ids: Iterable[int] | None = None, admin_created: bool | None = None) -> None:
+async def emit_rooms_remove_safe(r, rid: int, *, hidden: bool | None = None, admin_created: bool | None = None) -> None:
     room_id = _as_int(rid)
     payload = {"id": room_id}
+    try:
+        await drop_lobby_brief(r, room_id)
+    except Exception as e:
+        log.warning("rooms.lobby.drop_failed", rid=room_id, err=type(e).__name__)
+    schedule_live_room_refresh(room_id, removed=True)
+
     is_hidden = hidden
-    target_ids = _normalize_user_ids(viewer_ids)
     admin_created_hidden = bool(admin_created)
     if is_hidden is None:
-        is_hidden, auto_ids, admin_created_hidden = await _hidden_room_viewers(r, room_id)
-        target_ids.update(auto_ids)
-    elif is_hidden and not target_ids:
-        _, auto_ids, admin_created_hidden = await _hidden_room_viewers(r, room_id)
-        target_ids.update(auto_ids)
+        is_hidden, admin_created_hidden = await _hidden_room_audience(r, room_id)
     elif is_hidden and admin_created is None:
-        _, _, admin_created_hidden = await _hidden_room_viewers(r, room_id)
+        _, admin_created_hidden = await _hidden_room_audience(r, room_id)
 
-    if is_hidden:
-        await _emit_hidden_rooms_event("rooms_remove", payload, target_ids, include_moder=not admin_created_hidden)
+    if not is_hidden:
+        await sio.emit("rooms_remove", payload, namespace="/rooms")
         return
 
-    await sio.emit("rooms_remove", payload, namespace="/rooms")
+    await _emit_hidden_rooms_event("rooms_remove", payload, room_id, include_moder=not admin_created_hidden)
+    with suppress(Exception):
+        await sio.close_room(hidden_room_sio_room(room_id), namespace="/rooms")
 
 
 async def join_room_atomic(r, rid: int, uid: int, role: str):
     await ensure_scripts(r)
     now_ts = int(time())
     args = (
-        7,
+        8,
         f"room:{rid}:params",
         f"room:{rid}:members",
         f"room:{rid}:positions",
@@ -3200,6 +3932,7 @@ async def join_room_atomic(r, rid: int, uid: int, role: str):
         f"room:{rid}:empty_since",
         f"room:{rid}:single_since",
         f"room:{rid}:allow",
+        f"room:{rid}:gc_lock",
         str(rid),
         str(uid),
         role,
@@ -3232,19 +3965,24 @@ async def join_spectator_atomic(
     uid: int,
     *,
     hidden_role_bypass: bool = False,
+    public: bool = True,
+    capacity: int | None = None,
 ) -> tuple[int, bool]:
     result = await r.eval(
         SPECTATOR_JOIN_LUA,
-        6,
+        7,
         f"room:{rid}:params",
         f"room:{rid}:game_state",
         f"room:{rid}:game_players",
         f"room:{rid}:spectators",
         f"room:{rid}:allow",
         f"room:{rid}:spectators_join",
+        f"room:{rid}:spectators_public",
         str(uid),
         str(int(time())),
         "1" if hidden_role_bypass else "0",
+        "1" if public else "0",
+        str(-1 if capacity is None else max(0, int(capacity))),
     )
     if not isinstance(result, (list, tuple)) or not result:
         return -3, False
@@ -3254,6 +3992,34 @@ async def join_spectator_atomic(
     return code, added
 
 
+def user_room_reservations_key(uid: int) -> str:
+    return f"user:{int(uid)}:rooms:reservations"
+
+
+async def reserve_room_slot(r, uid: int, *, global_limit: int, user_limit: int) -> int:
+    result = await r.eval(
+        ROOM_RESERVE_LUA,
+        5,
+        "rooms:index",
+        f"user:{int(uid)}:rooms",
+        ROOM_RESERVATIONS_KEY,
+        user_room_reservations_key(uid),
+        ROOM_RESERVATION_SEQ_KEY,
+        str(int(time() * 1000)),
+        str(ROOM_RESERVATION_TTL_SECONDS * 1000),
+        str(max(0, int(global_limit))),
+        str(max(0, int(user_limit))),
+    )
+    return int(result or 0)
+
+
+async def release_room_slot(r, uid: int, token: int) -> None:
+    async with r.pipeline() as p:
+        await p.zrem(ROOM_RESERVATIONS_KEY, str(int(token)))
+        await p.zrem(user_room_reservations_key(uid), str(int(token)))
+        await p.execute()
+
+
 async def set_user_current_room(r, uid: int, rid: int) -> None:
     try:
         await r.set(f"user:{int(uid)}:room", str(int(rid)))
@@ -3362,7 +4128,7 @@ async def leave_spectator_atomic_if_epoch(r, rid: int, uid: int, expected_epoch:
     await ensure_scripts(r)
     now_ts = int(time())
     args = (
-        8,
+        9,
         f"room:{rid}:spectators",
         f"room:{rid}:spectators_join",
         f"room:{rid}:spectators_time",
@@ -3371,6 +4137,7 @@ async def leave_spectator_atomic_if_epoch(r, rid: int, uid: int, expected_epoch:
         f"room:{rid}:ready",
         f"room:{rid}:user:{uid}:bg_state",
         f"room:{rid}:user:{uid}:sid",
+        f"room:{rid}:spectators_public",
         str(uid),
         str(now_ts),
         str(int(expected_epoch)),
@@ -3485,10 +4252,9 @@ async def cleanup_user_from_room(r, rid: int, uid: int, *, was_member: bool, was
         except Exception as err:
             log.warning("sio.join.cleanup.stop_screen_failed", rid=rid, uid=uid, err=type(err).__name__)
 
-        gc_seq = 0
         pos_updates = []
         try:
-            occ, gc_seq, pos_updates = await leave_room_atomic(r, rid, uid)
+            occ, _, pos_updates = await leave_room_atomic(r, rid, uid)
         except Exception:
             log.exception("sio.join.cleanup.leave_room_failed", rid=rid, uid=uid)
             occ = None
@@ -3520,15 +4286,7 @@ async def cleanup_user_from_room(r, rid: int, uid: int, *, was_member: bool, was
                 except Exception:
                     phase = "idle"
                 if phase == "idle":
-                    async def _gc():
-                        try:
-                            removed = await gc_empty_room(rid, expected_seq=gc_seq)
-                            if not removed:
-                                await gc_empty_room(rid)
-                        except Exception:
-                            log.exception("sio.join.cleanup.gc_failed", rid=rid)
-
-                    asyncio.create_task(_gc())
+                    await enqueue_room_gc_safe(rid)
 
     if cleaned:
         removed_from_livekit = False
@@ -3549,39 +4307,19 @@ async def cleanup_user_from_room(r, rid: int, uid: int, *, was_member: bool, was
 
 
 async def emit_rooms_occupancy_safe(r, rid: int, occ: int) -> None:
-    def cancel_single_gc_task(room_id: int) -> None:
-        entry = _single_gc_tasks.pop(room_id, None)
-        if not entry:
-            return
-
-        _, task = entry
-        if not task.done():
-            task.cancel()
-
-    def ensure_single_gc_task(room_id: int, expected_since: str) -> None:
-        existing = _single_gc_tasks.get(room_id)
-        if existing:
-            prev_since, prev_task = existing
-            if not prev_task.done() and prev_since == expected_since:
-                return
-
-            if not prev_task.done():
-                prev_task.cancel()
-
-        task: asyncio.Task[None] | None = None
-
-        async def _runner() -> None:
-            try:
-                await gc_singleton_room_and_emit(room_id, expected_since=expected_since)
-            except asyncio.CancelledError:
-                return
-            finally:
-                cur = _single_gc_tasks.get(room_id)
-                if cur and task and cur[1] is task:
-                    _single_gc_tasks.pop(room_id, None)
+    async def cancel_single_gc_task(room_id: int) -> None:
+        with suppress(Exception):
+            await r.zrem(ROOM_SINGLE_GC_DUE_KEY, str(room_id))
 
-        task = asyncio.create_task(_runner())
-        _single_gc_tasks[room_id] = (expected_since, task)
+    async def ensure_single_gc_task(room_id: int, expected_since: str) -> None:
+        try:
+            ttl_minutes = int(getattr(get_cached_settings(), "rooms_single_ttl_minutes", 0) or 0)
+        except Exception:
+            ttl_minutes = 0
+        try:
+            await r.zadd(ROOM_SINGLE_GC_DUE_KEY, {str(room_id): int(expected_since) + max(0, ttl_minutes * 60)})
+        except Exception:
+            log.warning("gc.single.enqueue_failed", rid=room_id)
 
     try:
         phase = str(await r.hget(f"room:{rid}:game_state", "phase") or "idle")
@@ -3599,7 +4337,7 @@ async def emit_rooms_occupancy_safe(r, rid: int, occ: int) -> None:
             await r.delete(f"room:{rid}:single_since")
         except Exception:
             pass
-        cancel_single_gc_task(rid)
+        await cancel_single_gc_task(rid)
     else:
         occ_to_send = occ
         single_key = f"room:{rid}:single_since"
@@ -3616,57 +4354,44 @@ async def emit_rooms_occupancy_safe(r, rid: int, occ: int) -> None:
                 except Exception:
                     single_since = None
             if single_since:
-                ensure_single_gc_task(rid, str(single_since))
+                await ensure_single_gc_task(rid, str(single_since))
 
         else:
             try:
                 await r.delete(single_key)
             except Exception:
                 pass
-            cancel_single_gc_task(rid)
+            await cancel_single_gc_task(rid)
 
-    await emit_rooms_event_safe(r, rid, "rooms_occupancy", {"id": rid, "occupancy": occ_to_send})
-
-
-async def get_public_spectators_count(r, rid: int) -> int:
+    schedule_live_room_refresh(rid)
     try:
-        raw_ids = await r.smembers(f"room:{rid}:spectators")
-    except Exception:
-        return 0
+        await patch_lobby_brief(r, rid, "occupancy", occ_to_send)
+    except Exception as e:
+        log.warning("rooms.lobby.occupancy_failed", rid=rid, err=type(e).__name__)
+        return
 
-    spectator_ids: set[int] = set()
-    for raw in raw_ids or []:
-        uid = _as_int(raw)
-        if uid > 0:
-            spectator_ids.add(uid)
+    schedule_lobby_broadcast(rid)
 
-    if not spectator_ids:
-        return 0
 
+async def get_public_spectators_count(r, rid: int) -> int:
     try:
-        async with SessionLocal() as s:
-            profiles = await get_user_profiles_cached(s, spectator_ids)
+        return int(await r.scard(f"room:{rid}:spectators_public") or 0)
     except Exception:
-        log.warning("spectators.public_count.profile_lookup_failed", rid=rid)
         return 0
 
-    count = 0
-    for uid in spectator_ids:
-        profile = profiles.get(uid)
-        if not profile:
-            continue
-        if str(profile.get("role") or "user") == "admin":
-            continue
-        count += 1
-
-    return count
-
 
 async def emit_rooms_spectators_safe(r, rid: int, count: int | None = None) -> None:
     if count is None:
         count = await get_public_spectators_count(r, rid)
 
-    await emit_rooms_event_safe(r, rid, "rooms_spectators", {"id": rid, "spectators_count": count})
+    schedule_live_room_refresh(rid)
+    try:
+        await patch_lobby_brief(r, rid, "spectators_count", count)
+    except Exception as e:
+        log.warning("rooms.lobby.spectators_failed", rid=rid, err=type(e).__name__)
+        return
+
+    schedule_lobby_broadcast(rid)
 
 
 async def get_alive_players_in_seat_order(r, rid: int) -> list[int]:
@@ -6575,7 +7300,10 @@ async def record_spectator_leave(r, rid: int, uid: int, now_ts: int) -> None:
     except Exception:
         log.warning("spectator.leave.join_cleanup_failed", rid=rid, uid=uid)
     try:
-        await r.srem(f"room:{rid}:spectators", str(uid))
+        async with r.pipeline() as p:
+            await p.srem(f"room:{rid}:spectators", str(uid))
+            await p.srem(f"room:{rid}:spectators_public", str(uid))
+            await p.execute()
     except Exception:
         log.warning("spectator.leave.remove_failed", rid=rid, uid=uid)
     try:
@@ -6625,13 +7353,26 @@ def _room_lifetime_seconds(created_at: datetime | None, deleted_at: datetime | N
         return 0
 
 
-def _guaranteed_room_overlap_seconds(first_seconds: int, second_seconds: int, lifetime_seconds: int) -> int:
-    if lifetime_seconds <= 0:
-        return 0
+def _top_room_overlap_pairs(activity: Mapping[int, int], lifetime_seconds: int, limit: int) -> list[tuple[int, int, int]]:
+    users = sorted(((min(seconds, lifetime_seconds), uid) for uid, seconds in activity.items()), reverse=True)
+    if len(users) < 2 or limit <= 0:
+        return []
+
+    out: list[tuple[int, int, int]] = []
+    heap = [(lifetime_seconds - users[0][0] - users[1][0], 0, 1)]
+    while heap and len(out) < limit:
+        neg_overlap, i, j = heappop(heap)
+        if neg_overlap >= 0:
+            break
+
+        lo, hi = sorted((users[i][1], users[j][1]))
+        out.append((lo, hi, -neg_overlap))
+        if j + 1 < len(users):
+            heappush(heap, (lifetime_seconds - users[i][0] - users[j + 1][0], i, j + 1))
+        if j == i + 1 and j + 1 < len(users):
+            heappush(heap, (lifetime_seconds - users[j][0] - users[j + 1][0], j, j + 1))
 
-    first = min(max(0, int(first_seconds or 0)), lifetime_seconds)
-    second = min(max(0, int(second_seconds or 0)), lifetime_seconds)
-    return max(0, first + second - lifetime_seconds)
+    return out
 
 
 def _players_from_game_roles(roles_raw: Any) -> list[int]:
@@ -6651,16 +7392,17 @@ def _players_from_game_roles(roles_raw: Any) -> list[int]:
     return sorted(players)
 
 
-async def increment_friend_closeness_from_deleted_room(session: AsyncSession, *, room_id: int, created_at: datetime | None, deleted_at: datetime | None, visitors: Any) -> set[int]:
-    rid = int(room_id or 0)
-    if rid <= 0:
+async def increment_friend_closeness_from_deleted_rooms(session: AsyncSession, rooms: Iterable[tuple[int, datetime | None, datetime | None, Any]]) -> set[int]:
+    closed = {int(rid): (created_at, deleted_at, visitors) for rid, created_at, deleted_at, visitors in rooms if int(rid or 0) > 0}
+    if not closed:
         return set()
 
+    started = perf_counter()
     game_counts: dict[tuple[int, int], int] = {}
     room_seconds: dict[tuple[int, int], int] = {}
 
     rows = await session.execute(
-        select(Game.roles).where(Game.room_id == rid)
+        select(Game.roles).where(Game.room_id.in_(list(closed)))
     )
     for roles_raw in rows.scalars().all():
         players = _players_from_game_roles(roles_raw)
@@ -6672,24 +7414,15 @@ async def increment_friend_closeness_from_deleted_room(session: AsyncSession, *,
                 key = (players[i], players[j])
                 game_counts[key] = game_counts.get(key, 0) + 1
 
-    lifetime_seconds = _room_lifetime_seconds(created_at, deleted_at)
-    if lifetime_seconds > 0:
-        activity = _activity_seconds_by_user(visitors)
-        users = sorted(activity.keys())
-
-        for i in range(0, len(users)):
-            for j in range(i + 1, len(users)):
-                lo, hi = users[i], users[j]
-                overlap = _guaranteed_room_overlap_seconds(
-                    activity[lo],
-                    activity[hi],
-                    lifetime_seconds,
-                )
-                if overlap <= 0:
-                    continue
+    for created_at, deleted_at, visitors in closed.values():
+        lifetime_seconds = _room_lifetime_seconds(created_at, deleted_at)
+        if lifetime_seconds <= 0:
+            continue
 
-                key = (lo, hi)
-                room_seconds[key] = room_seconds.get(key, 0) + overlap
+        activity = _activity_seconds_by_user(visitors)
+        pairs = _top_room_overlap_pairs(activity, lifetime_seconds, FRIEND_CLOSENESS_MAX_PAIRS_PER_ROOM)
+        for lo, hi, overlap in pairs:
+            room_seconds[(lo, hi)] = room_seconds.get((lo, hi), 0) + overlap
 
     keys = sorted(set(game_counts.keys()) | set(room_seconds.keys()))
     values = [
@@ -6703,19 +7436,24 @@ async def increment_friend_closeness_from_deleted_room(session: AsyncSession, *,
         if game_counts.get((lo, hi), 0) > 0 or room_seconds.get((lo, hi), 0) > 0
     ]
 
+    observe("friend_closeness_compute_seconds", perf_counter() - started)
+    observe("friend_closeness_pairs", len(values))
     if not values:
         return set()
 
-    stmt = insert(FriendCloseness).values(values)
-    stmt = stmt.on_conflict_do_update(
-        index_elements=["user_low", "user_high"],
-        set_={
-            "games_together": FriendCloseness.games_together + stmt.excluded.games_together,
-            "room_seconds_together": FriendCloseness.room_seconds_together + stmt.excluded.room_seconds_together,
-            "updated_at": func.now(),
-        },
-    )
-    await session.execute(stmt)
+    started = perf_counter()
+    for offset in range(0, len(values), FRIEND_CLOSENESS_UPSERT_CHUNK):
+        stmt = insert(FriendCloseness).values(values[offset:offset + FRIEND_CLOSENESS_UPSERT_CHUNK])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_low", "user_high"],
+            set_={
+                "games_together": FriendCloseness.games_together + stmt.excluded.games_together,
+                "room_seconds_together": FriendCloseness.room_seconds_together + stmt.excluded.room_seconds_together,
+                "updated_at": func.now(),
+            },
+        )
+        await session.execute(stmt)
+    observe("friend_closeness_upsert_seconds", perf_counter() - started)
 
     changed_user_ids: set[int] = set()
     for lo, hi in keys:
@@ -7027,6 +7765,9 @@ async def game_start_unlocked(sid, data) -> GameStartAck:
                 await p.zrem(f"room:{rid}:requests", *[str(uid) for uid in room_request_remove_requests])
             await p.execute()
 
+        if room_request_remove_allow and str(params.get("anonymity") or "visible") == "hidden":
+            await leave_hidden_room_viewers(rid, room_request_remove_allow)
+
         if room_request_removed_ids:
             try:
                 owner_uid = int(params.get("creator") or 0)
@@ -7895,7 +8636,7 @@ async def _perform_game_end_unlocked(ctx, sess: Optional[dict[str, Any]], *, con
     await _cleanup_game_end_spectators(spectators_soft_2)
 
     try:
-        await r.delete(f"room:{rid}:spectators", f"room:{rid}:spectators_join")
+        await r.delete(f"room:{rid}:spectators", f"room:{rid}:spectators_public", f"room:{rid}:spectators_join")
     except Exception:
         log.exception("sio.game_end.spectators_clear_failed", rid=rid)
 
@@ -7976,27 +8717,11 @@ async def maybe_end_game_if_room_presence_low(r, rid: int, *, reason: str = "pre
     return bool(resp and resp.get("ok"))
 
 
-async def gc_singleton_room_and_emit(rid: int, *, expected_since: str | None = None) -> None:
-    try:
-        await gc_singleton_room(rid, expected_since=expected_since)
-    except Exception:
-        log.exception("gc.single.failed", rid=rid)
-
-
-async def gc_singleton_room(rid: int, *, expected_since: str | None = None) -> bool:
-    r = get_redis()
+async def gc_singleton_room(r, rid: int, *, now_ts: int) -> bool:
     single_key = f"room:{rid}:single_since"
-    ts1_raw = await r.get(single_key)
-    if not ts1_raw:
-        return False
-
-    ts1 = str(ts1_raw)
-    if expected_since is not None and ts1 != str(expected_since):
-        return False
-
-    try:
-        ts1_int = int(ts1)
-    except Exception:
+    ts1 = _as_int(await r.get(single_key))
+    if ts1 <= 0:
+        await r.zrem(ROOM_SINGLE_GC_DUE_KEY, str(rid))
         return False
 
     try:
@@ -8004,14 +8729,11 @@ async def gc_singleton_room(rid: int, *, expected_since: str | None = None) -> b
     except Exception:
         ttl_minutes = 0
     ttl_seconds = max(0, ttl_minutes * 60)
-    delay = max(0, ttl_seconds - (int(time()) - ts1_int))
-    if delay > 0:
-        await asyncio.sleep(delay)
-
-    ts2_raw = await r.get(single_key)
-    if not ts2_raw or str(ts2_raw) != ts1:
+    if ts1 + ttl_seconds > now_ts:
+        await r.zadd(ROOM_SINGLE_GC_DUE_KEY, {str(rid): ts1 + ttl_seconds})
         return False
 
+    await r.zrem(ROOM_SINGLE_GC_DUE_KEY, str(rid))
     try:
         phase = str(await r.hget(f"room:{rid}:game_state", "phase") or "idle")
     except Exception:
@@ -8028,11 +8750,7 @@ async def gc_singleton_room(rid: int, *, expected_since: str | None = None) -> b
         return False
 
     try:
-        ts3_raw = await r.get(single_key)
-        if not ts3_raw or str(ts3_raw) != ts1:
-            return False
-
-        if int(await r.scard(f"room:{rid}:members") or 0) != 1:
+        if _as_int(await r.get(single_key)) != ts1:
             return False
 
         try:
@@ -8046,10 +8764,7 @@ async def gc_singleton_room(rid: int, *, expected_since: str | None = None) -> b
                 break
             except Exception:
                 continue
-        if target_uid <= 0:
-            return False
-
-        if not await r.sismember(f"room:{rid}:members", str(target_uid)):
+        if target_uid <= 0 or len(members_raw or []) != 1:
             return False
 
         await sio.emit("force_leave",
@@ -8074,7 +8789,7 @@ async def gc_singleton_room(rid: int, *, expected_since: str | None = None) -> b
             log.warning("gc.single.stop_screen_failed", rid=rid, uid=target_uid)
 
         try:
-            occ, gc_seq, pos_updates = await leave_room_atomic(r, rid, target_uid)
+            occ, _, pos_updates = await leave_room_atomic(r, rid, target_uid)
         except Exception:
             log.exception("gc.single.leave_failed", rid=rid, uid=target_uid)
             return False
@@ -8109,11 +8824,7 @@ async def gc_singleton_room(rid: int, *, expected_since: str | None = None) -> b
         if occ != 0:
             return False
 
-        removed = await gc_empty_room(rid, expected_seq=gc_seq)
-        if removed:
-            return True
-
-        return await gc_empty_room(rid)
+        return await enqueue_room_gc(r, rid)
 
     finally:
         try:
@@ -8122,274 +8833,336 @@ async def gc_singleton_room(rid: int, *, expected_since: str | None = None) -> b
             pass
 
 
-async def gc_empty_room(rid: int, *, expected_seq: int | None = None) -> bool:
+async def run_single_room_gc_batch(limit: int = ROOM_GC_BATCH_SIZE) -> int:
     r = get_redis()
-    ts1 = await r.get(f"room:{rid}:empty_since")
-    if not ts1:
-        log.warning("gc.skip.no_empty_since", rid=rid)
-        return False
+    now_ts = int(time())
+    raw_ids = await r.zrangebyscore(ROOM_SINGLE_GC_DUE_KEY, "-inf", now_ts, start=0, num=limit)
+    for raw in raw_ids or []:
+        rid = _as_int(raw)
+        if rid <= 0:
+            await r.zrem(ROOM_SINGLE_GC_DUE_KEY, raw)
+            continue
 
-    ttl_seconds = max(0, int(get_cached_settings().rooms_empty_ttl_seconds))
-    delay = max(0, ttl_seconds - (int(time()) - int(ts1)))
-    if delay > 0:
-        await asyncio.sleep(delay)
+        try:
+            await gc_singleton_room(r, rid, now_ts=now_ts)
+        except Exception:
+            log.exception("gc.single.failed", rid=rid)
 
-    ts2 = await r.get(f"room:{rid}:empty_since")
-    if not ts2 or ts1 != ts2:
-        log.warning("gc.skip.race_or_reset", rid=rid)
-        return False
+    return len(raw_ids or [])
 
-    if expected_seq is not None:
-        cur_seq = int(await r.get(f"room:{rid}:gc_seq") or 0)
-        if cur_seq != expected_seq:
-            log.warning("gc.skip.seq_mismatch", rid=rid, expected=expected_seq, current=cur_seq)
-            return False
 
-    if int(await r.scard(f"room:{rid}:members") or 0) > 0:
-        log.warning("gc.skip.not_empty_anymore", rid=rid)
-        return False
+def _int_seconds_map(raw: Any) -> dict[int, int]:
+    out: dict[int, int] = {}
+    for k, v in (raw or {}).items():
+        try:
+            out[int(k)] = int(v or 0)
+        except Exception:
+            continue
 
-    got = await r.set(f"room:{rid}:gc_lock", "1", nx=True, ex=20)
-    if not got:
-        log.warning("gc.skip.no_lock", rid=rid)
-        return False
+    return out
 
-    try:
-        raw = await r.hgetall(f"room:{rid}:visitors")
-        room_anonymity_raw = await r.hget(f"room:{rid}:params", "anonymity")
-        room_creator_raw = await r.hget(f"room:{rid}:params", "creator")
-        room_anonymity = "hidden" if str(room_anonymity_raw or "visible") == "hidden" else "visible"
-        room_creator = _as_int(room_creator_raw)
-        room_admin_created = False
-        hidden_remove_targets: set[int] = set()
-        if room_anonymity == "hidden":
-            room_creator_roles = await _load_room_creator_roles(r, {rid: room_creator})
-            room_admin_created = room_creator_roles.get(rid) == ROLE_ADMIN
-            if room_creator > 0:
-                hidden_remove_targets.add(room_creator)
-            try:
-                hidden_remove_targets.update(_normalize_user_ids(await r.smembers(f"room:{rid}:allow")))
-            except Exception:
-                pass
 
-        visitors_map: dict[int, int] = {}
-        for k, v in (raw or {}).items():
-            try:
-                visitors_map[int(k)] = int(v or 0)
-            except Exception:
+async def _claim_due_rooms(r, limit: int, token: str) -> list[int]:
+    now_ts = int(time())
+    raw_ids = await r.zrangebyscore(ROOM_GC_DUE_KEY, "-inf", now_ts, start=0, num=limit)
+    dropped = [str(raw) for raw in raw_ids or [] if _as_int(raw) <= 0]
+    rids = [rid for rid in (_as_int(raw) for raw in raw_ids or []) if rid > 0]
+    deferred: dict[str, int] = {}
+    due: list[int] = []
+    if rids:
+        ttl_seconds = max(0, int(get_cached_settings().rooms_empty_ttl_seconds))
+        async with r.pipeline() as p:
+            for rid in rids:
+                await p.get(f"room:{rid}:empty_since")
+                await p.scard(f"room:{rid}:members")
+            rows = await p.execute()
+
+        for idx, rid in enumerate(rids):
+            empty_since = _as_int(rows[idx * 2])
+            if empty_since <= 0 or _as_int(rows[idx * 2 + 1]) > 0:
+                dropped.append(str(rid))
+            elif empty_since + ttl_seconds > now_ts:
+                deferred[str(rid)] = empty_since + ttl_seconds
+            else:
+                due.append(rid)
+
+    async with r.pipeline() as p:
+        if dropped:
+            await p.zrem(ROOM_GC_DUE_KEY, *dropped)
+        if deferred:
+            await p.zadd(ROOM_GC_DUE_KEY, deferred)
+        for rid in due:
+            await p.set(f"room:{rid}:gc_lock", token, nx=True, ex=ROOM_GC_LOCK_TTL_SECONDS)
+        rows = await p.execute()
+
+    locks = rows[len(rows) - len(due):] if due else []
+    return [rid for rid, got in zip(due, locks) if got]
+
+
+async def _collect_room_gc_snapshots(r, rids: list[int]) -> dict[int, dict[str, Any]]:
+    now_ts = int(time())
+    async with r.pipeline() as p:
+        for rid in rids:
+            await p.scard(f"room:{rid}:members")
+            await p.hgetall(f"room:{rid}:visitors")
+            await p.hmget(f"room:{rid}:params", "anonymity", "creator")
+            await p.hgetall(f"room:{rid}:spectators_join")
+            await p.hgetall(f"room:{rid}:spectators_time")
+            await p.hgetall(f"room:{rid}:screen_time")
+            await p.get(f"room:{rid}:screen_owner")
+            await p.get(f"room:{rid}:screen_started_at")
+            await p.get(f"room:{rid}:empty_since")
+            await p.get(f"room:{rid}:gc_seq")
+        rows = await p.execute()
+
+    out: dict[int, dict[str, Any]] = {}
+    step = 10
+    for idx, rid in enumerate(rids):
+        members, visitors_raw, params, spec_join_raw, spec_raw, screen_raw, owner_raw, started_raw, empty_since_raw, gc_seq_raw = rows[idx * step: idx * step + step]
+        if _as_int(members) > 0:
+            log.warning("gc.skip.not_empty_anymore", rid=rid)
+            continue
+
+        spectators = _int_seconds_map(spec_raw)
+        for uid, join_ts in _int_seconds_map(spec_join_raw).items():
+            if now_ts - join_ts > 0:
+                spectators[uid] = spectators.get(uid, 0) + now_ts - join_ts
+
+        screen = _int_seconds_map(screen_raw)
+        owner = _as_int(owner_raw)
+        started = _as_int(started_raw)
+        if owner > 0 and started > 0 and now_ts - started > 0:
+            screen[owner] = screen.get(owner, 0) + now_ts - started
+
+        anonymity_raw, creator_raw = (list(params or []) + [None, None])[:2]
+        out[rid] = {
+            "visitors": _int_seconds_map(visitors_raw),
+            "spectators": spectators,
+            "screen": screen,
+            "anonymity": "hidden" if str(anonymity_raw or "visible") == "hidden" else "visible",
+            "creator": _as_int(creator_raw),
+            "empty_since": str(empty_since_raw or ""),
+            "gc_seq": str(gc_seq_raw or ""),
+        }
+
+    return out
+
+
+async def _persist_room_gc_batch(snapshots: Mapping[int, Mapping[str, Any]]) -> tuple[dict[int, int], set[int]]:
+    now_dt = datetime.now(timezone.utc)
+    creators: dict[int, int] = {}
+    closed_rooms: list[tuple[int, datetime | None, datetime | None, Any]] = []
+    purge_ids: list[int] = []
+    async with SessionLocal() as s:
+        rows = await s.execute(select(Room).where(Room.id.in_(list(snapshots))))
+        rooms = {int(rm.id): rm for rm in rows.scalars().all()}
+        games_counts: dict[int, int] = {}
+        if rooms:
+            res = await s.execute(
+                select(Game.room_id, func.count(Game.id))
+                .where(Game.room_id.in_(list(rooms)))
+                .group_by(Game.room_id)
+            )
+            games_counts = {int(room_id): int(count or 0) for room_id, count in res.all()}
+
+        for rid, snap in snapshots.items():
+            rm = rooms.get(rid)
+            if rm is None:
                 continue
 
-        raw_spec_join = await r.hgetall(f"room:{rid}:spectators_join")
-        if raw_spec_join:
-            now_ts = int(time())
-            for k, v in raw_spec_join.items():
+            rm_creator = cast(int, rm.creator)
+            creators[rid] = rm_creator
+            visitors_map: dict[int, int] = snap["visitors"]
+            details = f"Удаление комнаты room_id={rid} title={rm.title} count_users={len(visitors_map)}"
+            rm.anonymity = snap["anonymity"]
+            if len(set(visitors_map) | set(snap["screen"]) | set(snap["spectators"])) <= 1:
+                purge_ids.append(rid)
+                await log_action(s, user_id=rm_creator, username=cast(str, rm.creator_name), action="room_deleted", details=details, commit=False)
+                continue
+
+            merged_screen_time = {**(rm.screen_time or {}), **{str(uid): max(0, sec) for uid, sec in snap["screen"].items()}}
+            merged_visitors = {**(rm.visitors or {}), **{str(uid): max(0, sec) for uid, sec in visitors_map.items()}}
+            try:
+                details += f" lifetime_sec={int((now_dt - rm.created_at).total_seconds())}"
+            except Exception:
+                pass
+            total_stream_sec = 0
+            for v in merged_screen_time.values():
                 try:
-                    uid_i = int(k)
-                    join_ts = int(v or 0)
+                    total_stream_sec += int(v or 0)
                 except Exception:
                     continue
-                dt = now_ts - join_ts
-                if dt > 0:
-                    try:
-                        await r.hincrby(f"room:{rid}:spectators_time", str(uid_i), dt)
-                    except Exception:
-                        log.warning("gc.spectators_time.flush_failed", rid=rid, uid=uid_i)
+            details += f" total_stream_sec={total_stream_sec}"
+            if games_counts.get(rid, 0) > 0:
+                details += f" games_count={games_counts[rid]}"
 
-        owner = await r.get(f"room:{rid}:screen_owner")
-        started = await r.get(f"room:{rid}:screen_started_at")
-        if owner and started:
-            try:
-                dt = int(time()) - int(started)
-                if dt > 0:
-                    await r.hincrby(f"room:{rid}:screen_time", str(int(owner)), dt)
-            except Exception as e:
-                log.warning("gc.screen_time.flush_failed", rid=rid, err=type(e).__name__)
+            if rm.deleted_at is None:
+                closed_rooms.append((rid, rm.created_at, now_dt, merged_visitors))
+            rm.visitors = merged_visitors
+            rm.screen_time = merged_screen_time
+            rm.spectators_time = {**(rm.spectators_time or {}), **{str(uid): max(0, sec) for uid, sec in snap["spectators"].items()}}
+            rm.deleted_at = now_dt
+            await log_action(s, user_id=rm_creator, username=cast(str, rm.creator_name), action="room_deleted", details=details, commit=False)
 
-        raw_scr = await r.hgetall(f"room:{rid}:screen_time")
-        screen_map_sec: dict[int, int] = {}
-        for k, v in (raw_scr or {}).items():
-            try:
-                screen_map_sec[int(k)] = int(v or 0)
-            except Exception:
-                continue
+        if purge_ids:
+            await s.execute(delete(Room).where(Room.id.in_(purge_ids)))
+        closeness_changed_user_ids = await increment_friend_closeness_from_deleted_rooms(s, closed_rooms)
+        await s.commit()
+
+    for rid in purge_ids:
+        log.info("gc.room.purged_single_user", rid=rid, creator=creators.get(rid))
+    return creators, closeness_changed_user_ids
+
+
+async def _hold_room_gc_claims(r, snapshots: Mapping[int, Mapping[str, Any]], token: str) -> set[int]:
+    async with r.pipeline() as p:
+        for rid, snap in snapshots.items():
+            await p.eval(
+                ROOM_GC_HOLD_LUA,
+                4,
+                f"room:{rid}:gc_lock",
+                f"room:{rid}:members",
+                f"room:{rid}:empty_since",
+                f"room:{rid}:gc_seq",
+                token,
+                snap["empty_since"],
+                snap["gc_seq"],
+                ROOM_GC_LOCK_TTL_SECONDS,
+            )
+        rows = await p.execute()
+
+    return {rid for rid, held in zip(snapshots, rows) if held}
 
-        raw_spec = await r.hgetall(f"room:{rid}:spectators_time")
-        spectators_map_sec: dict[int, int] = {}
-        for k, v in (raw_spec or {}).items():
+
+async def _clear_room_gc_keys(r, rid: int, creator: int, *, empty_since: str, gc_seq: str, token: str) -> bool:
+    cleared = await r.eval(
+        ROOM_GC_CLEAR_LUA,
+        8 + len(_ROOM_GC_KEY_SUFFIXES),
+        f"room:{rid}:members",
+        f"room:{rid}:empty_since",
+        f"room:{rid}:gc_seq",
+        "rooms:index",
+        ROOM_GC_DUE_KEY,
+        ROOM_SINGLE_GC_DUE_KEY,
+        f"user:{creator}:rooms",
+        f"room:{rid}:gc_lock",
+        *[f"room:{rid}:{suffix}" for suffix in _ROOM_GC_KEY_SUFFIXES],
+        str(rid),
+        empty_since,
+        gc_seq,
+        "1" if creator > 0 else "0",
+        token,
+    )
+    if not cleared:
+        return False
+
+    async def _del_scan(pattern: str, count: int = 200):
+        cursor = 0
+        while True:
+            cursor, keys = await r.scan(cursor=cursor, match=pattern, count=count)
+            if keys:
+                await r.unlink(*keys)
+            if cursor == 0:
+                break
+
+    await _del_scan(f"room:{rid}:user:*:info")
+    await _del_scan(f"room:{rid}:user:*:state")
+    await _del_scan(f"room:{rid}:user:*:block")
+    await _del_scan(f"room:{rid}:user:*:epoch")
+    await _del_scan(f"room:{rid}:user:*:bg_state")
+    await _del_scan(f"room:{rid}:user:*:sid")
+    await _del_scan(f"room:{rid}:speaker_alert_seen:*")
+    return True
+
+
+async def run_room_gc_batch(limit: int = ROOM_GC_BATCH_SIZE) -> int:
+    r = get_redis()
+    token = uuid4().hex
+    rids = await _claim_due_rooms(r, limit, token)
+    if not rids:
+        return 0
+
+    try:
+        snapshots = await _collect_room_gc_snapshots(r, rids)
+        stale = [str(rid) for rid in rids if rid not in snapshots]
+        if stale:
+            await r.zrem(ROOM_GC_DUE_KEY, *stale)
+        held = await _hold_room_gc_claims(r, snapshots, token) if snapshots else set()
+        lost = [rid for rid in snapshots if rid not in held]
+        if lost:
+            log.warning("gc.skip.claim_lost", rooms=len(lost))
+            await r.zadd(ROOM_GC_DUE_KEY, {str(rid): int(time()) + ROOM_GC_RETRY_SECONDS for rid in lost})
+        snapshots = {rid: snap for rid, snap in snapshots.items() if rid in held}
+        if not snapshots:
+            return 0
+
+        try:
+            creators, closeness_changed_user_ids = await _persist_room_gc_batch(snapshots)
+        except Exception:
+            log.exception("gc.db.persist_failed", rooms=len(snapshots))
+            retry_at = int(time()) + ROOM_GC_RETRY_SECONDS
+            await r.zadd(ROOM_GC_DUE_KEY, {str(rid): retry_at for rid in snapshots})
+            return 0
+
+        hidden_creators = {rid: snap["creator"] for rid, snap in snapshots.items() if snap["anonymity"] == "hidden"}
+        creator_roles = await _load_room_creator_roles(r, hidden_creators) if hidden_creators else {}
+        for rid, snap in snapshots.items():
             try:
-                spectators_map_sec[int(k)] = int(v or 0)
+                cleared = await _clear_room_gc_keys(
+                    r,
+                    rid,
+                    creators.get(rid) or snap["creator"],
+                    empty_since=snap["empty_since"],
+                    gc_seq=snap["gc_seq"],
+                    token=token,
+                )
             except Exception:
+                log.exception("gc.redis.cleanup_failed", rid=rid)
                 continue
 
-        unique_user_ids = set(visitors_map.keys()) | set(screen_map_sec.keys()) | set(spectators_map_sec.keys())
-        unique_user_count = len(unique_user_ids)
-        try:
-            async with SessionLocal() as s:
-                rm = await s.get(Room, rid)
-                if rm:
-                    rm_title = rm.title
-                    rm_creator = cast(int, rm.creator)
-                    rm_creator_name = cast(str, rm.creator_name)
-                    unique_visitors = len(set(visitors_map.keys()))
-
-                    now_dt = datetime.now(timezone.utc)
-                    screen_time_patch = {str(uid): max(0, sec) for uid, sec in screen_map_sec.items()}
-                    merged_screen_time = {**(rm.screen_time or {}), **screen_time_patch}
-                    spectators_time_patch = {str(uid): max(0, sec) for uid, sec in spectators_map_sec.items()}
-                    merged_spectators_time = {**(rm.spectators_time or {}), **spectators_time_patch}
-                    rm.anonymity = room_anonymity
-
-                    if unique_user_count <= 1:
-                        details = f"Удаление комнаты room_id={rid} title={rm_title} count_users={unique_visitors}"
-                        await log_action(
-                            s,
-                            user_id=rm_creator,
-                            username=rm_creator_name,
-                            action="room_deleted",
-                            details=details,
-                            commit=False,
-                        )
-                        await s.execute(delete(Room).where(Room.id == rid))
-                        await s.commit()
-                        await r.srem(f"user:{rm_creator}:rooms", str(rid))
-                        log.info("gc.room.purged_single_user", rid=rid, creator=rm_creator)
-                    else:
-                        try:
-                            lifetime_sec = int((now_dt - rm.created_at).total_seconds())
-                        except Exception:
-                            lifetime_sec = None
-                        total_stream_sec = 0
-                        for v in merged_screen_time.values():
-                            try:
-                                total_stream_sec += int(v or 0)
-                            except Exception:
-                                continue
-                        games_count = 0
-                        try:
-                            res = await s.execute(select(func.count(Game.id)).where(Game.room_id == rid))
-                            games_count = int(res.scalar() or 0)
-                        except Exception:
-                            log.exception("gc.room_games_count_failed", rid=rid)
-
-                        was_already_deleted = rm.deleted_at is not None
-                        merged_visitors = {
-                            **(rm.visitors or {}),
-                            **{str(k): max(0, v) for k, v in visitors_map.items()},
-                        }
-
-                        rm.visitors = merged_visitors
-                        rm.screen_time = merged_screen_time
-                        rm.spectators_time = merged_spectators_time
-                        rm.deleted_at = now_dt
-
-                        closeness_changed_user_ids: set[int] = set()
-                        if not was_already_deleted:
-                            closeness_changed_user_ids = await increment_friend_closeness_from_deleted_room(
-                                s,
-                                room_id=rid,
-                                created_at=rm.created_at,
-                                deleted_at=now_dt,
-                                visitors=merged_visitors,
-                            )
-
-                        await r.srem(f"user:{rm_creator}:rooms", str(rid))
-                        details = f"Удаление комнаты room_id={rid} title={rm_title} count_users={unique_visitors}"
-                        if lifetime_sec is not None:
-                            details += f" lifetime_sec={lifetime_sec}"
-                        details += f" total_stream_sec={total_stream_sec}"
-                        if games_count > 0:
-                            details += f" games_count={games_count}"
-
-                        if closeness_changed_user_ids:
-                            await emit_friends_closeness_update(closeness_changed_user_ids)
-
-                        await log_action(
-                            s,
-                            user_id=rm_creator,
-                            username=rm_creator_name,
-                            action="room_deleted",
-                            details=details,
-                        )
-
-        except Exception:
-            log.exception("gc.db.persist_failed", rid=rid)
-            raise
+            if not cleared:
+                log.error("gc.redis.claim_expired", rid=rid)
+                continue
 
-        async def _del_scan(pattern: str, count: int = 200):
-            cursor = 0
-            while True:
-                cursor, keys = await r.scan(cursor=cursor, match=pattern, count=count)
-                if keys:
-                    await r.unlink(*keys)
-                if cursor == 0:
-                    break
+            _room_creator_roles.pop(rid, None)
+            hidden = snap["anonymity"] == "hidden"
+            try:
+                await emit_rooms_remove_safe(
+                    r,
+                    rid,
+                    hidden=hidden,
+                    admin_created=creator_roles.get(rid) == ROLE_ADMIN if hidden else None,
+                )
+            except Exception as e:
+                log.warning("gc.rooms_remove.emit_failed", rid=rid, err=type(e).__name__)
 
-        await _del_scan(f"room:{rid}:user:*:info")
-        await _del_scan(f"room:{rid}:user:*:state")
-        await _del_scan(f"room:{rid}:user:*:block")
-        await _del_scan(f"room:{rid}:user:*:epoch")
-        await _del_scan(f"room:{rid}:user:*:bg_state")
-        await _del_scan(f"room:{rid}:user:*:sid")
-        await _del_scan(f"room:{rid}:speaker_alert_seen:*")
-        await r.delete(
-            f"room:{rid}:members",
-            f"room:{rid}:positions",
-            f"room:{rid}:visitors",
-            f"room:{rid}:params",
-            f"room:{rid}:game",
-            f"room:{rid}:spectators",
-            f"room:{rid}:spectators_time",
-            f"room:{rid}:spectators_join",
-            f"room:{rid}:gc_seq",
-            f"room:{rid}:empty_since",
-            f"room:{rid}:single_since",
-            f"room:{rid}:gc_lock",
-            f"room:{rid}:gc_single_lock",
-            f"room:{rid}:allow",
-            f"room:{rid}:pending",
-            f"room:{rid}:requests",
-            f"room:{rid}:invited",
-            f"room:{rid}:screen_time",
-            f"room:{rid}:screen_owner",
-            f"room:{rid}:screen_quality",
-            f"room:{rid}:screen_started_at",
-            f"room:{rid}:ready",
-            f"room:{rid}:speaker_alert_cycles",
-            f"room:{rid}:speaker_alert_active",
-            f"room:{rid}:game_state",
-            f"room:{rid}:game_seats",
-            f"room:{rid}:game_players",
-            f"room:{rid}:game_alive",
-            f"room:{rid}:roles_cards",
-            f"room:{rid}:roles_taken",
-            f"room:{rid}:game_roles",
-            f"room:{rid}:game_fouls",
-            f"room:{rid}:game_short_speech_used",
-            f"room:{rid}:game_nominees",
-            f"room:{rid}:game_nom_speakers",
-            f"room:{rid}:game_votes",
-        )
-        await r.zrem("rooms:index", str(rid))
-        entry = _single_gc_tasks.pop(rid, None)
-        if entry:
-            _, task = entry
-            if not task.done():
-                task.cancel()
+        if closeness_changed_user_ids:
+            await emit_friends_closeness_update(closeness_changed_user_ids)
+        log.info("gc.rooms.batch_done", rooms=len(snapshots))
+        return len(snapshots)
 
-        try:
-            await emit_rooms_remove_safe(
-                r,
-                rid,
-                hidden=(room_anonymity == "hidden"),
-                viewer_ids=hidden_remove_targets if room_anonymity == "hidden" else None,
-                admin_created=room_admin_created if room_anonymity == "hidden" else None,
-            )
-        except Exception as e:
-            log.warning("gc.rooms_remove.emit_failed", rid=rid, err=type(e).__name__)
     finally:
         try:
-            await r.delete(f"room:{rid}:gc_lock")
+            await r.eval(ROOM_GC_RELEASE_LUA, len(rids), *[f"room:{rid}:gc_lock" for rid in rids], token)
         except Exception as e:
-            log.warning("gc.lock.release_failed", rid=rid, err=type(e).__name__)
+            log.warning("gc.lock.release_failed", rooms=len(rids), err=type(e).__name__)
 
-    return True
+
+async def get_room_gc_backlog(r) -> dict[str, int]:
+    now_ts = int(time())
+    async with r.pipeline() as p:
+        await p.zcount(ROOM_GC_DUE_KEY, "-inf", now_ts)
+        await p.zcard(ROOM_GC_DUE_KEY)
+        await p.zrange(ROOM_GC_DUE_KEY, 0, 0, withscores=True)
+        await p.zcount(ROOM_SINGLE_GC_DUE_KEY, "-inf", now_ts)
+        await p.zcard(ROOM_SINGLE_GC_DUE_KEY)
+        due, scheduled, head, single_due, single_scheduled = await p.execute()
+
+    oldest_due = int(head[0][1]) if head else 0
+    return {
+        "due": int(due or 0),
+        "scheduled": int(scheduled or 0),
+        "single_due": int(single_due or 0),
+        "single_scheduled": int(single_scheduled or 0),
+        "lag_seconds": max(0, now_ts - oldest_due) if due and oldest_due else 0,
+    }
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from datetime import datetime
-from typing import Annotated, Optional, List, Literal
+from typing import Annotated, Any, Dict, Optional, List, Literal
 from pydantic import AfterValidator, BaseModel, Field, field_validator, model_validator
 from ..api.utils import (
     normalize_season_start_game_number,
@@ -238,14 +238,43 @@ class AdminLogOut(BaseModel):
 
 
 class AdminLogsOut(BaseModel):
-    total: int
+    total: Optional[int] = None
     items: List[AdminLogOut]
+    next_cursor: Optional[str] = None
 
 
 class AdminLogActionsOut(BaseModel):
     actions: List[str]
 
 
+class EventLoopLagOut(BaseModel):
+    worker: str
+    threshold_ms: float
+    samples: int
+    p50_ms: float
+    p99_ms: float
+    max_ms: float
+
+
+class EventLoopStallStackOut(BaseModel):
+    count: int
+    frames: List[str]
+
+
+class EventLoopStallOut(BaseModel):
+    worker: str
+    started_at: float
+    duration_ms: float
+    context: dict[str, str | int | float]
+    samples: int
+    stacks: List[EventLoopStallStackOut]
+
+
+class AdminEventLoopDiagnosticsOut(BaseModel):
+    lag: EventLoopLagOut
+    stalls: List[EventLoopStallOut]
+
+
 class AdminContactRequestOut(BaseModel):
     id: int
     user_id: Optional[int] = None
@@ -352,6 +381,31 @@ class AdminRoomsOut(BaseModel):
     items: List[AdminRoomOut]
 
 
+class AdminLiveRoomOut(BaseModel):
+    id: int
+    creator: int
+    creator_name: Optional[str] = None
+    creator_avatar_name: Optional[str] = None
+    title: Optional[str] = None
+    user_limit: int
+    privacy: str
+    anonymity: Literal["visible", "hidden"] = "visible"
+    created_at: Optional[str] = None
+    visitors_count: int
+    visitors: Dict[str, int]
+    spectators_count: int
+    spectators: Dict[str, int]
+    stream_seconds: int
+    streams: Dict[str, int]
+    has_stream: bool
+    game: Optional[Dict[str, Any]] = None
+
+
+class AdminLiveRoomsOut(BaseModel):
+    items: List[AdminLiveRoomOut]
+    next_cursor: Optional[str] = None
+
+
 class AdminGameActionFieldOut(BaseModel):
     label: str
     value: str
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 from pydantic import BaseModel, Field
 
 
@@ -24,3 +24,51 @@ class ModerationUserOut(BaseModel):
 class ModerationUsersOut(BaseModel):
     total: int
     items: List[ModerationUserOut] = Field(default_factory=list)
+
+
+class ModerationSweepSourceOut(BaseModel):
+    total: int = 0
+    processed: int = 0
+
+
+class ModerationSweepStateOut(BaseModel):
+    status: Literal["idle", "running", "done", "failed", "cancelled"]
+    reason: Optional[str] = None
+    started_by: Optional[int] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    total: int = 0
+    processed: int = 0
+    hits: int = 0
+    rate: float = 0
+    eta_seconds: Optional[int] = None
+    sources: Dict[str, ModerationSweepSourceOut] = Field(default_factory=dict)
+    queued: int = 0
+
+
+class ModerationSweepMatchOut(BaseModel):
+    word: str
+    start: Optional[int] = None
+    end: Optional[int] = None
+    language: Optional[str] = None
+
+
+class ModerationSweepHitOut(BaseModel):
+    id: str
+    source: Literal["username", "room_title", "chat_message"]
+    object_id: int
+    user_id: Optional[int] = None
+    username: Optional[str] = None
+    avatar_name: Optional[str] = None
+    role: Optional[str] = None
+    deleted_at: Optional[datetime] = None
+    text: str
+    matches: List[ModerationSweepMatchOut] = Field(default_factory=list)
+    created_at: Optional[datetime] = None
+    found_at: datetime
+
+
+class ModerationSweepOut(BaseModel):
+    state: ModerationSweepStateOut
+    total: int
+    items: List[ModerationSweepHitOut] = Field(default_factory=list)
@@ -1,4 +1,4 @@
-from typing import Dict, List, Optional, TypedDict, Literal
+from typing import Dict, List, NotRequired, Optional, TypedDict, Literal
 
 
 class JoinAck(TypedDict, total=False):
@@ -41,11 +41,16 @@ class RoomListItem(TypedDict):
     in_game: bool
     game_phase: str
     entry_closed: bool
+    game_mode: NotRequired[Literal["normal", "rating"]]
+    spectators_limit: NotRequired[int]
+    spectators_count: NotRequired[int]
+    v: NotRequired[int]
 
 
 class RoomsListAck(TypedDict):
     ok: bool
     rooms: List[RoomListItem]
+    next_cursor: NotRequired[Optional[str]]
 
 
 class StateAck(TypedDict):
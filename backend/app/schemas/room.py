@@ -76,6 +76,16 @@ class RoomRequestOut(BaseModel):
     requested_at: Optional[datetime] = None
 
 
+class RoomRequestsBatchIn(BaseModel):
+    approve: List[int] = Field(default_factory=list, max_length=200)
+    deny: List[int] = Field(default_factory=list, max_length=200)
+
+
+class RoomRequestsBatchOut(BaseModel):
+    approved: List[int] = Field(default_factory=list)
+    denied: List[int] = Field(default_factory=list)
+
+
 class RoomBriefOut(BaseModel):
     id: int
     title: str
@@ -90,3 +100,11 @@ class RoomBriefOut(BaseModel):
     in_game: bool
     game_phase: str
     entry_closed: bool
+    game_mode: Literal["normal", "rating"] = "normal"
+    spectators_limit: Optional[int] = None
+    spectators_count: Optional[int] = None
+
+
+class RoomsPageOut(BaseModel):
+    items: List[RoomBriefOut]
+    next_cursor: Optional[str] = None
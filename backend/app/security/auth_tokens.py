@@ -1,8 +1,11 @@
 from __future__ import annotations
+import hashlib
 import secrets
 import time
 import jwt
 import structlog
+from collections import OrderedDict
+from contextvars import ContextVar, Token
 from typing import Any, Dict
 from jwt import ExpiredSignatureError, InvalidTokenError
 from fastapi import Depends, HTTPException, status
@@ -19,6 +22,11 @@ from ..schemas.common import Identity
 log = structlog.get_logger()
 
 AUTH_SESSION_SID_HEADER = "X-Auth-Session-Sid"
+TOKEN_LEEWAY_SECONDS = 2
+TOKEN_CLAIMS_CACHE_MAX_ITEMS = 4096
+
+_token_claims_cache: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+_request_auth_memo: ContextVar[Dict[str, Any] | None] = ContextVar("request_auth_memo", default=None)
 
 
 def _encode(kind: str, *, sub: int | str, exp_s: int, extra: Dict[str, Any] | None = None) -> str:
@@ -29,14 +37,67 @@ def _encode(kind: str, *, sub: int | str, exp_s: int, extra: Dict[str, Any] | No
     return jwt.encode(p, settings.JWT_SECRET_KEY, algorithm="HS256")
 
 
+def _token_cache_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8", "surrogatepass")).hexdigest()
+
+
 def decode_token(token: str) -> Dict[str, Any]:
-    return jwt.decode(
+    key = _token_cache_key(token)
+    cached = _token_claims_cache.get(key)
+    if cached is not None:
+        if int(cached["exp"]) <= time.time() - TOKEN_LEEWAY_SECONDS:
+            _token_claims_cache.pop(key, None)
+            raise ExpiredSignatureError("Signature has expired")
+
+        try:
+            _token_claims_cache.move_to_end(key)
+        except KeyError:
+            pass
+        return dict(cached)
+
+    payload = jwt.decode(
         token,
         settings.JWT_SECRET_KEY,
         algorithms=["HS256"],
         options={"require": ["exp", "iat", "sub", "typ"]},
-        leeway=2,
+        leeway=TOKEN_LEEWAY_SECONDS,
     )
+    _token_claims_cache[key] = payload
+    while len(_token_claims_cache) > TOKEN_CLAIMS_CACHE_MAX_ITEMS:
+        _token_claims_cache.popitem(last=False)
+
+    return dict(payload)
+
+
+def begin_request_auth_memo() -> Token:
+    return _request_auth_memo.set({})
+
+
+def end_request_auth_memo(token: Token) -> None:
+    _request_auth_memo.reset(token)
+
+
+async def read_session_sid(uid: int, *, redis_client=None) -> str:
+    memo = _request_auth_memo.get()
+    key = f"sid:{uid}"
+    if memo is not None and key in memo:
+        return memo[key]
+
+    r = redis_client or get_redis()
+    cur = str(await r.get(f"user:{uid}:sid") or "")
+    if memo is not None:
+        memo[key] = cur
+
+    return cur
+
+
+def _remember_auth_result(token: str, result: Identity | None, **log_ctx: object) -> None:
+    memo = _request_auth_memo.get()
+    if memo is None:
+        return
+
+    memo[f"identity:{_token_cache_key(token)}"] = result
+    structlog.contextvars.bind_contextvars(**log_ctx)
 
 
 def parse_refresh_token(raw: str) -> tuple[bool, int, str, str]:
@@ -98,18 +159,31 @@ async def get_identity(creds: HTTPAuthorizationCredentials = Depends(HTTPBearer(
         log.info("auth.no_bearer")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
+    token = creds.credentials
+    memo = _request_auth_memo.get()
+    if memo is not None:
+        memo_key = f"identity:{_token_cache_key(token)}"
+        if memo_key in memo:
+            cached_identity = memo[memo_key]
+            if cached_identity is None:
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+
+            return dict(cached_identity)
+
     try:
-        p = decode_token(creds.credentials)
+        p = decode_token(token)
         if p.get("typ") != "access":
             log.warning("auth.bad_token_type", typ=p.get("typ"))
+            _remember_auth_result(token, None, auth_status="bad_token_type", auth_token_type=str(p.get("typ") or ""))
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
         uid = int(p["sub"])
         sid = str(p.get("sid") or "")
         r = get_redis()
-        cur = await r.get(f"user:{uid}:sid")
+        cur = await read_session_sid(uid, redis_client=r)
         if not cur or cur != sid:
             log.warning("auth.sid_mismatch", uid=uid)
+            _remember_auth_result(token, None, auth_status="sid_mismatch", auth_token_user_id=uid)
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
         role_from_token = str(p.get("role") or "user")
@@ -126,6 +200,7 @@ async def get_identity(creds: HTTPAuthorizationCredentials = Depends(HTTPBearer(
         if profile:
             if profile.get("deleted_at"):
                 log.warning("auth.deleted_user", uid=uid)
+                _remember_auth_result(token, None, auth_status="deleted_user", auth_token_user_id=uid)
                 raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
             if profile.get("role"):
@@ -134,6 +209,7 @@ async def get_identity(creds: HTTPAuthorizationCredentials = Depends(HTTPBearer(
                 username = str(profile["username"])
         elif normalize_user_role(role_from_token) in {ROLE_ADMIN, ROLE_MODER}:
             log.warning("auth.privileged_profile_unavailable", uid=uid, token_role=role_from_token)
+            _remember_auth_result(token, None, auth_status="profile_unavailable", auth_token_user_id=uid)
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
         normalized_role = normalize_protected_admin_role(uid, role, fallback_role=role_from_token)
@@ -143,17 +219,21 @@ async def get_identity(creds: HTTPAuthorizationCredentials = Depends(HTTPBearer(
 
         await touch_user_activity(uid)
 
-        return {"id": uid, "role": role, "username": username}
+        identity: Identity = {"id": uid, "role": role, "username": username}
+        _remember_auth_result(token, identity, auth_status="ok", auth_user_id=uid, auth_username=username, auth_role=role)
+        return dict(identity)
 
     except HTTPException:
         raise
 
     except ExpiredSignatureError:
         log.info("auth.expired_token")
+        _remember_auth_result(token, None, auth_status="expired")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
     except InvalidTokenError as e:
         log.warning("auth.invalid_token", err=type(e).__name__)
+        _remember_auth_result(token, None, auth_status="invalid", auth_error=type(e).__name__)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
     except Exception as e:
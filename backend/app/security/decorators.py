@@ -5,11 +5,16 @@ import inspect
 import ipaddress
 import sys
 import structlog
-from typing import Any, Callable, Awaitable, Union, Optional, cast
+from collections import OrderedDict
+from dataclasses import dataclass
+from time import monotonic, perf_counter
+from typing import Any, Callable, Awaitable, Sequence, Union, Optional, cast
 from jwt import ExpiredSignatureError, InvalidTokenError
 from fastapi import HTTPException, Depends, APIRouter, Request
 from fastapi.routing import APIRoute
+from redis.exceptions import ResponseError
 from ..core.clients import get_redis
+from ..core.metrics import add_gauge, inc_counter, observe
 from ..security.admin_guard import get_protected_admin_user_id, is_protected_admin_uid
 from ..security.auth_tokens import get_identity, decode_token, parse_refresh_token
 from ..realtime.connections import validate_socket_session
@@ -19,6 +24,7 @@ log = structlog.get_logger()
 
 KeyBuilder = Callable[..., str]
 RateLimitRules = tuple[tuple[int, int], ...]
+RateLimitWindows = tuple[tuple[str, int, int], ...]
 SAFE_HTTP_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
 PRIVILEGED_HTTP_PREFIXES = ("/api/admin", "/api/moderation")
 PRIVILEGED_ALERT_WINDOW_S = 300
@@ -69,7 +75,125 @@ PRIVILEGED_SENSITIVE_MUTATION_LIMITS: dict[str, int] = {
     "/api/moderation/users/{user_id}/nickname_reset": 4,
     "/api/moderation/users/{user_id}/timeout": 5,
     "/api/moderation/users/{user_id}/suspend": 5,
+    "/api/moderation/text_sweep": 2,
 }
+RATE_LIMIT_OK = 0
+RATE_LIMIT_IP_BLOCKED = 1
+RATE_LIMIT_EXCEEDED = 2
+LOCAL_RATE_LIMIT_LEASE_FRACTION = 0.5
+LOCAL_RATE_LIMIT_LEASE_S = 1.0
+LOCAL_RATE_LIMIT_MAX_KEYS = 50_000
+
+RATE_LIMIT_LUA = r"""
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local check_ip = tonumber(ARGV[1])
+local violation_limit = tonumber(ARGV[2])
+local violation_window_s = tonumber(ARGV[3])
+local block_ttl_s = tonumber(ARGV[4])
+local dedupe_ttl_s = tonumber(ARGV[5])
+local groups = tonumber(ARGV[6])
+local cost = tonumber(ARGV[7])
+
+if check_ip == 1 then
+  local block_left = redis.call('PTTL', KEYS[1])
+  if block_left > 0 then
+    return {1, 0, 0, block_left, 0, 0, 0}
+  end
+end
+
+local key_idx = 3
+local arg_idx = 8
+local pending = {}
+for group = 1, groups do
+  local dedupe_key = KEYS[key_idx]
+  local reason = ARGV[arg_idx]
+  local rules = tonumber(ARGV[arg_idx + 1])
+  key_idx = key_idx + 1
+  arg_idx = arg_idx + 2
+  for rule = 1, rules do
+    local key = KEYS[key_idx]
+    local limit = tonumber(ARGV[arg_idx])
+    local window_ms = tonumber(ARGV[arg_idx + 1]) * 1000
+    key_idx = key_idx + 1
+    arg_idx = arg_idx + 2
+
+    local tat = tonumber(redis.call('GET', key) or '0') or 0
+    if tat < now then
+      tat = now
+    end
+    local interval = window_ms / limit
+    local available = math.floor((now + window_ms - tat) / interval + 0.000001)
+    if available < 1 then
+      local allow_at = tat + interval - window_ms
+      local violations = 0
+      local blocked = 0
+      if check_ip == 1 and redis.call('SET', dedupe_key, 1, 'EX', dedupe_ttl_s, 'NX') then
+        violations = redis.call('INCR', KEYS[2])
+        if violations == 1 then
+          redis.call('EXPIRE', KEYS[2], violation_window_s)
+        end
+        if violations >= violation_limit and redis.call('SET', KEYS[1], reason, 'EX', block_ttl_s, 'NX') then
+          blocked = 1
+        end
+      end
+      return {2, group, rule, math.max(1, math.ceil(allow_at - now)), violations, blocked, 0}
+    end
+    local spare = math.max(1, math.floor(available / 2))
+    if cost > spare then
+      cost = spare
+    end
+
+    pending[#pending + 1] = {key, tat, interval}
+  end
+end
+
+for i = 1, #pending do
+  local item = pending[i]
+  local new_tat = item[2] + cost * item[3]
+  redis.call('SET', item[1], string.format('%.3f', new_tat), 'PX', math.max(1, math.ceil(new_tat - now)))
+end
+return {0, 0, 0, 0, 0, 0, cost}
+"""
+
+RATE_LIMIT_REFUND_LUA = r"""
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1]) or '0') or 0
+if tat <= now then
+  return 0
+end
+local new_tat = math.max(now, tat - tonumber(ARGV[1]) * tonumber(ARGV[2]))
+if new_tat <= now then
+  redis.call('DEL', KEYS[1])
+else
+  redis.call('SET', KEYS[1], string.format('%.3f', new_tat), 'PX', math.max(1, math.ceil(new_tat - now)))
+end
+return 1
+"""
+
+_rate_limit_sha: str | None = None
+_local_rate_tokens: OrderedDict[str, tuple[int, float, float]] = OrderedDict()
+_rate_refund_tasks: set[asyncio.Task[None]] = set()
+_local_rate_demand: OrderedDict[str, tuple[float, int, int]] = OrderedDict()
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimitDecision:
+    status: int
+    group: int
+    rule: int
+    retry_after_ms: int
+    violations: int
+    ip_blocked_now: bool
+    granted: int = 1
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, -(-self.retry_after_ms // 1000)) if self.retry_after_ms > 0 else 0
+
+
+LOCAL_RATE_LIMIT_ALLOWED = RateLimitDecision(status=RATE_LIMIT_OK, group=-1, rule=-1, retry_after_ms=0, violations=0, ip_blocked_now=False)
 
 
 def _mark_route_guard(wrapper: Callable[..., Any], guard_name: str) -> None:
@@ -298,105 +422,146 @@ def _actor_http_rate_limit(method: str, path: str) -> tuple[str, RateLimitRules]
     return "mutating", ACTOR_MUTATING_HTTP_LIMITS
 
 
-async def _increase_rate_limit_counter(redis_client, *, key: str, window_s: int) -> int:
-    created = await redis_client.set(key, 1, ex=window_s, nx=True)
-    count = 1 if created else int(await redis_client.incr(key))
-    if count == 1 and not created:
-        try:
-            await redis_client.expire(key, window_s)
-        except Exception as exc:
-            log.warning("http.rate_limit.expire_failed", key=key, window_s=window_s, err=type(exc).__name__)
-    return count
+def _rate_limit_windows(base_key: str, rules: RateLimitRules) -> RateLimitWindows:
+    return tuple((f"{base_key}:w{window_s}", limit, window_s) for limit, window_s in rules)
 
 
-async def _ensure_ip_not_blocked(redis_client, *, ip: str, method: str, path: str) -> None:
-    block_key = f"rl:http:ip:block:{ip}"
+async def _eval_rate_limit_script(redis_client, keys: list[str], args: list[object]) -> list[Any]:
+    global _rate_limit_sha
+    if _rate_limit_sha is None:
+        _rate_limit_sha = await redis_client.script_load(RATE_LIMIT_LUA)
     try:
-        ttl = int(await redis_client.ttl(block_key))
-    except Exception:
-        ttl = -2
+        return await redis_client.evalsha(_rate_limit_sha, len(keys), *keys, *args)
+    except ResponseError as e:
+        if "NOSCRIPT" not in str(e):
+            raise
 
-    if ttl and ttl > 0:
-        log.warning(
-            "security.ip_auto_block_hit",
-            ip=ip,
-            method=method,
-            path=path,
-            ttl=ttl,
-        )
-        raise HTTPException(
-            status_code=429,
-            detail="ip_temporarily_blocked",
-            headers={"Retry-After": str(ttl)},
-        )
+        _rate_limit_sha = await redis_client.script_load(RATE_LIMIT_LUA)
+        return await redis_client.evalsha(_rate_limit_sha, len(keys), *keys, *args)
+
+
+async def _check_rate_limits(redis_client, groups: Sequence[tuple[str, RateLimitWindows]], *, ip: str | None = None, violation_scope: str = "", cost: int = 1) -> RateLimitDecision:
+    ip_value = ip or "-"
+    keys = [f"rl:http:ip:block:{ip_value}", f"rl:http:ip:violations:{ip_value}"]
+    args: list[object] = [
+        1 if ip else 0,
+        AUTO_BLOCK_IP_VIOLATION_LIMIT,
+        AUTO_BLOCK_IP_WINDOW_S,
+        AUTO_BLOCK_IP_TTL_S,
+        AUTO_BLOCK_IP_VIOLATION_DEDUPE_TTL_S,
+        len(groups),
+        max(1, int(cost)),
+    ]
+    for reason, windows in groups:
+        keys.append(f"rl:http:ip:violation_seen:{ip_value}:{reason}:{violation_scope}")
+        args.extend((reason or "-", len(windows)))
+        for key, limit, window_s in windows:
+            keys.append(key)
+            args.extend((max(1, int(limit)), max(1, int(window_s))))
+
+    res = await _eval_rate_limit_script(redis_client, keys, args)
+    return RateLimitDecision(
+        status=int(res[0]),
+        group=int(res[1]) - 1,
+        rule=int(res[2]) - 1,
+        retry_after_ms=int(res[3]),
+        violations=int(res[4]),
+        ip_blocked_now=bool(int(res[5])),
+        granted=int(res[6]),
+    )
+
+
+def _take_local_rate_token(key: str) -> RateLimitDecision | None:
+    entry = _local_rate_tokens.get(key)
+    if entry is None:
+        return None
 
+    tokens, expires_at, interval_ms = entry
+    now = monotonic()
+    if expires_at <= now:
+        _release_local_rate_lease(key, expires_at)
+        return None
+
+    if tokens <= 0:
+        retry_after_ms = max(1, int((expires_at - now) * 1000))
+        return RateLimitDecision(status=RATE_LIMIT_EXCEEDED, group=0, rule=0, retry_after_ms=retry_after_ms, violations=0, ip_blocked_now=False, granted=0)
+
+    if tokens == 1:
+        _local_rate_tokens.pop(key, None)
+    else:
+        _local_rate_tokens[key] = (tokens - 1, expires_at, interval_ms)
+    return LOCAL_RATE_LIMIT_ALLOWED
 
-async def _register_ip_violation(redis_client, *, ip: str, method: str, path: str, reason: str) -> None:
-    dedupe_key = f"rl:http:ip:violation_seen:{ip}:{reason}:{method}:{path}"
-    try:
-        should_count = await redis_client.set(dedupe_key, 1, ex=AUTO_BLOCK_IP_VIOLATION_DEDUPE_TTL_S, nx=True)
-    except Exception as exc:
-        should_count = True
-        log.warning(
-            "security.ip_auto_block_violation_dedupe_failed",
-            ip=ip,
-            method=method,
-            path=path,
-            reason=reason,
-            err=type(exc).__name__,
-        )
 
-    if not should_count:
+def _store_local_rate_state(key: str, tokens: int, ttl_s: float, *, interval_ms: float = 0.0) -> None:
+    if tokens <= 0 and ttl_s <= 0:
+        _local_rate_tokens.pop(key, None)
         return
 
-    violation_key = f"rl:http:ip:violations:{ip}"
-    count = await _increase_rate_limit_counter(redis_client, key=violation_key, window_s=AUTO_BLOCK_IP_WINDOW_S)
-    if count < AUTO_BLOCK_IP_VIOLATION_LIMIT:
+    expires_at = monotonic() + ttl_s
+    _local_rate_tokens[key] = (max(0, tokens), expires_at, interval_ms)
+    _local_rate_tokens.move_to_end(key)
+    if tokens > 0:
+        asyncio.get_running_loop().call_later(ttl_s, _release_local_rate_lease, key, expires_at)
+    while len(_local_rate_tokens) > LOCAL_RATE_LIMIT_MAX_KEYS:
+        evicted, (left, _, evicted_interval_ms) = _local_rate_tokens.popitem(last=False)
+        _schedule_rate_refund(evicted, left, evicted_interval_ms)
+
+
+def _release_local_rate_lease(key: str, expires_at: float) -> None:
+    entry = _local_rate_tokens.get(key)
+    if entry is None or entry[1] != expires_at:
         return
 
-    block_key = f"rl:http:ip:block:{ip}"
-    created = await redis_client.set(block_key, reason, ex=AUTO_BLOCK_IP_TTL_S, nx=True)
-    if created:
-        log.warning(
-            "security.ip_auto_blocked",
-            ip=ip,
-            method=method,
-            path=path,
-            reason=reason,
-            trigger_count=count,
-            trigger_window_s=AUTO_BLOCK_IP_WINDOW_S,
-            block_ttl_s=AUTO_BLOCK_IP_TTL_S,
-            dedupe_ttl_s=AUTO_BLOCK_IP_VIOLATION_DEDUPE_TTL_S,
-        )
+    _local_rate_tokens.pop(key, None)
+    _schedule_rate_refund(key, entry[0], entry[2])
 
 
-async def _enforce_rate_limit_rules(redis_client, *, base_key: str, rules: RateLimitRules, method: str, path: str, actor: str, log_event: str, extra_fields: dict[str, object] | None = None) -> tuple[bool, int]:
-    for limit, window_s in rules:
-        scoped_key = f"{base_key}:w{window_s}"
-        count = await _increase_rate_limit_counter(redis_client, key=scoped_key, window_s=window_s)
-        if count <= limit:
-            continue
+def _schedule_rate_refund(key: str, tokens: int, interval_ms: float) -> None:
+    if tokens <= 0 or interval_ms <= 0:
+        return
 
-        try:
-            ttl = int(await redis_client.ttl(scoped_key))
-        except Exception:
-            ttl = -2
+    task = asyncio.get_running_loop().create_task(_refund_rate_tokens(key, tokens, interval_ms))
+    _rate_refund_tasks.add(task)
+    task.add_done_callback(_rate_refund_tasks.discard)
 
-        retry_after = ttl if ttl and ttl > 0 else window_s
-        log.warning(
-            log_event,
-            method=method,
-            path=path,
-            actor=actor,
-            limit=limit,
-            window_s=window_s,
-            count=count,
-            ttl=ttl,
-            **(extra_fields or {}),
-        )
-        raise HTTPException(status_code=429, detail="rate_limited", headers={"Retry-After": str(retry_after)})
 
-    return False, 0
+def _observe_local_demand(key: str) -> int:
+    now = monotonic()
+    started_at, hits, previous = _local_rate_demand.get(key, (now, 0, 0))
+    if now - started_at >= LOCAL_RATE_LIMIT_LEASE_S:
+        previous = hits if now - started_at < 2 * LOCAL_RATE_LIMIT_LEASE_S else 0
+        started_at, hits = now, 0
+
+    _local_rate_demand[key] = (started_at, hits + 1, previous)
+    _local_rate_demand.move_to_end(key)
+    while len(_local_rate_demand) > LOCAL_RATE_LIMIT_MAX_KEYS:
+        _local_rate_demand.popitem(last=False)
+    return max(previous, hits + 1)
+
+
+async def _refund_rate_tokens(key: str, tokens: int, interval_ms: float) -> None:
+    try:
+        await get_redis().eval(RATE_LIMIT_REFUND_LUA, 1, key, int(tokens), interval_ms)
+    except Exception as exc:
+        log.warning("rate_limit.refund_failed", key=key, err=type(exc).__name__)
+
+
+async def _consume_keyed_rate_limit(key: str, *, limit: int, window_s: int) -> RateLimitDecision:
+    demand = _observe_local_demand(key)
+    local_decision = _take_local_rate_token(key)
+    if local_decision is not None:
+        return local_decision
+
+    cap = max(1, int(min(limit * LOCAL_RATE_LIMIT_LEASE_FRACTION, limit * LOCAL_RATE_LIMIT_LEASE_S / max(1, window_s))))
+    lease = min(cap, demand)
+    decision = await _check_rate_limits(get_redis(), (("", ((key, limit, window_s),)),), cost=lease)
+    if decision.status == RATE_LIMIT_OK:
+        if decision.granted > 1:
+            _store_local_rate_state(key, decision.granted - 1, LOCAL_RATE_LIMIT_LEASE_S, interval_ms=window_s * 1000 / max(1, limit))
+    else:
+        _store_local_rate_state(key, 0, decision.retry_after_ms / 1000)
+    return decision
 
 
 async def _emit_privileged_rate_limit_alert(*, redis_client, method: str, path: str, actor: str, count: int, limit: int, ttl: int, retry_after: int) -> None:
@@ -426,93 +591,93 @@ async def minimal_route_rate_limit(request: Request) -> None:
 
     actor = _extract_rate_limit_actor(request)
     route_key = f"rl:http:{method}:{route_path}:{actor}"
+    actor_bucket, actor_rules = _actor_http_rate_limit(method, route_path)
+    actor_key = f"rl:http:actor:{actor_bucket}:{actor}"
 
     try:
         r = get_redis()
-        if client_ip:
-            await _ensure_ip_not_blocked(r, ip=client_ip, method=method, path=route_path)
+        decision = await _check_rate_limits(
+            r,
+            (
+                ("route_rate_limit", _rate_limit_windows(route_key, route_rules)),
+                (f"actor_rate_limit:{actor_bucket}", _rate_limit_windows(actor_key, actor_rules)),
+            ),
+            ip=client_ip,
+            violation_scope=f"{method}:{route_path}",
+        )
+    except Exception as exc:
+        log.warning(
+            "http.route_rate_limit_failed",
+            method=method,
+            path=route_path,
+            actor=actor,
+            err=type(exc).__name__,
+        )
+        return
+
+    if decision.status == RATE_LIMIT_OK:
+        return
+
+    if decision.status == RATE_LIMIT_IP_BLOCKED:
+        log.warning(
+            "security.ip_auto_block_hit",
+            ip=client_ip,
+            method=method,
+            path=route_path,
+            ttl=decision.retry_after,
+        )
+        raise HTTPException(
+            status_code=429,
+            detail="ip_temporarily_blocked",
+            headers={"Retry-After": str(decision.retry_after)},
+        )
+
+    route_denied = decision.group == 0
+    limit, window_s = (route_rules if route_denied else actor_rules)[decision.rule]
+    log.warning(
+        "http.route_rate_limited" if route_denied else "http.actor_rate_limited",
+        method=method,
+        path=route_path,
+        actor=actor,
+        limit=limit,
+        window_s=window_s,
+        retry_after=decision.retry_after,
+        **({} if route_denied else {"actor_bucket": actor_bucket}),
+    )
+    if route_denied and is_privileged:
+        last_limit, _ = route_rules[-1]
         try:
-            await _enforce_rate_limit_rules(
-                r,
-                base_key=route_key,
-                rules=route_rules,
+            await _emit_privileged_rate_limit_alert(
+                redis_client=r,
                 method=method,
                 path=route_path,
                 actor=actor,
-                log_event="http.route_rate_limited",
+                count=last_limit + 1,
+                limit=last_limit,
+                ttl=decision.retry_after,
+                retry_after=decision.retry_after,
             )
-        except HTTPException:
-            if is_privileged:
-                limit, window_s = route_rules[-1]
-                try:
-                    ttl = int(await r.ttl(f"{route_key}:w{window_s}"))
-                except Exception:
-                    ttl = -2
-                retry_after = ttl if ttl and ttl > 0 else window_s
-                try:
-                    await _emit_privileged_rate_limit_alert(
-                        redis_client=r,
-                        method=method,
-                        path=route_path,
-                        actor=actor,
-                        count=limit + 1,
-                        limit=limit,
-                        ttl=ttl,
-                        retry_after=retry_after,
-                    )
-                except Exception as exc:
-                    log.warning(
-                        "security.privileged_http_rate_limit_alert_failed",
-                        method=method,
-                        path=route_path,
-                        actor=actor,
-                        err=type(exc).__name__,
-                    )
-            if client_ip:
-                await _register_ip_violation(
-                    r,
-                    ip=client_ip,
-                    method=method,
-                    path=route_path,
-                    reason="route_rate_limit",
-                )
-            raise
-
-        actor_bucket, actor_rules = _actor_http_rate_limit(method, route_path)
-        actor_key = f"rl:http:actor:{actor_bucket}:{actor}"
-        try:
-            await _enforce_rate_limit_rules(
-                r,
-                base_key=actor_key,
-                rules=actor_rules,
+        except Exception as exc:
+            log.warning(
+                "security.privileged_http_rate_limit_alert_failed",
                 method=method,
                 path=route_path,
                 actor=actor,
-                log_event="http.actor_rate_limited",
-                extra_fields={"actor_bucket": actor_bucket},
+                err=type(exc).__name__,
             )
-        except HTTPException:
-            if client_ip:
-                await _register_ip_violation(
-                    r,
-                    ip=client_ip,
-                    method=method,
-                    path=route_path,
-                    reason=f"actor_rate_limit:{actor_bucket}",
-                )
-            raise
-
-    except HTTPException:
-        raise
-
-    except Exception as exc:
+    if decision.ip_blocked_now:
         log.warning(
-            "http.route_rate_limit_failed",
+            "security.ip_auto_blocked",
+            ip=client_ip,
             method=method,
             path=route_path,
-            actor=actor,
-            err=type(exc).__name__,
+            reason="route_rate_limit" if route_denied else f"actor_rate_limit:{actor_bucket}",
+            trigger_count=decision.violations,
+            trigger_window_s=AUTO_BLOCK_IP_WINDOW_S,
+            block_ttl_s=AUTO_BLOCK_IP_TTL_S,
+            dedupe_ttl_s=AUTO_BLOCK_IP_VIOLATION_DEDUPE_TTL_S,
         )
+    raise HTTPException(status_code=429, detail="rate_limited", headers={"Retry-After": str(decision.retry_after)})
 
 
 def require_room_creator(room_id_param: str = "room_id"):
@@ -574,24 +739,10 @@ def rate_limited(key: Union[str, Callable[..., str]], *, limit: int, window_s: i
             ctx = bound.arguments
             k = key(**ctx) if callable(key) else str(key)
 
-            r = get_redis()
-            created = await r.set(k, 1, ex=window_s, nx=True)
-            cnt = 1 if created else int(await r.incr(k))
-            if cnt == 1 and not created:
-                try:
-                    await r.expire(k, window_s)
-                except Exception as e:
-                    log.warning("rate_limit.expire_failed", key=k, window_s=window_s, err=type(e).__name__)
-
-            if cnt > limit:
-                try:
-                    ttl = int(await r.ttl(k))
-                except Exception:
-                    ttl = -2
-
-                retry_after = ttl if ttl and ttl > 0 else window_s
-                log.warning("rate_limited", key=k, limit=limit, window_s=window_s, count=cnt, ttl=ttl)
-                raise HTTPException(status_code=429, detail="rate_limited", headers={"Retry-After": str(retry_after)})
+            decision = await _consume_keyed_rate_limit(k, limit=limit, window_s=window_s)
+            if decision.status != RATE_LIMIT_OK:
+                log.warning("rate_limited", key=k, limit=limit, window_s=window_s, retry_after=decision.retry_after)
+                raise HTTPException(status_code=429, detail="rate_limited", headers={"Retry-After": str(decision.retry_after)})
 
             return await fn(*a, **kw)
 
@@ -615,8 +766,9 @@ def rate_limited_sio(
         if not asyncio.iscoroutinefunction(fn):
             raise TypeError("rate_limited_sio может оборачивать только async-функции")
 
-        @functools.wraps(fn)
-        async def wrap(sid: str, *a, **kw):
+        event_labels = {"namespace": f"/{fn.__module__.rsplit('.', 1)[-1]}", "event": fn.__name__}
+
+        async def guarded(sid: str, *a, **kw):
             uid: Optional[int] = None
             rid: Optional[int] = None
             if session_ns:
@@ -635,25 +787,11 @@ def rate_limited_sio(
                     uid = rid = None
 
             try:
-                r = get_redis()
                 k = key(sid=sid, uid=uid, rid=rid) if callable(key) else str(key)
-                created = await r.set(k, 1, ex=window_s, nx=True)
-                cnt = 1 if created else int(await r.incr(k))
-
-                if cnt == 1 and not created:
-                    try:
-                        await r.expire(k, window_s)
-                    except Exception as e:
-                        log.warning("sio.rate_limit.expire_failed", key=k, window_s=window_s, err=type(e).__name__)
-
-                if cnt > limit:
-                    try:
-                        ttl = int(await r.ttl(k))
-                    except Exception:
-                        ttl = -2
-                    retry_after = ttl if ttl and ttl > 0 else window_s
-                    log.warning("sio.rate_limited", key=k, limit=limit, window_s=window_s, count=cnt, ttl=ttl)
-                    return {"ok": False, "error": "rate_limited", "status": 429, "retry_after": retry_after}
+                decision = await _consume_keyed_rate_limit(k, limit=limit, window_s=window_s)
+                if decision.status != RATE_LIMIT_OK:
+                    log.warning("sio.rate_limited", key=k, limit=limit, window_s=window_s, retry_after=decision.retry_after)
+                    return {"ok": False, "error": "rate_limited", "status": 429, "retry_after": decision.retry_after}
 
             except Exception as e:
                 log.warning("sio.ratelimit.error", err=type(e).__name__)
@@ -662,6 +800,18 @@ def rate_limited_sio(
 
             return await fn(sid, *a, **kw)
 
+        @functools.wraps(fn)
+        async def wrap(sid: str, *a, **kw):
+            started = perf_counter()
+            structlog.contextvars.bind_contextvars(sio_namespace=event_labels["namespace"], sio_event=event_labels["event"], sid=sid)
+            add_gauge("sio_events_in_flight", 1, **event_labels)
+            try:
+                return await guarded(sid, *a, **kw)
+            finally:
+                add_gauge("sio_events_in_flight", -1, **event_labels)
+                inc_counter("sio_events_total", **event_labels)
+                observe("sio_event_duration_seconds", perf_counter() - started, **event_labels)
+
         setattr(wrap, "__sio_guard__", "rate_limited_sio")
         return wrap
 
@@ -0,0 +1,350 @@
+from __future__ import annotations
+import asyncio
+import json
+from collections import deque
+from contextlib import suppress
+from datetime import datetime, timezone
+from time import monotonic
+from typing import Any
+import structlog
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.clients import get_redis
+from ..core.db import SessionLocal
+from ..core.metrics import record_loop_failure, record_loop_success
+from ..core.settings import settings
+from ..models.log import AppLog
+
+log = structlog.get_logger()
+
+AUDIT_LOG_BATCH_SIZE = 500
+AUDIT_LOG_FLUSH_INTERVAL_SECONDS = 1.0
+AUDIT_LOG_INSERT_TIMEOUT_SECONDS = 3.0
+AUDIT_LOG_MAX_PENDING = 50000
+AUDIT_LOG_STOP_TIMEOUT_SECONDS = 10.0
+AUDIT_LOG_SPILL_KEY = "audit:spill"
+LOG_ACTIONS_KEY = "logs:actions"
+LOG_ACTIONS_READY_KEY = "logs:actions:ready"
+LOG_ACTIONS_GEN_KEY = "logs:actions:gen"
+LOG_ACTIONS_GEN_CHECK_SECONDS = 5.0
+
+_pending: deque[dict[str, Any]] = deque()
+_flush_requested = asyncio.Event()
+_stop_requested = asyncio.Event()
+_flush_lock = asyncio.Lock()
+_stats = {"enqueued": 0, "inserted": 0, "spilled": 0, "dropped": 0, "uncertain": 0}
+_known_actions: set[str] = set()
+_known_actions_gen: str | None = None
+_known_actions_checked_at = 0.0
+
+
+class _CommitOutcomeUnknown(Exception):
+    pass
+
+
+async def _sync_known_actions_generation() -> None:
+    global _known_actions_gen, _known_actions_checked_at
+    now = monotonic()
+    if now - _known_actions_checked_at < LOG_ACTIONS_GEN_CHECK_SECONDS:
+        return
+
+    gen = await get_redis().get(LOG_ACTIONS_GEN_KEY)
+    _known_actions_checked_at = now
+    if gen != _known_actions_gen:
+        _known_actions.clear()
+        _known_actions_gen = gen
+
+
+async def remember_log_actions(actions: set[str]) -> None:
+    try:
+        await _sync_known_actions_generation()
+    except Exception:
+        _known_actions.clear()
+
+    fresh = {action for action in actions if action and action not in _known_actions}
+    if not fresh:
+        return
+
+    try:
+        await get_redis().sadd(LOG_ACTIONS_KEY, *fresh)
+    except Exception:
+        log.warning("audit_log.actions_cache_failed")
+        return
+
+    _known_actions.update(fresh)
+
+
+async def get_log_actions(session: AsyncSession) -> list[str]:
+    r = get_redis()
+    async with r.pipeline() as p:
+        await p.exists(LOG_ACTIONS_READY_KEY)
+        await p.smembers(LOG_ACTIONS_KEY)
+        ready, cached = await p.execute()
+
+    if ready:
+        return sorted(str(action) for action in cached)
+
+    rows = await session.execute(select(AppLog.action).distinct())
+    actions = {str(row[0]) for row in rows.all() if row and row[0] is not None}
+    async with r.pipeline() as p:
+        if actions:
+            await p.sadd(LOG_ACTIONS_KEY, *actions)
+        await p.set(LOG_ACTIONS_READY_KEY, "1")
+        await p.execute()
+
+    return sorted(actions | {str(action) for action in cached})
+
+
+async def reset_log_actions_cache() -> None:
+    global _known_actions_checked_at
+    _known_actions.clear()
+    _known_actions_checked_at = 0.0
+    async with get_redis().pipeline() as p:
+        await p.delete(LOG_ACTIONS_KEY, LOG_ACTIONS_READY_KEY)
+        await p.incr(LOG_ACTIONS_GEN_KEY)
+        await p.execute()
+
+
+def enqueue_audit_log(*, user_id: int | None, username: str | None, action: str, details: str) -> None:
+    if len(_pending) >= AUDIT_LOG_MAX_PENDING:
+        _pending.popleft()
+        _stats["dropped"] += 1
+
+    _pending.append({
+        "user_id": user_id,
+        "username": username,
+        "action": action,
+        "details": details,
+        "created_at": datetime.now(timezone.utc),
+    })
+    _stats["enqueued"] += 1
+    if len(_pending) >= AUDIT_LOG_BATCH_SIZE:
+        _flush_requested.set()
+
+
+def get_audit_log_stats() -> dict[str, int]:
+    return {**_stats, "pending": len(_pending)}
+
+
+def _take_batch() -> list[dict[str, Any]]:
+    batch: list[dict[str, Any]] = []
+    while _pending and len(batch) < AUDIT_LOG_BATCH_SIZE:
+        batch.append(_pending.popleft())
+
+    return batch
+
+
+def _dump_row(row: dict[str, Any]) -> str:
+    return json.dumps({**row, "created_at": row["created_at"].isoformat()}, ensure_ascii=False, separators=(",", ":"))
+
+
+def _mark_uncertain(rows: list[dict[str, Any]]) -> None:
+    for row in rows:
+        row["uncertain"] = True
+
+
+def _load_row(raw: str) -> dict[str, Any] | None:
+    try:
+        row = json.loads(raw)
+        return {
+            "user_id": int(row["user_id"]) if row.get("user_id") is not None else None,
+            "username": row.get("username"),
+            "action": str(row["action"]),
+            "details": str(row.get("details") or ""),
+            "created_at": datetime.fromisoformat(str(row["created_at"])),
+            **({"uncertain": True} if row.get("uncertain") else {}),
+        }
+
+    except Exception:
+        return None
+
+
+async def _skip_committed_rows(s: AsyncSession, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    uncertain = [row for row in rows if row.get("uncertain")]
+    if not uncertain:
+        return rows
+
+    res = await s.execute(
+        select(AppLog.created_at, AppLog.action, AppLog.user_id, AppLog.details)
+        .where(AppLog.created_at.in_({row["created_at"] for row in uncertain}))
+    )
+    committed = {tuple(item) for item in res.all()}
+    fresh = [row for row in rows if not row.get("uncertain") or (row["created_at"], row["action"], row["user_id"], row["details"]) not in committed]
+    if len(fresh) < len(rows):
+        log.info("audit_log.uncertain_rows_committed", rows=len(rows) - len(fresh))
+    return fresh
+
+
+async def _insert_rows(rows: list[dict[str, Any]]) -> None:
+    async with SessionLocal() as s:
+        values = [{k: v for k, v in row.items() if k != "uncertain"} for row in await _skip_committed_rows(s, rows)]
+        if not values:
+            return
+
+        await asyncio.wait_for(s.execute(insert(AppLog), values), timeout=AUDIT_LOG_INSERT_TIMEOUT_SECONDS)
+        try:
+            await s.commit()
+        except BaseException as e:
+            _stats["uncertain"] += len(rows)
+            log.error("audit_log.commit_outcome_unknown", rows=len(rows), err=type(e).__name__)
+            raise _CommitOutcomeUnknown() from e
+
+    _stats["inserted"] += len(values)
+    await remember_log_actions({str(row["action"]) for row in rows})
+
+
+async def _spill_rows(rows: list[dict[str, Any]]) -> bool:
+    if not settings.AUDIT_LOG_REDIS_SPILL:
+        return False
+
+    try:
+        await get_redis().rpush(AUDIT_LOG_SPILL_KEY, *[_dump_row(row) for row in rows])
+    except Exception:
+        log.warning("audit_log.spill_failed", rows=len(rows))
+        return False
+
+    _stats["spilled"] += len(rows)
+    return True
+
+
+def _requeue_rows(rows: list[dict[str, Any]]) -> None:
+    room = max(0, AUDIT_LOG_MAX_PENDING - len(_pending))
+    if len(rows) > room:
+        _stats["dropped"] += len(rows) - room
+        rows = rows[len(rows) - room:]
+
+    _pending.extendleft(reversed(rows))
+
+
+async def _flush_pending_batch(batch: list[dict[str, Any]], *, try_insert: bool) -> str:
+    if try_insert:
+        try:
+            await _insert_rows(batch)
+            return "inserted"
+
+        except _CommitOutcomeUnknown as e:
+            _mark_uncertain(batch)
+            if isinstance(e.__cause__, asyncio.CancelledError):
+                _requeue_rows(batch)
+                raise asyncio.CancelledError() from e
+            if not await _spill_rows(batch):
+                _requeue_rows(batch)
+            return "uncertain"
+
+        except asyncio.CancelledError:
+            _requeue_rows(batch)
+            raise
+
+        except Exception as e:
+            log.warning("audit_log.insert_failed", rows=len(batch), err=type(e).__name__)
+
+    if await _spill_rows(batch):
+        return "spilled"
+
+    _requeue_rows(batch)
+    return "requeued"
+
+
+async def _drain_spill() -> None:
+    r = get_redis()
+    try:
+        raw_rows = await r.lpop(AUDIT_LOG_SPILL_KEY, AUDIT_LOG_BATCH_SIZE)
+    except Exception:
+        log.warning("audit_log.spill_read_failed")
+        return
+
+    if not raw_rows:
+        return
+
+    rows = [row for row in (_load_row(raw) for raw in raw_rows) if row is not None]
+    if len(rows) < len(raw_rows):
+        log.warning("audit_log.spill_rows_invalid", count=len(raw_rows) - len(rows))
+    if not rows:
+        return
+
+    try:
+        await _insert_rows(rows)
+    except _CommitOutcomeUnknown as e:
+        _mark_uncertain(rows)
+        try:
+            await r.lpush(AUDIT_LOG_SPILL_KEY, *reversed([_dump_row(row) for row in rows]))
+        except Exception:
+            _stats["dropped"] += len(rows)
+            log.error("audit_log.spill_rows_lost", rows=len(rows))
+        if isinstance(e.__cause__, asyncio.CancelledError):
+            raise asyncio.CancelledError() from e
+    except asyncio.CancelledError:
+        with suppress(Exception):
+            await r.lpush(AUDIT_LOG_SPILL_KEY, *reversed(raw_rows))
+        raise
+    except Exception as e:
+        log.warning("audit_log.spill_insert_failed", rows=len(rows), err=type(e).__name__)
+        try:
+            await r.lpush(AUDIT_LOG_SPILL_KEY, *reversed(raw_rows))
+        except Exception:
+            _stats["dropped"] += len(rows)
+            log.error("audit_log.spill_rows_lost", rows=len(rows))
+
+
+async def flush_audit_log(*, drain_spill: bool = True) -> None:
+    async with _flush_lock:
+        db_healthy = True
+        while _pending:
+            outcome = await _flush_pending_batch(_take_batch(), try_insert=db_healthy)
+            if outcome == "requeued":
+                return
+            if outcome in ("spilled", "uncertain"):
+                db_healthy = False
+
+        if not db_healthy:
+            return
+
+        if drain_spill and settings.AUDIT_LOG_REDIS_SPILL:
+            await _drain_spill()
+
+
+async def run_audit_log_sink() -> None:
+    _stop_requested.clear()
+    while not _stop_requested.is_set():
+        try:
+            await asyncio.wait_for(_flush_requested.wait(), timeout=AUDIT_LOG_FLUSH_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+        _flush_requested.clear()
+        if _stop_requested.is_set():
+            break
+
+        try:
+            await flush_audit_log()
+            record_loop_success("audit_log_sink")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            record_loop_failure("audit_log_sink")
+            log.exception("audit_log.flush_failed")
+
+    await flush_audit_log(drain_spill=False)
+
+
+async def stop_audit_log_sink(task: asyncio.Task[None] | None = None) -> None:
+    _stop_requested.set()
+    _flush_requested.set()
+    if task is not None and not task.done():
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout=AUDIT_LOG_STOP_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            log.error("audit_log.stop_timeout", pending=len(_pending))
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        except Exception:
+            log.exception("audit_log.final_flush_failed")
+
+    try:
+        await flush_audit_log(drain_spill=False)
+    except Exception:
+        log.exception("audit_log.final_flush_failed")
+
+    if _pending:
+        log.error("audit_log.pending_lost", rows=len(_pending))
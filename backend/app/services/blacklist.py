@@ -153,6 +153,8 @@ async def emit_friends_status_none(user_id: int, other_id: int) -> None:
 
 
 async def _cleanup_private_room_access_for_blacklist(owner_id: int, target_id: int) -> None:
+    from ..realtime.utils import emit_room_requests_update, leave_hidden_room_viewers
+
     owner = _positive_int(owner_id)
     target = _positive_int(target_id)
     if owner <= 0 or target <= 0:
@@ -191,7 +193,10 @@ async def _cleanup_private_room_access_for_blacklist(owner_id: int, target_id: i
                 await sio.emit("room_app_revoked", event_payload, room=f"user:{owner}", namespace="/auth")
             with suppress(Exception):
                 await sio.emit("room_app_revoked", event_payload, room=f"user:{target}", namespace="/auth")
+            with suppress(Exception):
+                await emit_room_requests_update(int(room_id), owner, removed=[target], source="blacklist")
             if str(params.get("anonymity") or "visible") == "hidden":
+                await leave_hidden_room_viewers(int(room_id), [target])
                 with suppress(Exception):
                     await sio.emit("rooms_remove", {"id": int(room_id)}, room=f"user:{target}", namespace="/rooms")
         except Exception:
@@ -34,7 +34,7 @@ from ..services.blacklist import filter_notification_targets_for_actor, is_user_
 from ..services.minio import (
     CHAT_IMAGE_PENDING_SEGMENT,
     CHAT_IMAGE_PREFIX,
-    delete_object_async,
+    delete_chat_image_object_async,
     validate_chat_image_object_async,
 )
 from ..services.user_cache import get_user_profiles_cached
@@ -643,6 +643,7 @@ def _message_public_dict(message: GlobalChatMessage) -> dict[str, Any]:
         "user_id": int(message.user_id),
         "reply_to_message_id": _positive_int(message.reply_to_message_id) or None,
         "image_object_key": None if deleted else (str(message.image_object_key) if message.image_object_key else None),
+        "image_meta": None if deleted or not message.image_object_key else (message.image_meta or None),
     }
 
 
@@ -1512,6 +1513,7 @@ async def serialize_global_chat_messages(session: AsyncSession, messages: Sequen
                 "reactions": reactions,
                 "reply": reply_payload,
                 "image_object_key": public["image_object_key"],
+                "image_meta": public["image_meta"],
                 "mentions": [] if deleted else mentions_payload,
             }
         )
@@ -1715,7 +1717,7 @@ async def fetch_global_chat_context(session: AsyncSession, *, viewer_user_id: in
     )
 
 
-async def create_global_chat_message(session: AsyncSession, *, user_id: int, client_message_id: UUID, text: str, reply_to_message_id: int | None, image_object_key: str | None, silent_mention_user_ids: Sequence[int] | None = None) -> tuple[GlobalChatMessage, bool]:
+async def create_global_chat_message(session: AsyncSession, *, user_id: int, client_message_id: UUID, text: str, reply_to_message_id: int | None, image_object_key: str | None, image_meta: dict[str, Any] | None = None, silent_mention_user_ids: Sequence[int] | None = None) -> tuple[GlobalChatMessage, bool]:
     resolved_mentions = await _resolve_mentioned_users(session, set(_extract_mentioned_usernames(text)))
     mention_spans = _build_mention_spans(text, resolved_mentions, silent_user_ids=silent_mention_user_ids)
     stmt = (
@@ -1726,6 +1728,7 @@ async def create_global_chat_message(session: AsyncSession, *, user_id: int, cli
             text=str(text),
             reply_to_message_id=_positive_int(reply_to_message_id) or None,
             image_object_key=image_object_key,
+            image_meta=image_meta if image_object_key else None,
             mention_spans=mention_spans,
         )
         .on_conflict_do_nothing(index_elements=["user_id", "client_message_id"])
@@ -2119,6 +2122,7 @@ async def build_deleted_global_chat_message_preview(session: AsyncSession, *, me
         "content_available": content_available,
         "text": preview_text if content_available else "",
         "image_object_key": str(message.image_object_key) if content_available and message.image_object_key else None,
+        "image_meta": (message.image_meta or None) if content_available and message.image_object_key else None,
         "mentions": (
             _build_mentions_payload_from_spans(mention_spans, mention_profiles)
             if content_available and mention_spans
@@ -2144,13 +2148,14 @@ async def purge_global_chat_message(session: AsyncSession, *, message: GlobalCha
 
     message.text = ""
     message.image_object_key = None
+    message.image_meta = None
     message.mention_spans = []
     await session.commit()
 
     if image_key:
         try:
             if not await is_global_chat_image_referenced(session, image_key):
-                await delete_object_async(image_key)
+                await delete_chat_image_object_async(image_key)
         except Exception:
             log.exception("global_chat.purge_image_cleanup_failed", message_id=int(message.id), key=image_key)
 
@@ -2196,10 +2201,10 @@ async def validate_global_chat_send_input(*, user_id: int, text: object, reply_t
     return normalized_text, reply_id, image_key
 
 
-async def finalize_global_chat_image(*, user_id: int, image_object_key: str | None) -> str | None:
+async def finalize_global_chat_image(*, user_id: int, image_object_key: str | None) -> tuple[str | None, dict[str, Any] | None]:
     image_key = normalize_global_chat_image_object_key(image_object_key)
     if not image_key:
-        return None
+        return None, None
 
     ensure_global_chat_image_owned_by_user(user_id, image_key)
     return await validate_chat_image_object_async(image_key)
@@ -2214,4 +2219,4 @@ async def delete_global_chat_image_if_unreferenced(image_object_key: str | None)
         if await is_global_chat_image_referenced(session, key):
             return
 
-    await delete_object_async(key)
+    await delete_chat_image_object_async(key)
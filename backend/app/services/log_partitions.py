@@ -0,0 +1,138 @@
+from __future__ import annotations
+import re
+from datetime import datetime, timezone
+import structlog
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from ..core.db import engine
+from ..core.settings import settings
+
+log = structlog.get_logger()
+
+LOG_PARTITION_MONTHS_AHEAD = 2
+LOG_DEFAULT_PARTITION = "logs_default"
+LOG_UNPARTITIONED_TABLE = "logs_unpartitioned"
+LOG_BACKFILL_BATCH_SIZE = 5000
+
+_PARTITION_NAME_RE = re.compile(r"^logs_p(\d{4})(\d{2})$")
+_LOG_PARTITIONS_LOCK_SQL = text("SELECT pg_advisory_xact_lock(hashtext('logs_partitions'))")
+
+
+def _month_start(value: datetime) -> datetime:
+    value = value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def _add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def _partition_name(month: datetime) -> str:
+    return f"logs_p{month.year:04d}{month.month:02d}"
+
+
+async def ensure_log_partitions(conn: AsyncConnection, *, since: datetime | None = None) -> int:
+    current = _month_start(datetime.now(timezone.utc))
+    month = min(_month_start(since), current) if since else current
+    last = _add_months(current, LOG_PARTITION_MONTHS_AHEAD)
+    created = 0
+    while month <= last:
+        upper = _add_months(month, 1)
+        result = await conn.execute(text("SELECT to_regclass(:name)"), {"name": _partition_name(month)})
+        if result.scalar() is None:
+            await conn.execute(text(
+                f"CREATE TABLE {_partition_name(month)} PARTITION OF logs "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+            ))
+            created += 1
+        month = upper
+
+    await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {LOG_DEFAULT_PARTITION} PARTITION OF logs DEFAULT"))
+    return created
+
+
+async def _migrate_unpartitioned_logs(conn: AsyncConnection) -> None:
+    log.info("logs.partitioning.migrate_start")
+    await conn.execute(text(f"ALTER TABLE logs RENAME TO {LOG_UNPARTITIONED_TABLE}"))
+    await conn.execute(text(f"CREATE TABLE logs (LIKE {LOG_UNPARTITIONED_TABLE} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"))
+    await ensure_log_partitions(conn)
+
+    sequence = (await conn.execute(text(f"SELECT pg_get_serial_sequence('{LOG_UNPARTITIONED_TABLE}', 'id')"))).scalar()
+    if sequence:
+        await conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY logs.id"))
+
+    await conn.execute(text("ALTER TABLE logs ADD CONSTRAINT pk_logs PRIMARY KEY (id, created_at)"))
+    log.info("logs.partitioning.migrate_done")
+
+
+async def backfill_unpartitioned_logs() -> int | None:
+    async with engine.begin() as conn:
+        await conn.execute(_LOG_PARTITIONS_LOCK_SQL)
+        if (await conn.execute(text("SELECT to_regclass(:name)"), {"name": LOG_UNPARTITIONED_TABLE})).scalar() is None:
+            return None
+
+        rows = (await conn.execute(
+            text(f"SELECT id, created_at FROM {LOG_UNPARTITIONED_TABLE} ORDER BY id LIMIT :limit"),
+            {"limit": LOG_BACKFILL_BATCH_SIZE},
+        )).all()
+        if not rows:
+            await conn.execute(text(f"DROP TABLE {LOG_UNPARTITIONED_TABLE}"))
+            log.info("logs.partitioning.backfill_done")
+            return 0
+
+        await ensure_log_partitions(conn, since=min(created_at for _, created_at in rows))
+        moved = (await conn.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {LOG_UNPARTITIONED_TABLE} WHERE id = ANY(:ids) RETURNING *) "
+                "INSERT INTO logs SELECT * FROM moved"
+            ),
+            {"ids": [int(row_id) for row_id, _ in rows]},
+        )).rowcount
+
+    return int(moved or 0)
+
+
+async def prepare_log_partitions(conn: AsyncConnection) -> None:
+    await conn.execute(_LOG_PARTITIONS_LOCK_SQL)
+    relkind = (await conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('logs')"))).scalar()
+    if relkind == "r":
+        await _migrate_unpartitioned_logs(conn)
+    else:
+        await ensure_log_partitions(conn)
+
+    await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_logs_action_created_at ON logs (action, created_at)"))
+    await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_logs_user_id_created_at ON logs (user_id, created_at)"))
+
+
+async def drop_expired_log_partitions(conn: AsyncConnection) -> list[str]:
+    retention = int(settings.LOG_RETENTION_MONTHS or 0)
+    if retention <= 0:
+        return []
+
+    cutoff = _add_months(_month_start(datetime.now(timezone.utc)), -retention)
+    rows = await conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('logs')"
+    ))
+    dropped: list[str] = []
+    for (name,) in rows.all():
+        match = _PARTITION_NAME_RE.match(str(name))
+        if not match:
+            continue
+
+        month = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+        if _add_months(month, 1) <= cutoff:
+            await conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped.append(str(name))
+
+    return dropped
+
+
+async def maintain_log_partitions() -> tuple[int, list[str]]:
+    async with engine.begin() as conn:
+        await conn.execute(_LOG_PARTITIONS_LOCK_SQL)
+        created = await ensure_log_partitions(conn)
+        dropped = await drop_expired_log_partitions(conn)
+
+    return created, dropped
@@ -1,13 +1,19 @@
 from __future__ import annotations
 import asyncio
+import base64
 import io
+import multiprocessing
+import os
 import threading
 import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
 from urllib.parse import urlunsplit
 from uuid import uuid4
 from PIL import Image, ImageOps, ImageSequence
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Any, Callable, Optional
 import structlog
 from minio import Minio
 from minio.datatypes import PostPolicy
@@ -37,17 +43,24 @@ CHAT_IMAGE_MAX_SIDE = MAX_SIDE
 CHAT_IMAGE_PREFIX = "chat/global/images"
 CHAT_IMAGE_PENDING_SEGMENT = "pending"
 CHAT_IMAGE_PENDING_TTL_SECONDS = 60 * 60
+CHAT_IMAGE_VARIANT_WIDTHS = (320, 640)
+CHAT_IMAGE_VARIANT_QUALITY = 82
+CHAT_IMAGE_PLACEHOLDER_SIDE = 16
+CHAT_IMAGE_PROCESS_WORKERS = 2
+CHAT_IMAGE_MAX_CONCURRENCY = 4
 HOME_CAROUSEL_BANNER_PREFIX = "home/carousel-banner/"
 BUCKET_CHECK_TTL_S = 60.0
 _bucket_checked_until = 0.0
 _bucket_check_lock = threading.Lock()
+_chat_image_pool: ProcessPoolExecutor | None = None
+_chat_image_semaphore: asyncio.Semaphore | None = None
 
 
 def _normalize_content_type(content_type: str | None) -> str:
     return (content_type or "").split(";")[0].strip().lower()
 
 
-def _reencode_safe(content: bytes, ct_hint: Optional[str], *, max_side: int = MAX_SIDE) -> tuple[bytes, str] | None:
+def _load_rgb_image(content: bytes, *, max_side: int = MAX_SIDE) -> Image.Image | None:
     with Image.open(io.BytesIO(content)) as source:
         if source.width * source.height > MAX_PIXELS:
             return None
@@ -58,6 +71,10 @@ def _reencode_safe(content: bytes, ct_hint: Optional[str], *, max_side: int = MA
 
     im = im.convert("RGB")
     im.thumbnail((max_side, max_side), resample=Image.Resampling.LANCZOS)
+    return im
+
+
+def _encode_image(im: Image.Image, ct_hint: Optional[str]) -> tuple[bytes, str]:
     buf = io.BytesIO()
     if (ct_hint or "").lower() == "image/png":
         im.save(buf, format="PNG", optimize=True)
@@ -67,6 +84,75 @@ def _reencode_safe(content: bytes, ct_hint: Optional[str], *, max_side: int = MA
     return buf.getvalue(), "image/jpeg"
 
 
+def _reencode_safe(content: bytes, ct_hint: Optional[str], *, max_side: int = MAX_SIDE) -> tuple[bytes, str] | None:
+    im = _load_rgb_image(content, max_side=max_side)
+    if im is None:
+        return None
+
+    return _encode_image(im, ct_hint)
+
+
+def _render_chat_image(content: bytes, ct_hint: Optional[str]) -> dict[str, Any] | None:
+    im = _load_rgb_image(content, max_side=CHAT_IMAGE_MAX_SIDE)
+    if im is None:
+        return None
+
+    normalized_content, normalized_ct = _encode_image(im, ct_hint)
+    variants: list[tuple[int, bytes]] = []
+    for width in CHAT_IMAGE_VARIANT_WIDTHS:
+        if im.width <= width:
+            break
+
+        height = max(1, round(im.height * width / im.width))
+        buf = io.BytesIO()
+        im.resize((width, height), resample=Image.Resampling.LANCZOS).save(buf, format="JPEG", quality=CHAT_IMAGE_VARIANT_QUALITY, optimize=True)
+        variants.append((width, buf.getvalue()))
+
+    placeholder = im.copy()
+    placeholder.thumbnail((CHAT_IMAGE_PLACEHOLDER_SIDE, CHAT_IMAGE_PLACEHOLDER_SIDE), resample=Image.Resampling.BILINEAR)
+    buf = io.BytesIO()
+    placeholder.save(buf, format="JPEG", quality=50)
+    return {
+        "content": normalized_content,
+        "content_type": normalized_ct,
+        "width": im.width,
+        "height": im.height,
+        "variants": variants,
+        "placeholder": "data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode("ascii"),
+    }
+
+
+def _get_chat_image_pool() -> ProcessPoolExecutor:
+    global _chat_image_pool
+    if _chat_image_pool is None:
+        workers = max(1, min(CHAT_IMAGE_PROCESS_WORKERS, os.cpu_count() or 1))
+        _chat_image_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _chat_image_pool
+
+
+def shutdown_chat_image_pool() -> None:
+    global _chat_image_pool
+    pool = _chat_image_pool
+    _chat_image_pool = None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def _run_chat_image_job(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    global _chat_image_semaphore
+    if _chat_image_semaphore is None:
+        _chat_image_semaphore = asyncio.Semaphore(CHAT_IMAGE_MAX_CONCURRENCY)
+
+    async with _chat_image_semaphore:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(_get_chat_image_pool(), partial(func, *args, **kwargs))
+        except BrokenProcessPool:
+            log.warning("chat_image.pool.broken")
+            shutdown_chat_image_pool()
+            raise
+
+
 def _make_static_preview(im: Image.Image, *, max_side: int = MAX_SIDE) -> bytes | None:
     frame = im.convert("RGBA")
     frame.thumbnail((max_side, max_side), resample=Image.Resampling.LANCZOS)
@@ -233,7 +319,7 @@ def put_avatar(user_id: int, content: bytes, content_type: str | None, *, static
         raise
 
 
-def put_chat_image(user_id: int, content: bytes, content_type: str | None) -> Optional[str]:
+def _chat_image_upload_content_type(user_id: int, content: bytes, content_type: str | None) -> str | None:
     if not content:
         log.warning("chat_image.put.empty", user_id=user_id)
         return None
@@ -249,15 +335,10 @@ def put_chat_image(user_id: int, content: bytes, content_type: str | None) -> Op
         log.warning("chat_image.put.unsupported_type", user_id=user_id, content_type=ct or content_type)
         return None
 
-    try:
-        content, ct = _reencode_safe(content, ct, max_side=CHAT_IMAGE_MAX_SIDE)
-        if content is None or ct not in ALLOWED_CT:
-            return None
+    return ct
 
-    except Exception:
-        log.warning("chat_image.put.decode_failed", user_id=user_id)
-        return None
 
+def _put_pending_chat_image(user_id: int, content: bytes, ct: str) -> str:
     minio = get_minio_private()
     ensure_bucket(minio)
     ext = ALLOWED_CT[ct]
@@ -419,11 +500,12 @@ def build_chat_image_post_upload(key: str, content_type: str | None, *, expires_
     return upload_url, form_data, int(expires_minutes * 60)
 
 
-def validate_chat_image_object(key: str) -> str:
-    key_value = str(key or "").strip()
-    if not key_value:
-        raise ValueError("bad_image_key")
+def chat_image_variant_key(key: str, width: int) -> str:
+    base = key.rsplit(".", 1)[0] if "." in key.rsplit("/", 1)[-1] else key
+    return f"{base}-w{int(width)}.jpg"
 
+
+def _read_chat_image_object(key_value: str) -> tuple[bytes, str, str]:
     minio = get_minio_private()
     ensure_bucket(minio)
     try:
@@ -461,15 +543,17 @@ def validate_chat_image_object(key: str) -> str:
         _delete_object_quietly(minio, key_value)
         raise ValueError("unsupported_media_type")
 
-    try:
-        normalized = _reencode_safe(data, ct, max_side=CHAT_IMAGE_MAX_SIDE)
-    except Exception:
-        normalized = None
-    if normalized is None:
+    return data, ct_hdr, ct
+
+
+def _store_chat_image_object(key_value: str, data: bytes, ct_hdr: str, rendered: dict[str, Any] | None) -> tuple[str, dict[str, Any]]:
+    minio = get_minio_private()
+    if rendered is None:
         _delete_object_quietly(minio, key_value)
         raise ValueError("bad_image")
 
-    normalized_content, normalized_ct = normalized
+    normalized_content = rendered["content"]
+    normalized_ct = rendered["content_type"]
     if not normalized_content or normalized_ct not in ALLOWED_CT:
         _delete_object_quietly(minio, key_value)
         raise ValueError("bad_image")
@@ -505,10 +589,29 @@ def validate_chat_image_object(key: str) -> str:
             length=len(normalized_content),
             content_type=normalized_ct,
         )
+
+    variants: list[dict[str, Any]] = []
+    for width, variant_content in rendered["variants"]:
+        variant_key = chat_image_variant_key(target_key, width)
+        minio.put_object(
+            bucket_name=_bucket,
+            object_name=variant_key,
+            data=io.BytesIO(variant_content),
+            length=len(variant_content),
+            content_type="image/jpeg",
+        )
+        variants.append({"width": int(width), "key": variant_key})
+
     if target_key != key_value:
         _delete_object_quietly(minio, key_value)
 
-    return target_key
+    meta = {
+        "width": int(rendered["width"]),
+        "height": int(rendered["height"]),
+        "placeholder": rendered["placeholder"],
+        "variants": variants,
+    }
+    return target_key, meta
 
 
 def delete_stale_pending_chat_images(*, older_than_seconds: int = CHAT_IMAGE_PENDING_TTL_SECONDS) -> int:
@@ -561,6 +664,14 @@ def delete_avatars(user_id: int) -> int:
     return len(to_delete)
 
 
+def delete_chat_image_object(key: str) -> None:
+    minio = get_minio_private()
+    keys = [key, *(chat_image_variant_key(key, width) for width in CHAT_IMAGE_VARIANT_WIDTHS)]
+    errors = list(minio.remove_objects(bucket_name=_bucket, delete_object_list=[DeleteObject(item) for item in keys]))
+    if errors:
+        log.warning("chat_image.remove.errors", key=key, count=len(errors))
+
+
 def delete_chat_images() -> int:
     minio = get_minio_private()
     ensure_bucket(minio)
@@ -609,7 +720,22 @@ async def put_avatar_async(user_id: int, content: bytes, content_type: str | Non
 
 
 async def put_chat_image_async(user_id: int, content: bytes, content_type: str | None) -> Optional[str]:
-    return await asyncio.to_thread(put_chat_image, user_id, content, content_type)
+    ct = _chat_image_upload_content_type(user_id, content, content_type)
+    if ct is None:
+        return None
+
+    try:
+        normalized = await _run_chat_image_job(_reencode_safe, content, ct, max_side=CHAT_IMAGE_MAX_SIDE)
+    except BrokenProcessPool:
+        raise
+    except Exception:
+        log.warning("chat_image.put.decode_failed", user_id=user_id)
+        return None
+
+    if normalized is None or normalized[1] not in ALLOWED_CT:
+        return None
+
+    return await asyncio.to_thread(_put_pending_chat_image, user_id, *normalized)
 
 
 async def put_home_carousel_banner_async(content: bytes, content_type: str | None) -> Optional[str]:
@@ -636,8 +762,19 @@ async def build_chat_image_post_upload_async(key: str, content_type: str | None,
     return await asyncio.to_thread(build_chat_image_post_upload, key, content_type, expires_minutes=expires_minutes)
 
 
-async def validate_chat_image_object_async(key: str) -> str:
-    return await asyncio.to_thread(validate_chat_image_object, key)
+async def validate_chat_image_object_async(key: str) -> tuple[str, dict[str, Any]]:
+    key_value = str(key or "").strip()
+    if not key_value:
+        raise ValueError("bad_image_key")
+
+    data, ct_hdr, ct = await asyncio.to_thread(_read_chat_image_object, key_value)
+    try:
+        rendered = await _run_chat_image_job(_render_chat_image, data, ct)
+    except BrokenProcessPool:
+        raise
+    except Exception:
+        rendered = None
+    return await asyncio.to_thread(_store_chat_image_object, key_value, data, ct_hdr, rendered)
 
 
 async def get_prefix_storage_stats_async(prefix: str) -> tuple[int, int]:
@@ -662,3 +799,7 @@ def delete_object(key: str) -> None:
 
 async def delete_object_async(key: str) -> None:
     await asyncio.to_thread(delete_object, key)
+
+
+async def delete_chat_image_object_async(key: str) -> None:
+    await asyncio.to_thread(delete_chat_image_object, key)
@@ -0,0 +1,450 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import suppress
+from datetime import datetime, timedelta, timezone
+from time import monotonic, time
+from typing import Any, AsyncIterator
+from uuid import uuid4
+import structlog
+from sqlalchemy import func, select
+from ..core.clients import get_redis
+from ..core.db import SessionLocal
+from ..models.global_chat import GlobalChatMessage
+from ..models.room import Room
+from ..models.user import User
+from .text_moderation import detect_inappropriate_texts, get_text_moderation_word_lists
+
+log = structlog.get_logger()
+
+SWEEP_SOURCES: tuple[str, ...] = ("username", "room_title", "chat_message")
+SWEEP_BATCH_SIZE = 500
+SWEEP_CHAT_WINDOW_DAYS = 30
+SWEEP_LOCK_TTL_SECONDS = 120
+SWEEP_MAX_PROCESS_WORKERS = 2
+SWEEP_HITS_LIMIT = 10_000
+SWEEP_LOCK_KEY = "moderation:sweep:lock"
+SWEEP_STATE_KEY = "moderation:sweep:state"
+SWEEP_HITS_KEY = "moderation:sweep:hits"
+SWEEP_HITS_ORDER_KEY = "moderation:sweep:hits:order"
+SWEEP_DISMISSED_KEY = "moderation:sweep:dismissed"
+
+_sweep_task: asyncio.Task[None] | None = None
+_scheduled_tasks: set[asyncio.Task[None]] = set()
+_process_pool: ProcessPoolExecutor | None = None
+
+
+def _utc_now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        workers = max(1, min(SWEEP_MAX_PROCESS_WORKERS, os.cpu_count() or 1))
+        _process_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _process_pool
+
+
+def _shutdown_process_pool() -> None:
+    global _process_pool
+    pool = _process_pool
+    _process_pool = None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _moderate_batch(texts: list[str], whitelist_words: tuple[str, ...], blacklist_words: tuple[str, ...]) -> list[list[dict[str, Any]]]:
+    return [
+        [dict(match) for match in matches]
+        for matches in detect_inappropriate_texts(texts, whitelist_words=whitelist_words, blacklist_words=blacklist_words)
+    ]
+
+
+async def _iter_source_batches(source: str, *, chat_since: datetime) -> AsyncIterator[list[tuple[int, int | None, str, datetime | None]]]:
+    last_id = 0
+    while True:
+        async with SessionLocal() as session:
+            if source == "username":
+                query = (
+                    select(User.id, User.id, User.username, User.registered_at)
+                    .where(User.id > last_id, User.deleted_at.is_(None))
+                    .order_by(User.id.asc())
+                )
+            elif source == "room_title":
+                query = (
+                    select(Room.id, Room.creator, Room.title, Room.created_at)
+                    .where(Room.id > last_id)
+                    .order_by(Room.id.asc())
+                )
+            else:
+                query = (
+                    select(GlobalChatMessage.id, GlobalChatMessage.user_id, GlobalChatMessage.text, GlobalChatMessage.created_at)
+                    .where(
+                        GlobalChatMessage.id > last_id,
+                        GlobalChatMessage.created_at >= chat_since,
+                        GlobalChatMessage.deleted_at.is_(None),
+                        GlobalChatMessage.text != "",
+                    )
+                    .order_by(GlobalChatMessage.id.asc())
+                )
+            rows = (await session.execute(query.limit(SWEEP_BATCH_SIZE))).all()
+
+        if not rows:
+            return
+
+        last_id = int(rows[-1][0])
+        yield [
+            (int(object_id), int(user_id) if user_id is not None else None, str(text or ""), created_at)
+            for object_id, user_id, text, created_at in rows
+        ]
+        if len(rows) < SWEEP_BATCH_SIZE:
+            return
+
+
+async def _count_sources(*, chat_since: datetime) -> dict[str, int]:
+    async with SessionLocal() as session:
+        users_total = await session.scalar(select(func.count(User.id)).where(User.deleted_at.is_(None)))
+        rooms_total = await session.scalar(select(func.count(Room.id)))
+        chat_total = await session.scalar(
+            select(func.count(GlobalChatMessage.id)).where(
+                GlobalChatMessage.created_at >= chat_since,
+                GlobalChatMessage.deleted_at.is_(None),
+                GlobalChatMessage.text != "",
+            )
+        )
+    return {
+        "username": int(users_total or 0),
+        "room_title": int(rooms_total or 0),
+        "chat_message": int(chat_total or 0),
+    }
+
+
+async def _refresh_lock(run_id: str) -> bool:
+    r = get_redis()
+    current = await r.get(SWEEP_LOCK_KEY)
+    if current != run_id:
+        return False
+    await r.expire(SWEEP_LOCK_KEY, SWEEP_LOCK_TTL_SECONDS)
+    return True
+
+
+def _hits_order_key(source: str | None = None) -> str:
+    return f"{SWEEP_HITS_ORDER_KEY}:{source}" if source else SWEEP_HITS_ORDER_KEY
+
+
+def _text_fingerprint(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+async def _store_hits(run_id: str, source: str, rows: list[tuple[int, int | None, str, datetime | None]], verdicts: list[list[dict[str, Any]]]) -> int:
+    found_at = int(time())
+    payloads: dict[str, str] = {}
+    clean_ids: list[str] = []
+    r = get_redis()
+    flagged = [(f"{source}:{row[0]}", row[2]) for row, matches in zip(rows, verdicts) if matches]
+    dismissed = dict(zip((hit_id for hit_id, _ in flagged), await r.hmget(SWEEP_DISMISSED_KEY, [hit_id for hit_id, _ in flagged]))) if flagged else {}
+    for (object_id, user_id, text, created_at), matches in zip(rows, verdicts):
+        hit_id = f"{source}:{object_id}"
+        if not matches:
+            clean_ids.append(hit_id)
+            continue
+        if dismissed.get(hit_id) == _text_fingerprint(text):
+            continue
+        payloads[hit_id] = json.dumps(
+            {
+                "id": hit_id,
+                "run_id": run_id,
+                "source": source,
+                "object_id": object_id,
+                "user_id": user_id,
+                "text": text,
+                "matches": matches,
+                "created_at": created_at.isoformat() if created_at else None,
+                "found_at": found_at,
+            },
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
+    async with r.pipeline() as p:
+        if clean_ids:
+            await p.zrem(_hits_order_key(), *clean_ids)
+            await p.zrem(_hits_order_key(source), *clean_ids)
+            await p.hdel(SWEEP_HITS_KEY, *clean_ids)
+            await p.hdel(SWEEP_DISMISSED_KEY, *clean_ids)
+        if payloads:
+            scores = {hit_id: found_at for hit_id in payloads}
+            await p.hset(SWEEP_HITS_KEY, mapping=payloads)
+            await p.zadd(_hits_order_key(), scores)
+            await p.zadd(_hits_order_key(source), scores)
+        await p.execute()
+    return len(payloads)
+
+
+async def _trim_hits() -> None:
+    r = get_redis()
+    overflow = int(await r.zcard(_hits_order_key()) or 0) - SWEEP_HITS_LIMIT
+    if overflow <= 0:
+        return
+
+    stale_ids = await r.zrange(_hits_order_key(), 0, overflow - 1)
+    if stale_ids:
+        async with r.pipeline() as p:
+            await p.zrem(_hits_order_key(), *stale_ids)
+            for source in SWEEP_SOURCES:
+                await p.zrem(_hits_order_key(source), *stale_ids)
+            await p.hdel(SWEEP_HITS_KEY, *stale_ids)
+            await p.execute()
+
+
+async def _run_sweep(run_id: str) -> None:
+    r = get_redis()
+    loop = asyncio.get_running_loop()
+    whitelist_words, blacklist_words = get_text_moderation_word_lists()
+    chat_since = _utc_now() - timedelta(days=SWEEP_CHAT_WINDOW_DAYS)
+    started = monotonic()
+    processed = 0
+    hits = 0
+    status = "failed"
+    try:
+        totals = await _count_sources(chat_since=chat_since)
+        await r.hset(
+            SWEEP_STATE_KEY,
+            mapping={
+                "total": sum(totals.values()),
+                **{f"total:{source}": value for source, value in totals.items()},
+            },
+        )
+
+        pool = _get_process_pool()
+        for source in SWEEP_SOURCES:
+            source_processed = 0
+            async for rows in _iter_source_batches(source, chat_since=chat_since):
+                if not await _refresh_lock(run_id):
+                    status = "cancelled"
+                    return
+
+                verdicts = await loop.run_in_executor(
+                    pool,
+                    _moderate_batch,
+                    [text for _, _, text, _ in rows],
+                    whitelist_words,
+                    blacklist_words,
+                )
+                hits += await _store_hits(run_id, source, rows, verdicts)
+                processed += len(rows)
+                source_processed += len(rows)
+                elapsed = max(0.001, monotonic() - started)
+                await r.hset(
+                    SWEEP_STATE_KEY,
+                    mapping={
+                        "processed": processed,
+                        f"processed:{source}": source_processed,
+                        "hits": hits,
+                        "rate": round(processed / elapsed, 1),
+                        "updated_at": int(time()),
+                    },
+                )
+
+        await _trim_hits()
+        status = "done"
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    except Exception:
+        log.exception("moderation.sweep.failed", run_id=run_id, processed=processed)
+    finally:
+        elapsed = max(0.001, monotonic() - started)
+        with suppress(Exception):
+            await r.hset(
+                SWEEP_STATE_KEY,
+                mapping={
+                    "status": status,
+                    "processed": processed,
+                    "hits": hits,
+                    "rate": round(processed / elapsed, 1),
+                    "finished_at": int(time()),
+                    "updated_at": int(time()),
+                },
+            )
+        with suppress(Exception):
+            if await r.get(SWEEP_LOCK_KEY) == run_id:
+                await r.delete(SWEEP_LOCK_KEY)
+        log.info(
+            "moderation.sweep.finished",
+            run_id=run_id,
+            status=status,
+            processed=processed,
+            hits=hits,
+            duration_s=round(elapsed, 1),
+        )
+
+
+async def start_moderation_sweep(*, started_by: int | None, reason: str) -> dict[str, Any] | None:
+    global _sweep_task
+    r = get_redis()
+    run_id = uuid4().hex
+    if not await r.set(SWEEP_LOCK_KEY, run_id, nx=True, ex=SWEEP_LOCK_TTL_SECONDS):
+        return None
+
+    now_ts = int(time())
+    async with r.pipeline() as p:
+        await p.delete(SWEEP_STATE_KEY)
+        await p.hset(
+            SWEEP_STATE_KEY,
+            mapping={
+                "run_id": run_id,
+                "status": "running",
+                "reason": reason,
+                "started_by": int(started_by or 0),
+                "started_at": now_ts,
+                "updated_at": now_ts,
+                "processed": 0,
+                "hits": 0,
+                "total": 0,
+                "rate": 0,
+            },
+        )
+        await p.execute()
+
+    log.info("moderation.sweep.started", run_id=run_id, started_by=started_by, reason=reason)
+    _sweep_task = asyncio.create_task(_run_sweep(run_id))
+    return await fetch_moderation_sweep_state()
+
+
+def _on_scheduled_done(task: asyncio.Task[None]) -> None:
+    _scheduled_tasks.discard(task)
+    if task.cancelled():
+        return
+
+    exc = task.exception()
+    if exc is not None:
+        log.warning("moderation.sweep.schedule_failed", err=type(exc).__name__)
+
+
+def schedule_moderation_sweep(*, started_by: int | None, reason: str) -> None:
+    async def _task() -> None:
+        try:
+            await start_moderation_sweep(started_by=started_by, reason=reason)
+        except Exception:
+            log.exception("moderation.sweep.schedule_failed", reason=reason)
+
+    task = asyncio.create_task(_task())
+    _scheduled_tasks.add(task)
+    task.add_done_callback(_on_scheduled_done)
+
+
+async def stop_moderation_sweep() -> None:
+    global _sweep_task
+    for scheduled in list(_scheduled_tasks):
+        scheduled.cancel()
+    task = _sweep_task
+    _sweep_task = None
+    if task is not None and not task.done():
+        task.cancel()
+        with suppress(asyncio.CancelledError, Exception):
+            await task
+    _shutdown_process_pool()
+
+
+def _state_int(raw: dict[str, Any], key: str) -> int:
+    try:
+        return int(float(raw.get(key) or 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _state_dt(raw: dict[str, Any], key: str) -> datetime | None:
+    ts = _state_int(raw, key)
+    return datetime.fromtimestamp(ts, tz=timezone.utc) if ts > 0 else None
+
+
+async def fetch_moderation_sweep_state() -> dict[str, Any]:
+    r = get_redis()
+    async with r.pipeline() as p:
+        await p.hgetall(SWEEP_STATE_KEY)
+        await p.get(SWEEP_LOCK_KEY)
+        await p.zcard(_hits_order_key())
+        raw, lock_owner, queued = await p.execute()
+
+    raw = raw or {}
+    status = str(raw.get("status") or "idle")
+    if status == "running" and lock_owner != raw.get("run_id"):
+        status = "failed"
+
+    total = _state_int(raw, "total")
+    processed = _state_int(raw, "processed")
+    try:
+        rate = float(raw.get("rate") or 0)
+    except (TypeError, ValueError):
+        rate = 0.0
+
+    eta_seconds: int | None = None
+    if status == "running" and rate > 0 and total > processed:
+        eta_seconds = int((total - processed) / rate)
+
+    return {
+        "status": status,
+        "reason": str(raw.get("reason") or "") or None,
+        "started_by": _state_int(raw, "started_by") or None,
+        "started_at": _state_dt(raw, "started_at"),
+        "finished_at": _state_dt(raw, "finished_at"),
+        "total": total,
+        "processed": processed,
+        "hits": _state_int(raw, "hits"),
+        "rate": rate,
+        "eta_seconds": eta_seconds,
+        "sources": {
+            source: {
+                "total": _state_int(raw, f"total:{source}"),
+                "processed": _state_int(raw, f"processed:{source}"),
+            }
+            for source in SWEEP_SOURCES
+        },
+        "queued": int(queued or 0),
+    }
+
+
+async def fetch_moderation_sweep_hits(*, offset: int, limit: int, source: str | None = None) -> tuple[int, list[dict[str, Any]]]:
+    r = get_redis()
+    order_key = _hits_order_key(source)
+    async with r.pipeline() as p:
+        await p.zcard(order_key)
+        await p.zrevrange(order_key, offset, offset + limit - 1)
+        total, hit_ids = await p.execute()
+    if not hit_ids:
+        return int(total or 0), []
+
+    items: list[dict[str, Any]] = []
+    for raw_hit in await r.hmget(SWEEP_HITS_KEY, hit_ids) or []:
+        if not raw_hit:
+            continue
+        with suppress(Exception):
+            items.append(json.loads(raw_hit))
+    return int(total or 0), items
+
+
+async def dismiss_moderation_sweep_hit(hit_id: str) -> dict[str, Any] | None:
+    source = str(hit_id).split(":", 1)[0]
+    r = get_redis()
+    raw_hit = await r.hget(SWEEP_HITS_KEY, hit_id)
+    if not raw_hit:
+        return None
+
+    try:
+        hit = json.loads(raw_hit)
+    except Exception:
+        hit = {"id": hit_id, "source": source, "text": ""}
+    async with r.pipeline() as p:
+        await p.zrem(_hits_order_key(), hit_id)
+        if source in SWEEP_SOURCES:
+            await p.zrem(_hits_order_key(source), hit_id)
+        await p.hdel(SWEEP_HITS_KEY, hit_id)
+        await p.hset(SWEEP_DISMISSED_KEY, hit_id, _text_fingerprint(str(hit.get("text") or "")))
+        rows = await p.execute()
+    return hit if rows[-2] else None
@@ -1,8 +1,10 @@
 from __future__ import annotations
+import asyncio
 import re
 import unicodedata
+from collections import deque
 from functools import lru_cache
-from typing import Any, TypedDict
+from typing import Any, Iterable, Iterator, Sequence, TypedDict
 from fastapi import HTTPException, status
 from safetext import SafeText
 from ..security.parameters import get_cached_settings
@@ -10,11 +12,14 @@ from ..security.parameters import get_cached_settings
 MAX_MATCHES = 5
 MIN_BAD_WORD_LEN = 3
 MAX_TOKEN_LEN_FOR_SCAN = 128
+WORD_AUTOMATA_CACHE_SIZE = 8
+VERDICT_CACHE_SIZE = 8192
 SUPPORTED_LANGUAGES: tuple[str, ...] = ("ru", "en")
 TOKEN_SCAN_LANGUAGES: tuple[str, ...] = ("ru",)
 TOKEN_RE = re.compile(r"[\w@$!+|]+", re.UNICODE)
 COMPACT_RE = re.compile(r"[\W_]+", re.UNICODE)
 REPEATED_CHAR_RE = re.compile(r"(.)\1+")
+PROFANITY_WORD_RE = re.compile(r"\b\w+\b")
 
 BRIDGE_DROP_CHARS = frozenset({"i", "j", "l", "1", "!", "|", "и", "й", "і", "ӏ", "ı"})
 
@@ -133,6 +138,61 @@ class ModerationDetail(TypedDict):
     matches: list[ModerationMatch]
 
 
+class PatternAutomaton:
+    __slots__ = ("_goto", "_fail", "_out")
+
+    def __init__(self, patterns: Iterable[tuple[str, Any]]) -> None:
+        goto: list[dict[str, int]] = [{}]
+        out: list[tuple[tuple[int, Any], ...]] = [()]
+        for pattern, payload in patterns:
+            if not pattern:
+                continue
+
+            node = 0
+            for char in pattern:
+                child = goto[node].get(char)
+                if child is None:
+                    child = len(goto)
+                    goto[node][char] = child
+                    goto.append({})
+                    out.append(())
+                node = child
+            out[node] = (*out[node], (len(pattern), payload))
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in goto[node].items():
+                queue.append(child)
+                fallback = fail[node]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(char, 0)
+                fail[child] = target if target != child else 0
+                if out[fail[child]]:
+                    out[child] = (*out[child], *out[fail[child]])
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def __bool__(self) -> bool:
+        return len(self._goto) > 1
+
+    def iter_matches(self, text: str) -> Iterator[tuple[int, int, Any]]:
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, payload in out[node]:
+                yield index + 1 - length, index + 1, payload
+
+
 def _to_int(raw: Any) -> int | None:
     try:
         return int(raw)
@@ -324,6 +384,61 @@ def _get_bad_words_index() -> dict[str, dict[int, set[str]]]:
     return out
 
 
+@lru_cache(maxsize=1)
+def _get_profanity_indexes() -> dict[str, tuple[frozenset[str], PatternAutomaton]]:
+    out: dict[str, tuple[frozenset[str], PatternAutomaton]] = {}
+    for language, detector in _get_detectors():
+        checker = getattr(detector, "checker", None)
+        profanity_words = getattr(checker, "_profanity_words", None)
+        if not isinstance(profanity_words, list) or getattr(checker, "_whitelist", None):
+            continue
+        if getattr(detector, "validate_profanity", False):
+            continue
+        words = [word for word in profanity_words if isinstance(word, str)]
+        single_words = frozenset(word for word in words if " " not in word)
+        phrases = PatternAutomaton((phrase, phrase) for phrase in dict.fromkeys(word for word in words if " " in word))
+        out[language] = (single_words, phrases)
+
+    return out
+
+
+@lru_cache(maxsize=4096)
+def _profanity_word_pattern(word: str) -> re.Pattern[str]:
+    return re.compile(r"\b" + re.escape(word) + r"\b", re.IGNORECASE)
+
+
+def _check_profanity(language: str, detector: SafeText, text: str) -> Any:
+    index = _get_profanity_indexes().get(language)
+    if index is None:
+        return detector.check_profanity(text=text)
+
+    single_words, phrases = index
+    lower_text = text.lower()
+    found: list[dict[str, Any]] = []
+    for word in sorted(single_words.intersection(PROFANITY_WORD_RE.findall(lower_text))):
+        for match in _profanity_word_pattern(word).finditer(text):
+            found.append({"word": word, "start": match.start(), "end": match.end()})
+
+    last_end: dict[str, int] = {}
+    for start, end, phrase in phrases.iter_matches(lower_text):
+        if start < last_end.get(phrase, 0):
+            continue
+        last_end[phrase] = end
+        found.append({"word": phrase, "start": start, "end": end})
+
+    return found
+
+
+@lru_cache(maxsize=1)
+def _get_bad_words_automata() -> tuple[tuple[str, PatternAutomaton], ...]:
+    out: list[tuple[str, PatternAutomaton]] = []
+    for language, by_len in _get_bad_words_index().items():
+        automaton = PatternAutomaton((word, None) for words in by_len.values() for word in sorted(words))
+        if automaton:
+            out.append((language, automaton))
+    return tuple(out)
+
+
 def _normalize_match(raw: Any, *, text: str, language: str) -> ModerationMatch | None:
     if not isinstance(raw, dict):
         return None
@@ -345,55 +460,39 @@ def _normalize_match(raw: Any, *, text: str, language: str) -> ModerationMatch |
     return match
 
 
-def _scan_token(token: str, *, token_start: int, language: str, by_len: dict[int, set[str]]) -> list[ModerationMatch]:
+def _scan_token(token: str, *, token_start: int, language: str, automaton: PatternAutomaton, variants: list[tuple[str, str, bool]]) -> list[ModerationMatch]:
     if not token:
         return []
 
     found: list[ModerationMatch] = []
-    sorted_lengths = sorted(by_len.keys())
-    for _, variant_text, has_direct_pos in _build_variants(token):
-        variant_len = len(variant_text)
-        if variant_len < MIN_BAD_WORD_LEN:
-            continue
-
-        for bad_len in sorted_lengths:
-            if bad_len > variant_len:
-                break
-
-            words = by_len[bad_len]
-            max_offset = variant_len - bad_len
-            for offset in range(max_offset + 1):
-                fragment = variant_text[offset: offset + bad_len]
-                if fragment not in words:
-                    continue
-                if has_direct_pos and variant_len == len(token):
-                    start = token_start + offset
-                    end = start + bad_len
-                    word = token[offset: offset + bad_len]
-                    found.append(
-                        {
-                            "word": word[:64],
-                            "start": start,
-                            "end": end,
-                            "language": language,
-                        }
-                    )
-                else:
-                    found.append(
-                        {
-                            "word": token[:64],
-                            "start": token_start,
-                            "end": token_start + len(token),
-                            "language": language,
-                        }
-                    )
+    for _, variant_text, has_direct_pos in variants:
+        direct = has_direct_pos and len(variant_text) == len(token)
+        for offset, offset_end, _payload in automaton.iter_matches(variant_text):
+            if direct:
+                found.append(
+                    {
+                        "word": token[offset: offset_end][:64],
+                        "start": token_start + offset,
+                        "end": token_start + offset_end,
+                        "language": language,
+                    }
+                )
+            else:
+                found.append(
+                    {
+                        "word": token[:64],
+                        "start": token_start,
+                        "end": token_start + len(token),
+                        "language": language,
+                    }
+                )
 
     return found
 
 
 def _scan_obfuscated_tokens(text: str) -> list[ModerationMatch]:
-    indexes = _get_bad_words_index()
-    if not indexes:
+    automata = _get_bad_words_automata()
+    if not automata:
         return []
 
     found: list[ModerationMatch] = []
@@ -403,31 +502,30 @@ def _scan_obfuscated_tokens(text: str) -> list[ModerationMatch]:
             continue
 
         token_start = token_match.start()
-        for language, by_len in indexes.items():
+        variants = _build_variants(token)
+        for language, automaton in automata:
             found.extend(
                 _scan_token(
                     token,
                     token_start=token_start,
                     language=language,
-                    by_len=by_len,
+                    automaton=automaton,
+                    variants=variants,
                 )
             )
 
     return found
 
 
-def _get_text_moderation_whitelist_words() -> tuple[str, ...]:
-    try:
-        words = getattr(get_cached_settings(), "text_moderation_whitelist_words", ())
-    except Exception:
-        return ()
-
+@lru_cache(maxsize=WORD_AUTOMATA_CACHE_SIZE)
+def _normalize_settings_words(words: tuple[Any, ...], *, blacklist: bool) -> tuple[str, ...]:
+    normalize = _normalize_blacklist_word if blacklist else _normalize_whitelist_word
     out: list[str] = []
     seen: set[str] = set()
-    for raw_word in words or ():
+    for raw_word in words:
         if not isinstance(raw_word, str):
             continue
-        word = _normalize_whitelist_word(raw_word)
+        word = normalize(raw_word)
         if not word or word in seen:
             continue
         seen.add(word)
@@ -435,26 +533,43 @@ def _get_text_moderation_whitelist_words() -> tuple[str, ...]:
     return tuple(out)
 
 
+def _get_text_moderation_whitelist_words() -> tuple[str, ...]:
+    try:
+        words = getattr(get_cached_settings(), "text_moderation_whitelist_words", ())
+    except Exception:
+        return ()
+
+    return _normalize_settings_words(tuple(words or ()), blacklist=False)
+
+
 def _get_text_moderation_blacklist_words() -> tuple[str, ...]:
     try:
         words = getattr(get_cached_settings(), "text_moderation_blacklist_words", ())
     except Exception:
         return ()
 
-    out: list[str] = []
-    seen: set[str] = set()
-    for raw_word in words or ():
-        if not isinstance(raw_word, str):
-            continue
-        word = _normalize_blacklist_word(raw_word)
-        if not word or word in seen:
-            continue
-        seen.add(word)
-        out.append(word)
-    return tuple(out)
+    return _normalize_settings_words(tuple(words or ()), blacklist=True)
+
+
+@lru_cache(maxsize=WORD_AUTOMATA_CACHE_SIZE)
+def _get_words_automaton(words: tuple[str, ...]) -> PatternAutomaton:
+    return PatternAutomaton((word, word) for word in dict.fromkeys(words))
+
+
+@lru_cache(maxsize=WORD_AUTOMATA_CACHE_SIZE)
+def _get_blacklist_variants_automaton(blacklist_words: tuple[str, ...]) -> tuple[PatternAutomaton, tuple[tuple[str, int], ...]]:
+    patterns: list[tuple[str, tuple[int, int, bool]]] = []
+    entries: list[tuple[str, int]] = []
+    for word_index, blacklist_word in enumerate(blacklist_words):
+        normalized_word = _normalize_blacklist_word(blacklist_word)
+        word_variants = _build_variants(normalized_word) if normalized_word else []
+        entries.append((normalized_word, len(word_variants)))
+        for variant_index, (_word_variant_name, word_variant, word_has_direct_pos) in enumerate(word_variants):
+            patterns.append((word_variant, (word_index, variant_index, word_has_direct_pos)))
+    return PatternAutomaton(patterns), tuple(entries)
 
 
-def _whitelist_occurrences(text: str, whitelist_words: set[str]) -> list[tuple[int, int, str]]:
+def _whitelist_occurrences(text: str, whitelist_words: tuple[str, ...]) -> list[tuple[int, int, str]]:
     if not whitelist_words:
         return []
 
@@ -462,16 +577,7 @@ def _whitelist_occurrences(text: str, whitelist_words: set[str]) -> list[tuple[i
     if not normalized_text:
         return []
 
-    occurrences: list[tuple[int, int, str]] = []
-    for whitelist_word in sorted(whitelist_words, key=len, reverse=True):
-        start = 0
-        while True:
-            index = normalized_text.find(whitelist_word, start)
-            if index < 0:
-                break
-            occurrences.append((index, index + len(whitelist_word), whitelist_word))
-            start = index + 1
-
+    occurrences = list(_get_words_automaton(whitelist_words).iter_matches(normalized_text))
     occurrences.sort(key=lambda item: (item[0], -(item[1] - item[0]), item[2]))
     return occurrences
 
@@ -502,8 +608,7 @@ def _filter_whitelisted_matches(text: str, matches: list[ModerationMatch], white
     if not matches or not whitelist_words:
         return matches
 
-    whitelist_set = set(whitelist_words)
-    whitelist_occurrences = _whitelist_occurrences(text, whitelist_set)
+    whitelist_occurrences = _whitelist_occurrences(text, whitelist_words)
     if not whitelist_occurrences:
         return matches
 
@@ -526,7 +631,7 @@ def _find_blacklisted_matches(text: str, blacklist_words: tuple[str, ...]) -> li
 
     found: list[ModerationMatch] = []
     direct_matched_words: set[str] = set()
-    blacklist_occurrences = _whitelist_occurrences(text, set(blacklist_words))
+    blacklist_occurrences = _whitelist_occurrences(text, blacklist_words)
     for start, end, blacklist_word in blacklist_occurrences:
         if blacklist_word in direct_matched_words:
             continue
@@ -545,46 +650,48 @@ def _find_blacklisted_matches(text: str, blacklist_words: tuple[str, ...]) -> li
             }
         )
 
-    text_variants = _build_variants(text)
-    for blacklist_word in blacklist_words:
-        normalized_word = _normalize_blacklist_word(blacklist_word)
-        if not normalized_word or normalized_word in direct_matched_words:
-            continue
-
-        word_variants = _build_variants(normalized_word)
-        if not word_variants:
-            continue
-
-        matched = False
-        for _text_variant_name, text_variant, text_has_direct_pos in text_variants:
-            if matched or not text_variant:
+    automaton, entries = _get_blacklist_variants_automaton(blacklist_words)
+    pending = [
+        word_index
+        for word_index, (normalized_word, variants_count) in enumerate(entries)
+        if normalized_word and variants_count and normalized_word not in direct_matched_words
+    ]
+    if not pending or not automaton:
+        return found
+
+    text_hits: list[tuple[bool, dict[tuple[int, int], tuple[int, int, bool]]]] = []
+    for _text_variant_name, text_variant, text_has_direct_pos in _build_variants(text):
+        first_hits: dict[tuple[int, int], tuple[int, int, bool]] = {}
+        for start, end, (word_index, variant_index, word_has_direct_pos) in automaton.iter_matches(text_variant):
+            first_hits.setdefault((word_index, variant_index), (start, end, word_has_direct_pos))
+        if first_hits:
+            text_hits.append((text_has_direct_pos, first_hits))
+
+    for word_index in pending:
+        normalized_word, variants_count = entries[word_index]
+        for text_has_direct_pos, first_hits in text_hits:
+            hit = next(
+                (first_hits[key] for key in ((word_index, variant_index) for variant_index in range(variants_count)) if key in first_hits),
+                None,
+            )
+            if hit is None:
                 continue
 
-            for _word_variant_name, word_variant, word_has_direct_pos in word_variants:
-                if not word_variant:
-                    continue
-
-                index = text_variant.find(word_variant)
-                if index < 0:
-                    continue
-
-                match: ModerationMatch = {
-                    "word": normalized_word[:64],
-                    "language": "blacklist",
-                }
-                if text_has_direct_pos and word_has_direct_pos:
-                    start = index
-                    end = start + len(word_variant)
-                    snippet = ""
-                    if 0 <= start < end <= len(text):
-                        snippet = str(text[start:end]).strip()
-                    match["word"] = (snippet or normalized_word)[:64]
-                    match["start"] = start
-                    match["end"] = end
-
-                found.append(match)
-                matched = True
-                break
+            match: ModerationMatch = {
+                "word": normalized_word[:64],
+                "language": "blacklist",
+            }
+            start, end, word_has_direct_pos = hit
+            if text_has_direct_pos and word_has_direct_pos:
+                snippet = ""
+                if 0 <= start < end <= len(text):
+                    snippet = str(text[start:end]).strip()
+                match["word"] = (snippet or normalized_word)[:64]
+                match["start"] = start
+                match["end"] = end
+
+            found.append(match)
+            break
 
     return found
 
@@ -604,17 +711,13 @@ def _dedupe_matches(matches: list[ModerationMatch]) -> list[ModerationMatch]:
     return out
 
 
-def detect_inappropriate_text(text: str, *, whitelist_words: tuple[str, ...] | None = None, blacklist_words: tuple[str, ...] | None = None) -> list[ModerationMatch]:
-    value = str(text or "").strip()
-    if not value:
-        return []
-
+def _scan_inappropriate_text(value: str, whitelist_words: tuple[str, ...], blacklist_words: tuple[str, ...]) -> list[ModerationMatch]:
     found: list[ModerationMatch] = []
     seen: set[tuple[str, int | None, int | None, str]] = set()
     for language, detector in _get_detectors():
         for _, variant_value, has_direct_pos in _build_variants(value):
             try:
-                raw_matches = detector.check_profanity(text=variant_value) or []
+                raw_matches = _check_profanity(language, detector, variant_value) or []
             except Exception:
                 continue
             if isinstance(raw_matches, dict):
@@ -654,15 +757,68 @@ def detect_inappropriate_text(text: str, *, whitelist_words: tuple[str, ...] | N
             continue
         seen.add(key)
         found.append(match)
-    effective_whitelist = whitelist_words if whitelist_words is not None else _get_text_moderation_whitelist_words()
-    effective_blacklist = blacklist_words if blacklist_words is not None else _get_text_moderation_blacklist_words()
-    explicit_blacklisted = _find_blacklisted_matches(value, effective_blacklist)
-    filtered = _filter_whitelisted_matches(value, found, effective_whitelist)
+    explicit_blacklisted = _find_blacklisted_matches(value, blacklist_words)
+    filtered = _filter_whitelisted_matches(value, found, whitelist_words)
     merged = _dedupe_matches([*explicit_blacklisted, *filtered])
     merged.sort(key=lambda item: (item.get("start", 10**9), item.get("word", "")))
     return merged[:MAX_MATCHES]
 
 
+@lru_cache(maxsize=VERDICT_CACHE_SIZE)
+def _cached_verdict(value: str, whitelist_words: tuple[str, ...], blacklist_words: tuple[str, ...]) -> tuple[ModerationMatch, ...]:
+    return tuple(_scan_inappropriate_text(value, whitelist_words, blacklist_words))
+
+
+def _effective_word_lists(whitelist_words: tuple[str, ...] | None, blacklist_words: tuple[str, ...] | None) -> tuple[tuple[str, ...], tuple[str, ...]]:
+    effective_whitelist = tuple(whitelist_words) if whitelist_words is not None else _get_text_moderation_whitelist_words()
+    effective_blacklist = tuple(blacklist_words) if blacklist_words is not None else _get_text_moderation_blacklist_words()
+    return effective_whitelist, effective_blacklist
+
+
+def get_text_moderation_word_lists() -> tuple[tuple[str, ...], tuple[str, ...]]:
+    return _effective_word_lists(None, None)
+
+
+def _verdict_matches(value: str, whitelist_words: tuple[str, ...], blacklist_words: tuple[str, ...]) -> list[ModerationMatch]:
+    if not value:
+        return []
+
+    return [ModerationMatch(**match) for match in _cached_verdict(value, whitelist_words, blacklist_words)]
+
+
+def detect_inappropriate_text(text: str, *, whitelist_words: tuple[str, ...] | None = None, blacklist_words: tuple[str, ...] | None = None) -> list[ModerationMatch]:
+    value = str(text or "").strip()
+    if not value:
+        return []
+
+    effective_whitelist, effective_blacklist = _effective_word_lists(whitelist_words, blacklist_words)
+    return _verdict_matches(value, effective_whitelist, effective_blacklist)
+
+
+def detect_inappropriate_texts(texts: Iterable[str], *, whitelist_words: tuple[str, ...] | None = None, blacklist_words: tuple[str, ...] | None = None) -> list[list[ModerationMatch]]:
+    values = [str(text or "").strip() for text in texts]
+    if not values:
+        return []
+
+    effective_whitelist, effective_blacklist = _effective_word_lists(whitelist_words, blacklist_words)
+    verdicts: dict[str, list[ModerationMatch]] = {}
+    for value in values:
+        if value not in verdicts:
+            verdicts[value] = _verdict_matches(value, effective_whitelist, effective_blacklist)
+
+    return [[ModerationMatch(**match) for match in verdicts[value]] for value in values]
+
+
+async def detect_inappropriate_texts_async(texts: Sequence[str], *, whitelist_words: tuple[str, ...] | None = None, blacklist_words: tuple[str, ...] | None = None) -> list[list[ModerationMatch]]:
+    effective_whitelist, effective_blacklist = _effective_word_lists(whitelist_words, blacklist_words)
+    return await asyncio.to_thread(
+        detect_inappropriate_texts,
+        list(texts),
+        whitelist_words=effective_whitelist,
+        blacklist_words=effective_blacklist,
+    )
+
+
 def _dedupe_match_word(word: str) -> str:
     normalized = _normalize_obfuscated_strict(word, alt=True)
     normalized = _compact_for_scan(normalized)
@@ -694,8 +850,7 @@ def _build_moderation_message(*, label: str, matches: list[ModerationMatch]) ->
     return f"{label} содержит неподобающие слова: {', '.join(words)}."
 
 
-def enforce_clean_text(*, field: str, label: str, value: str) -> None:
-    matches = detect_inappropriate_text(value)
+def _raise_on_matches(*, field: str, label: str, matches: list[ModerationMatch]) -> None:
     if not matches:
         return
 
@@ -706,3 +861,12 @@ def enforce_clean_text(*, field: str, label: str, value: str) -> None:
         "matches": matches,
     }
     raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=detail)
+
+
+def enforce_clean_text(*, field: str, label: str, value: str) -> None:
+    _raise_on_matches(field=field, label=label, matches=detect_inappropriate_text(value))
+
+
+async def enforce_clean_text_async(*, field: str, label: str, value: str) -> None:
+    matches = await detect_inappropriate_texts_async([value])
+    _raise_on_matches(field=field, label=label, matches=matches[0])
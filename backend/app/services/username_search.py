@@ -0,0 +1,228 @@
+from __future__ import annotations
+import asyncio
+import unicodedata
+from time import monotonic
+from typing import Any, Literal
+import structlog
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.user import User
+
+log = structlog.get_logger()
+
+UsernameSearchField = Literal["username", "telegram_nickname"]
+
+FUZZY_CANDIDATES_LIMIT = 200
+FUZZY_MAX_DISTANCE = 2
+BK_TREE_TTL_SECONDS = 300
+BK_TREE_BATCH_SIZE = 5000
+TRIGRAM_MIN_THRESHOLD = 0.05
+TRIGRAM_MIN_NEEDLE_LENGTH = 4
+TRIGRAM_THRESHOLD_MARGIN = 0.75
+
+_SEARCH_COLUMNS = {
+    "username": User.username,
+    "telegram_nickname": User.telegram_nickname,
+}
+
+_trigram_available: bool | None = None
+_bk_trees: dict[tuple[str, bool], tuple[float, _BKTree]] = {}
+_bk_tree_locks: dict[tuple[str, bool], asyncio.Lock] = {}
+
+
+def _search_key(value: str) -> str:
+    return unicodedata.normalize("NFKC", value or "").strip().lower()
+
+
+def _levenshtein(left: str, right: str) -> int:
+    if left == right:
+        return 0
+
+    if len(left) < len(right):
+        left, right = right, left
+
+    if not right:
+        return len(left)
+
+    previous = list(range(len(right) + 1))
+    for left_idx, left_ch in enumerate(left, 1):
+        current = [left_idx]
+        for right_idx, right_ch in enumerate(right, 1):
+            current.append(min(
+                previous[right_idx] + 1,
+                current[right_idx - 1] + 1,
+                previous[right_idx - 1] + (left_ch != right_ch),
+            ))
+        previous = current
+
+    return previous[-1]
+
+
+class _BKTree:
+    __slots__ = ("root", "size")
+
+    def __init__(self) -> None:
+        self.root: list[Any] | None = None
+        self.size = 0
+
+    def add(self, word: str, user_id: int) -> None:
+        self.size += 1
+        if self.root is None:
+            self.root = [word, [user_id], {}]
+            return
+
+        node = self.root
+        while True:
+            distance = _levenshtein(word, node[0])
+            if distance == 0:
+                node[1].append(user_id)
+                return
+
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [word, [user_id], {}]
+                return
+
+            node = child
+
+    def search(self, word: str, max_distance: int) -> list[tuple[int, str, list[int]]]:
+        if self.root is None:
+            return []
+
+        found: list[tuple[int, str, list[int]]] = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            distance = _levenshtein(word, node[0])
+            if distance <= max_distance:
+                found.append((distance, node[0], node[1]))
+
+            low = distance - max_distance
+            high = distance + max_distance
+            for edge, child in node[2].items():
+                if low <= edge <= high:
+                    stack.append(child)
+
+        return found
+
+
+def _build_bk_tree(rows: list[tuple[int, str]]) -> _BKTree:
+    tree = _BKTree()
+    for user_id, value in rows:
+        word = _search_key(value)
+        if word:
+            tree.add(word, user_id)
+
+    return tree
+
+
+async def _is_trigram_available(session: AsyncSession) -> bool:
+    global _trigram_available
+    if _trigram_available is None:
+        try:
+            async with session.begin_nested():
+                _trigram_available = bool(await session.scalar(text("SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')")))
+        except Exception:
+            log.warning("username_search.trigram_check_failed")
+            _trigram_available = False
+
+    return _trigram_available
+
+
+async def _load_search_rows(session: AsyncSession, field: UsernameSearchField, *, include_deleted: bool) -> list[tuple[int, str]]:
+    column = _SEARCH_COLUMNS[field]
+    filters = [column.is_not(None)]
+    if not include_deleted:
+        filters.append(User.deleted_at.is_(None))
+
+    rows: list[tuple[int, str]] = []
+    last_id: int | None = None
+    while True:
+        stmt = select(User.id, column).where(*filters)
+        if last_id is not None:
+            stmt = stmt.where(User.id > last_id)
+
+        batch = (await session.execute(stmt.order_by(User.id).limit(BK_TREE_BATCH_SIZE))).all()
+        if not batch:
+            break
+
+        rows.extend((int(user_id), str(value)) for user_id, value in batch)
+        last_id = int(batch[-1][0])
+        if len(batch) < BK_TREE_BATCH_SIZE:
+            break
+
+    return rows
+
+
+async def _get_bk_tree(session: AsyncSession, field: UsernameSearchField, *, include_deleted: bool) -> _BKTree:
+    key = (field, include_deleted)
+    cached = _bk_trees.get(key)
+    if cached and monotonic() - cached[0] < BK_TREE_TTL_SECONDS:
+        return cached[1]
+
+    lock = _bk_tree_locks.setdefault(key, asyncio.Lock())
+    async with lock:
+        cached = _bk_trees.get(key)
+        if cached and monotonic() - cached[0] < BK_TREE_TTL_SECONDS:
+            return cached[1]
+
+        rows = await _load_search_rows(session, field, include_deleted=include_deleted)
+        tree = await asyncio.to_thread(_build_bk_tree, rows)
+        _bk_trees[key] = (monotonic(), tree)
+        log.info("username_search.bk_tree_built", field=field, include_deleted=include_deleted, size=tree.size)
+        return tree
+
+
+def _trigram_threshold(needle: str) -> float:
+    size = len(needle)
+    return max(TRIGRAM_MIN_THRESHOLD, round((size - 3) / (size + 5) * TRIGRAM_THRESHOLD_MARGIN, 3))
+
+
+async def _trigram_candidates(session: AsyncSession, needle: str, field: UsernameSearchField, *, include_deleted: bool, limit: int) -> list[tuple[int, str]]:
+    column = _SEARCH_COLUMNS[field]
+    await session.execute(
+        text("SELECT set_config('pg_trgm.similarity_threshold', :threshold, true)"),
+        {"threshold": str(_trigram_threshold(needle))},
+    )
+    lowered = func.lower(column)
+    filters = [lowered.op("%")(needle)]
+    if not include_deleted:
+        filters.append(User.deleted_at.is_(None))
+
+    rows = await session.execute(
+        select(User.id, column)
+        .where(*filters)
+        .order_by(func.similarity(lowered, needle).desc(), User.id.desc())
+        .limit(limit)
+    )
+    return [(int(user_id), str(value)) for user_id, value in rows.all() if value]
+
+
+async def _bk_tree_candidates(session: AsyncSession, needle: str, field: UsernameSearchField, *, include_deleted: bool, limit: int) -> list[tuple[int, str]]:
+    tree = await _get_bk_tree(session, field, include_deleted=include_deleted)
+    found = tree.search(needle, FUZZY_MAX_DISTANCE)
+    found.sort(key=lambda item: (item[0], -max(item[2])))
+    out: list[tuple[int, str]] = []
+    for _, word, user_ids in found:
+        for user_id in sorted(user_ids, reverse=True):
+            out.append((user_id, word))
+            if len(out) >= limit:
+                return out
+
+    return out
+
+
+async def find_fuzzy_username_candidates(session: AsyncSession, query: str, *, fields: tuple[UsernameSearchField, ...] = ("username",), include_deleted: bool = True, limit: int = FUZZY_CANDIDATES_LIMIT) -> list[tuple[int, str]]:
+    needle = _search_key(query)
+    if not needle:
+        return []
+
+    use_trigram = len(needle) >= TRIGRAM_MIN_NEEDLE_LENGTH and await _is_trigram_available(session)
+    out: list[tuple[int, str]] = []
+    for field in fields:
+        if use_trigram:
+            out.extend(await _trigram_candidates(session, needle, field, include_deleted=include_deleted, limit=limit))
+        else:
+            out.extend(await _bk_tree_candidates(session, needle, field, include_deleted=include_deleted, limit=limit))
+
+    return out
@@ -240,6 +240,10 @@ export function startAuthSocket(opts?: { onForceLogout?: () => void }): Socket {
     window.dispatchEvent(new CustomEvent('auth-room_app_revoked', { detail: p }))
   })
 
+  authSocket.on('room_requests', (p:any) => {
+    window.dispatchEvent(new CustomEvent('auth-room_requests', { detail: p }))
+  })
+
   return authSocket
 }
 
@@ -65,6 +65,18 @@ export interface GlobalChatMention {
   deleted?: boolean
 }
 
+export interface GlobalChatImageVariant {
+  width: number
+  key: string
+}
+
+export interface GlobalChatImageMeta {
+  width: number
+  height: number
+  placeholder: string | null
+  variants: GlobalChatImageVariant[]
+}
+
 export interface GlobalChatMessage {
   id: number
   created_at: string
@@ -80,6 +92,7 @@ export interface GlobalChatMessage {
   reactions: GlobalChatReaction[]
   reply: GlobalChatReplyPreview | null
   image_object_key: string | null
+  image_meta: GlobalChatImageMeta | null
   mentions: GlobalChatMention[]
 }
 
@@ -89,6 +102,7 @@ export interface GlobalChatDeletedMessagePreview {
   content_available: boolean
   text: string
   image_object_key: string | null
+  image_meta: GlobalChatImageMeta | null
   mentions: GlobalChatMention[]
   author: GlobalChatAuthor
 }
@@ -145,6 +159,31 @@ function asString(raw: unknown): string {
   return typeof raw === 'string' ? raw : ''
 }
 
+function normalizeImageMeta(raw: unknown): GlobalChatImageMeta | null {
+  if (!isRecord(raw)) return null
+  const width = asPositiveInt(raw.width)
+  const height = asPositiveInt(raw.height)
+  if (width <= 0 || height <= 0) return null
+  const placeholder = asString(raw.placeholder)
+  const variants: GlobalChatImageVariant[] = []
+  if (Array.isArray(raw.variants)) {
+    for (const item of raw.variants) {
+      if (!isRecord(item)) continue
+      const variantWidth = asPositiveInt(item.width)
+      const key = asString(item.key)
+      if (variantWidth <= 0 || !key) continue
+      variants.push({ width: variantWidth, key })
+    }
+  }
+  variants.sort((left, right) => left.width - right.width)
+  return {
+    width,
+    height,
+    placeholder: placeholder.startsWith('data:image/') ? placeholder : null,
+    variants,
+  }
+}
+
 function normalizePositiveIntList(raw: unknown): number[] {
   if (!Array.isArray(raw)) return []
   const out: number[] = []
@@ -688,6 +727,7 @@ export const useGlobalChatStore = defineStore('globalChat', () => {
       reactions: deleted ? [] : normalizeReactionList(raw.reactions, previous?.reactions || []),
       reply: normalizeReply(raw.reply),
       image_object_key: deleted ? null : (asString(raw.image_object_key) || null),
+      image_meta: deleted ? null : normalizeImageMeta(raw.image_meta),
       mentions: deleted ? [] : normalizeMentionList(raw.mentions),
     }
   }
@@ -710,6 +750,7 @@ export const useGlobalChatStore = defineStore('globalChat', () => {
       content_available: Boolean(raw.content_available),
       text: asString(raw.text),
       image_object_key: asString(raw.image_object_key) || null,
+      image_meta: normalizeImageMeta(raw.image_meta),
       mentions: normalizeMentionList(raw.mentions),
       author: {
         id: authorId,